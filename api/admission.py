@@ -0,0 +1,191 @@
+"""Admission control for the primary pool: priority classes and fast load shedding.
+
+Handlers don't check out primary connections directly. They go through
+`GatedPool`, which first takes a slot from a `Gate` sized to the pool.
+When every slot is busy, a request waits in a queue ordered by its
+priority class. It gets a 503 with Retry-After once that class's wait
+budget runs out (ADMISSION_WAIT_*), or straight away if ADMISSION_MAX_QUEUE
+requests are already waiting. It never sits in `pool.connection()` for
+the pool's 30 s timeout and then turns into a 500.
+
+- critical: logins, logout, order creation and status changes. These may
+  use every slot and wait longest.
+- normal: everything not marked otherwise. At most capacity -
+  ADMISSION_RESERVED slots, so a burst of reads can't lock out a login.
+- low: catalog reads and health checks. They share the normal
+  class's slots, queue behind everyone, and give up first.
+
+A route picks its class with the `priority()` dependency, and with a
+`limit` it also caps how many requests of that route may run at once.
+Work outside a request (startup, sweepers, the replica monitor) has no
+class and bypasses the gate.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+import profiling
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+LEVELS = {CRITICAL: 0, NORMAL: 1, LOW: 2}
+_LEVEL_NAMES = {rank: level for level, rank in LEVELS.items()}
+
+ADMISSION_WAIT = {
+    CRITICAL: float(os.getenv("ADMISSION_WAIT_CRITICAL", "2")),
+    NORMAL: float(os.getenv("ADMISSION_WAIT_NORMAL", "0.5")),
+    LOW: float(os.getenv("ADMISSION_WAIT_LOW", "0.1")),
+}
+ADMISSION_RESERVED = int(os.getenv("ADMISSION_RESERVED", "1"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+RETRY_AFTER = 1
+
+_level: contextvars.ContextVar[str | None] = contextvars.ContextVar("admission_level", default=None)
+
+
+class Overloaded(HTTPException):
+    """503 + Retry-After; an HTTPException so handlers' `except HTTPException: raise` passes it on."""
+
+    def __init__(self, detail: str = "Server busy, retry shortly"):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(RETRY_AFTER)})
+
+
+class Gate:
+    """`capacity` slots handed out by priority class, each class waiting at most ADMISSION_WAIT."""
+
+    def __init__(self, capacity: int, reserved: int = ADMISSION_RESERVED):
+        self.capacity = capacity
+        self.reserved = min(reserved, capacity - 1)
+        self.in_use = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []  # (level, arrival, future) heap
+        self._arrivals = itertools.count()
+        self._stats = {level: {"admitted": 0, "rejected": 0, "waiting": 0, "in_flight": 0, "wait_seconds": 0.0} for level in LEVELS}
+
+    def _non_critical_in_use(self) -> int:
+        return self.in_use - self._stats[CRITICAL]["in_flight"]
+
+    def _grant(self) -> None:
+        """Hand free slots to the best waiters: lowest class first, then arrival order."""
+        while self._queue and self.in_use < self.capacity:
+            rank, _, future = self._queue[0]
+            if future.done():  # gave up waiting
+                heapq.heappop(self._queue)
+                continue
+            if rank != LEVELS[CRITICAL] and self._non_critical_in_use() >= self.capacity - self.reserved:
+                return  # only reserved slots are free, and everyone left in the queue is non-critical
+            heapq.heappop(self._queue)
+            future.set_result(None)
+            self.in_use += 1
+            self._stats[_LEVEL_NAMES[rank]]["in_flight"] += 1
+
+    async def acquire(self, level: str) -> None:
+        stats = self._stats[level]
+        if sum(s["waiting"] for s in self._stats.values()) >= ADMISSION_MAX_QUEUE:
+            raise self.reject(level)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (LEVELS[level], next(self._arrivals), future))
+        self._grant()
+        if future.done():
+            stats["admitted"] += 1
+            return
+        stats["waiting"] += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, ADMISSION_WAIT[level])
+        except asyncio.TimeoutError:
+            raise self.reject(level)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(level)  # the slot arrived just as the client went away
+            raise
+        finally:
+            stats["waiting"] -= 1
+            stats["wait_seconds"] += time.perf_counter() - start
+            if len(self._queue) > 2 * ADMISSION_MAX_QUEUE:
+                self._queue = [entry for entry in self._queue if not entry[2].done()]
+                heapq.heapify(self._queue)
+        stats["admitted"] += 1
+
+    def reject(self, level: str, detail: str = "Server busy, retry shortly") -> Overloaded:
+        self._stats[level]["rejected"] += 1
+        return Overloaded(detail)
+
+    def release(self, level: str) -> None:
+        self.in_use -= 1
+        self._stats[level]["in_flight"] -= 1
+        self._grant()
+
+    def stats(self) -> dict:
+        return {"capacity": self.capacity, "in_use": self.in_use, "levels": {level: dict(s) for level, s in self._stats.items()}}
+
+
+class GatedPool:
+    """The primary pool as request handlers see it: every checkout passes the gate first."""
+
+    def __init__(
+        self,
+        pool: AsyncConnectionPool,
+        gate: Gate,
+        after_use: Callable[[AsyncConnection], Awaitable[None]] | None = None,
+    ):
+        self.pool = pool
+        self.gate = gate
+        # Runs on the connection when the caller's block ends without an error, before the pool
+        # commits and takes it back (replicas.record_write_lsn)
+        self.after_use = after_use
+
+    @asynccontextmanager
+    async def connection(self, timeout: float | None = None):
+        level = _level.get()
+        if level is None:
+            async with self.pool.connection(timeout=timeout) as conn:
+                yield conn
+                if self.after_use is not None:
+                    await self.after_use(conn)
+            return
+        started = time.perf_counter()
+        await self.gate.acquire(level)
+        try:
+            # The gate has a slot for us, so the pool normally has a connection too; background
+            # work bypasses the gate, though, so don't let the pool's own 30 s timeout apply
+            async with self.pool.connection(timeout=ADMISSION_WAIT[level]) as conn:
+                profiling.record("pool_wait", level, started)
+                yield conn
+                if self.after_use is not None:
+                    await self.after_use(conn)
+        except PoolTimeout:
+            raise self.gate.reject(level)
+        finally:
+            self.gate.release(level)
+
+    def __getattr__(self, name: str):
+        return getattr(self.pool, name)
+
+
+def priority(level: str, limit: int | None = None):
+    """FastAPI dependency: this route's pool checkouts run at `level`; with `limit`, at most that
+    many requests of the route run at once and the rest get 503 immediately."""
+    if level not in LEVELS:
+        raise ValueError(f"unknown priority {level!r}")
+    active = 0
+
+    async def dependency():
+        nonlocal active
+        _level.set(level)
+        if limit is not None and active >= limit:
+            raise Overloaded("Too many of these requests running, retry shortly")
+        active += 1
+        try:
+            yield
+        finally:
+            active -= 1
+
+    return dependency
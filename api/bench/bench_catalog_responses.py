@@ -0,0 +1,139 @@
+"""Catalog read cost per request: serialization, bytes on the wire, server CPU.
+
+Tops product_types up to --products rows (`etag-bench-*`, with stock rows),
+then:
+
+- in-process, times turning the /api/stock and /api/product-types rows into
+  a response body the way FastAPI's default JSONResponse does
+  (jsonable_encoder + json.dumps) and with orjson, as etags.encode does once
+  per cache fill;
+- starts the API from --app-dir and sends --requests GETs to each endpoint,
+  plain and (if the server sends an ETag) revalidating with If-None-Match,
+  and reports response bytes and server CPU (utime + stime) per request.
+
+Point --app-dir at an older checkout to compare, as with bench_startup.py:
+
+    git worktree add /tmp/api-before <rev>
+    python bench/bench_catalog_responses.py --app-dir /tmp/api-before/api
+    python bench/bench_catalog_responses.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import orjson
+import psycopg
+from fastapi.encoders import jsonable_encoder
+from psycopg.rows import dict_row
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import statements  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ENDPOINTS = {"/api/product-types": "list_product_types", "/api/stock": "list_stock"}
+
+
+def populate(conn: psycopg.Connection, products: int) -> None:
+    have = conn.execute("SELECT count(*) AS n FROM product_types WHERE active").fetchone()["n"]
+    if have >= products:
+        return
+    conn.execute(
+        """
+        WITH p AS (
+            INSERT INTO product_types (description, unit_price_cents)
+            SELECT 'etag-bench-' || g, 100 + g %% 900 FROM generate_series(1, %s) g
+            RETURNING product_type_id
+        )
+        INSERT INTO stock (product_type_id, available_quantity) SELECT product_type_id, 10 FROM p
+        """,
+        (products - have,),
+    )
+
+
+def serialize_us(rows: list[dict], runs: int) -> dict:
+    payload = {"ok": True, "data": rows}
+    start = time.perf_counter()
+    for _ in range(runs):
+        stdlib = json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+    stdlib_us = (time.perf_counter() - start) * 1e6 / runs
+    start = time.perf_counter()
+    for _ in range(runs):
+        fast = orjson.dumps(payload)
+    orjson_us = (time.perf_counter() - start) * 1e6 / runs
+    assert orjson.loads(fast) == json.loads(stdlib)
+    return {"rows": len(rows), "jsonable_encoder_json_us": round(stdlib_us, 1), "orjson_us": round(orjson_us, 1)}
+
+
+def cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as fh:
+        fields = fh.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def http_cost(client: httpx.Client, pid: int, path: str, requests: int, headers: dict) -> dict:
+    size = 0
+    statuses = set()
+    cpu = cpu_seconds(pid)
+    for _ in range(requests):
+        resp = client.get(path, headers=headers)
+        size += len(resp.content)
+        statuses.add(resp.status_code)
+    return {
+        "status": sorted(statuses),
+        "bytes_per_request": size // requests,
+        "server_cpu_ms_per_request": round((cpu_seconds(pid) - cpu) * 1000 / requests, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--app-dir", default=APP_DIR)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    out = {"serialization": {}, "http": {}}
+    with psycopg.connect(args.database_url, autocommit=True, row_factory=dict_row) as conn:
+        populate(conn, args.products)
+        for path, name in ENDPOINTS.items():
+            rows = conn.execute(statements.STATEMENTS[name].sql).fetchall()
+            out["serialization"][path] = serialize_us(rows, args.runs)
+
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": args.database_url}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=args.app_dir,
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            for _ in range(600):
+                try:
+                    if client.get("/healthz").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.1)
+            for path in ENDPOINTS:
+                etag = client.get(path).headers.get("etag")
+                out["http"][path] = {"full": http_cost(client, proc.pid, path, args.requests, {})}
+                if etag:
+                    out["http"][path]["revalidated"] = http_cost(
+                        client, proc.pid, path, args.requests, {"If-None-Match": etag}
+                    )
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Throughput and latency of read endpoints at increasing client concurrency.
+
+Drives an already running server, so the same script can be pointed at the
+current async build and at an older sync build (e.g. a `git worktree` of an
+earlier commit) started with identical DB_POOL_MAX:
+
+    uvicorn app:app --port 8080 &
+    python bench/bench_concurrency.py --url http://localhost:8080 --clients 50 200 500
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+PATHS = ["/api/product-types", "/api/stock", "/healthz"]
+
+
+async def client_loop(client: httpx.AsyncClient, deadline: float, latencies: list, errors: list) -> None:
+    i = 0
+    while time.perf_counter() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            resp = await client.get(path)
+            if resp.status_code >= 400:
+                errors.append(resp.status_code)
+                continue
+        except httpx.HTTPError as exc:
+            errors.append(type(exc).__name__)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+
+async def run(url: str, clients: int, seconds: float) -> dict:
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    latencies: list[float] = []
+    errors: list = []
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client_loop(client, deadline, latencies, errors) for _ in range(clients)))
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--seconds", type=float, default=15)
+    args = parser.parse_args()
+    for clients in args.clients:
+        print(json.dumps(asyncio.run(run(args.url, clients, args.seconds))))
+
+
+if __name__ == "__main__":
+    main()
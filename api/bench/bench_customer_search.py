@@ -0,0 +1,133 @@
+"""Customer search latency: prefix terms vs scanning customers.
+
+Tops the customers table up to --customers rows (synthetic names with
+accents and two surnames, emails at search-bench.example, reused across
+runs), then runs the `search_customers` statement for random 1-6 character
+prefixes of first names, surnames and phone numbers, and the same searches
+as ILIKE over customers for comparison. Also times inserting customers
+with the search-term triggers enabled and disabled (rolled back). Exits 1
+if the p95 search is over --max-p95-ms. Use a scratch database.
+
+    python bench/bench_customer_search.py --customers 500000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import customers  # noqa: E402
+import statements  # noqa: E402
+from bench_concurrency import percentile  # noqa: E402
+
+FIRST = ["María", "José", "Juan", "Ana", "Luis", "Carmen", "Jorge", "Lucía", "Sofía", "Martín", "Valentina",
+         "Diego", "Camila", "Andrés", "Paula", "Ramón", "Inés", "Nicolás", "Julieta", "Tomás"]
+LAST = ["García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Pérez", "Gómez", "Sánchez",
+        "Díaz", "Álvarez", "Romero", "Sosa", "Torres", "Ruiz", "Ramírez", "Flores", "Benítez", "Acosta", "Medina"]
+
+SCAN_SQL = """
+SELECT id, name, phone, email, address FROM customers
+WHERE name ILIKE %(pattern)s OR name ILIKE %(word_pattern)s OR phone LIKE %(pattern)s
+ORDER BY name, id LIMIT %(limit)s
+"""
+
+
+def populate(conn: psycopg.Connection, total: int) -> None:
+    have = conn.execute("SELECT count(*) FROM customers").fetchone()[0]
+    if have >= total:
+        return
+    print(f"inserting {total - have} customers...", file=sys.stderr)
+    conn.execute(
+        """
+        INSERT INTO customers (name, phone, email)
+        SELECT (%(first)s::text[])[1 + (g * 7) %% cardinality(%(first)s::text[])] || ' '
+               || (%(last)s::text[])[1 + (g * 13) %% cardinality(%(last)s::text[])] || ' '
+               || (%(last)s::text[])[1 + (g / 20) %% cardinality(%(last)s::text[])] || ' ' || g,
+               '+54 11 ' || lpad((g::bigint * 7919 %% 100000000)::text, 8, '0'),
+               'c' || g || '@search-bench.example'
+        FROM generate_series(%(start)s::int, %(total)s::int) g
+        ON CONFLICT (name, phone) DO NOTHING
+        """,
+        {"first": FIRST, "last": LAST, "start": have + 1, "total": total},
+    )
+    conn.execute("ANALYZE customers, customer_search_terms")
+
+
+def queries(n: int, seed: int = 7) -> list[str]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0:
+            word = rng.choice(FIRST)
+        elif kind == 1:
+            word = rng.choice(LAST)
+        else:
+            word = "11 " + str(rng.randrange(10**7, 10**8))
+        out.append(word[: rng.randint(1, 6)] if kind < 2 else word[: rng.randint(4, 9)])
+    return out
+
+
+def timed(conn: psycopg.Connection, sql: str, params_list: list[dict]) -> dict:
+    times = []
+    for params in params_list:
+        start = time.perf_counter()
+        conn.execute(sql, params, prepare=True).fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return {"p50": percentile(times, 50), "p95": percentile(times, 95), "max": round(max(times), 2)}
+
+
+def insert_ms(conn: psycopg.Connection, n: int, triggers: bool) -> float:
+    with conn.transaction(force_rollback=True):
+        if not triggers:
+            for name in ("insert", "update"):
+                conn.execute(f"ALTER TABLE customers DISABLE TRIGGER trg_customers_search_{name}")
+        start = time.perf_counter()
+        for i in range(n):
+            conn.execute(
+                "INSERT INTO customers (name, phone) VALUES (%s, %s)",
+                (f"Bench Insert Cliente {i}", f"555-{i:06d}"),
+                prepare=True,
+            )
+        return round((time.perf_counter() - start) * 1000 / n, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--customers", type=int, default=500_000)
+    parser.add_argument("--searches", type=int, default=600)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--max-p95-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        populate(conn, args.customers)
+        total = conn.execute("SELECT count(*) FROM customers").fetchone()[0]
+        qs = queries(args.searches)
+        terms = timed(conn, statements.STATEMENTS["search_customers"].sql, [customers.search_params(q, args.limit) for q in qs])
+        scan = timed(
+            conn,
+            SCAN_SQL,
+            [{"pattern": q + "%", "word_pattern": "% " + q + "%", "limit": args.limit} for q in qs[: args.searches // 10]],
+        )
+        out = {
+            "customers": total,
+            "searches": len(qs),
+            "search_terms_ms": terms,
+            "ilike_scan_ms": scan,
+            "insert_customer_ms": {"with_search_triggers": insert_ms(conn, 200, True), "without": insert_ms(conn, 200, False)},
+        }
+    print(json.dumps(out, indent=2))
+    if terms["p95"] > args.max_p95_ms:
+        print(f"p95 {terms['p95']} ms is over {args.max_p95_ms} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Daily stats: maintained aggregates vs aggregating orders on every view, and write cost.
+
+Reads: times the `daily_order_stats` statement against the equivalent
+GROUP BY over orders for 7/30/365-day ranges ending at the newest order.
+Writes: times --orders create_order statements with the stats triggers
+enabled and disabled, each inside a transaction that is rolled back, so
+nothing is left behind (ALTER TABLE takes a brief lock; use a scratch
+database).
+
+    python bench/bench_daily_stats.py --orders 500
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import statements  # noqa: E402
+
+DIRECT_SQL = """
+SELECT order_stats_day(created_at) AS day, status, count(*), sum(total_items),
+       sum(total_price_cents) FILTER (WHERE status <> 'canceled')
+FROM orders
+WHERE created_at >= %(day_from)s::date - 1 AND created_at < %(day_to)s::date + 2
+  AND order_stats_day(created_at) BETWEEN %(day_from)s AND %(day_to)s
+GROUP BY 1, 2
+"""
+
+ORDER_PARAMS = {
+    "name": "bench-daily-stats",
+    "phone": "bds",
+    "email": None,
+    "address": None,
+    "pickup_notes": None,
+    "delivery_notes": None,
+    "pickup_at": None,
+    "delivery_at": None,
+    "total_items": 3,
+    "total_price_cents": 1200,
+    "skus": ["shirt", "pants"],
+    "descriptions": [None, None],
+    "qtys": [2, 1],
+    "prices": [400, 400],
+    "idempotency_key": None,
+    "request_hash": None,
+    "response": None,
+}
+
+
+def median_ms(conn: psycopg.Connection, query: str, params: dict, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.execute(query, params, prepare=True).fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def create_orders_ms(conn: psycopg.Connection, n: int, triggers: bool) -> float:
+    sql = statements.STATEMENTS["create_order"].sql
+    with conn.transaction(force_rollback=True):
+        if not triggers:
+            for name in ("insert", "update", "delete"):
+                conn.execute(f"ALTER TABLE orders DISABLE TRIGGER trg_orders_daily_stats_{name}")
+        for _ in range(20):
+            conn.execute(sql, ORDER_PARAMS, prepare=True)
+        start = time.perf_counter()
+        for _ in range(n):
+            conn.execute(sql, ORDER_PARAMS, prepare=True)
+        return round((time.perf_counter() - start) * 1000 / n, 3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    out = {"reads": {}}
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        total, newest = conn.execute("SELECT count(*), order_stats_day(max(created_at)) FROM orders").fetchone()
+        out["orders_in_table"] = total
+        stats_sql = statements.STATEMENTS["daily_order_stats"].sql
+        for days in (7, 30, 365):
+            params = {"day_from": newest - timedelta(days=days - 1), "day_to": newest, "max_days": 366}
+            out["reads"][f"{days}_days"] = {
+                "aggregates_ms": median_ms(conn, stats_sql, params, args.runs),
+                "group_by_orders_ms": median_ms(conn, DIRECT_SQL, params, args.runs),
+            }
+        out["create_order_ms"] = {
+            "with_stats_triggers": create_orders_ms(conn, args.orders, True),
+            "without": create_orders_ms(conn, args.orders, False),
+        }
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Order export memory check: server RSS must stay flat whatever the export size.
+
+Adds --orders synthetic orders with --items line items each (customers named
+`export-bench-*`, created in 2001 so the range holds nothing else), starts
+the API under uvicorn, and streams GET /api/exports/orders in both formats
+for a 10% slice and for the full range while sampling the server's RSS.
+Exits 1 if the full export grows RSS by more than --max-growth-mb over the
+pre-export baseline. Use a scratch database; the rows are reused across runs.
+
+    python bench/bench_export.py --orders 1000000 --items 3   # 3M CSV rows
+"""
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_startup import free_port  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+START = datetime(2001, 1, 1, tzinfo=timezone.utc)
+
+
+def populate(conn: psycopg.Connection, orders: int, items: int) -> None:
+    have = conn.execute(
+        "SELECT count(*) FROM orders WHERE created_at >= %s AND created_at < %s", (START, START.replace(year=2002))
+    ).fetchone()[0]
+    if have >= orders:
+        return
+    print(f"inserting {orders - have} orders x {items} items...", file=sys.stderr)
+    conn.execute(
+        """
+        INSERT INTO customers (name, phone, email)
+        SELECT 'export-bench-' || g, 'xb-' || g, 'xb' || g || '@example.com' FROM generate_series(1, 10000) g
+        ON CONFLICT (name, phone) DO NOTHING
+        """
+    )
+    conn.execute(
+        """
+        WITH c AS (SELECT array_agg(id) AS ids FROM customers WHERE name LIKE 'export-bench-%%'),
+        new_orders AS (
+            INSERT INTO orders (customer_id, status, pickup_notes, total_items, total_price_cents, created_at)
+            SELECT c.ids[1 + g %% array_length(c.ids, 1)], 'delivered', 'export bench, "quoted", with commas',
+                   %(items)s, 450 * %(items)s, %(start)s + g * (interval '1 year' / %(orders)s)
+            FROM c, generate_series(%(have)s::int, %(orders)s::int - 1) g
+            RETURNING id
+        )
+        INSERT INTO order_items (order_id, sku, description, qty, unit_price_cents)
+        SELECT id, 'sku-' || n, 'Item ' || n, 1, 450 FROM new_orders, generate_series(1, %(items)s) n
+        """,
+        {"items": items, "orders": orders, "have": have, "start": START},
+    )
+    conn.execute("ANALYZE orders, order_items, customers")
+
+
+def session_token(conn: psycopg.Connection) -> str:
+    user_id = conn.execute(
+        """
+        INSERT INTO users (username, password_hash) VALUES ('export-bench', '')
+        ON CONFLICT (username) DO UPDATE SET active = TRUE
+        RETURNING user_id
+        """
+    ).fetchone()[0]
+    token = secrets.token_urlsafe(32)
+    conn.execute(
+        "INSERT INTO sessions (session_token, user_id, expires_at) VALUES (%s, %s, NOW() + interval '1 hour')",
+        (token, user_id),
+    )
+    return token
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def export_once(base_url: str, token: str, pid: int, fmt: str, created_to: datetime) -> dict:
+    peak = baseline = rss_mb(pid)
+    done = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, rss_mb(pid))
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    lines = size = 0
+    start = time.perf_counter()
+    try:
+        params = {"format": fmt, "created_from": START.isoformat(), "created_to": created_to.isoformat()}
+        with httpx.stream(
+            "GET", f"{base_url}/api/exports/orders", params=params, cookies={"session": token}, timeout=None
+        ) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_bytes():
+                size += len(chunk)
+                lines += chunk.count(b"\n")
+    finally:
+        done.set()
+        sampler.join()
+    seconds = time.perf_counter() - start
+    return {
+        "lines": lines,
+        "mb": round(size / 2**20, 1),
+        "seconds": round(seconds, 1),
+        "mb_per_s": round(size / 2**20 / seconds, 1),
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_growth_mb": round(peak - baseline, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=3)
+    parser.add_argument("--max-growth-mb", type=float, default=50)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        populate(conn, args.orders, args.items)
+        token = session_token(conn)
+
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": args.database_url, "READ_CACHE_ENABLED": "false"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"], cwd=APP_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            try:
+                if httpx.get(f"{base_url}/healthz").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        results = {}
+        for fmt in ("csv", "ndjson"):
+            for label, span in (("10pct", timedelta(days=36.5)), ("full", timedelta(days=366))):
+                results[f"{fmt}_{label}"] = export_once(base_url, token, proc.pid, fmt, START + span)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    worst = max(results[f"{fmt}_full"]["rss_growth_mb"] for fmt in ("csv", "ndjson"))
+    print(json.dumps({"orders": args.orders, "items_per_order": args.items, "exports": results}, indent=2))
+    if worst > args.max_growth_mb:
+        print(f"RSS grew by {worst} MB during a full export (limit {args.max_growth_mb} MB)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
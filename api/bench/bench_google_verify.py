@@ -0,0 +1,157 @@
+"""Google ID token verification: per-call certs download vs cached keys.
+
+Fully offline: signs tokens with locally generated RSA keys and serves the
+matching certs from a local HTTP server that adds --fetch-ms per request
+(roughly a round-trip to googleapis.com). Compares the previous
+`id_token.verify_token` path, which downloads the certs on every login,
+with `google_auth.GoogleTokenVerifier` over a `CachedCertsSource`, then
+checks that expired, wrong-audience and rotated-key tokens are handled.
+
+    python bench/bench_google_verify.py --logins 200 --fetch-ms 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rsa
+from google.auth import crypt, jwt
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import google_auth  # noqa: E402
+
+CLIENT_ID = "bench-client.apps.googleusercontent.com"
+
+
+class Keys:
+    def __init__(self):
+        self.private: dict[str, bytes] = {}
+        self.public: dict[str, str] = {}
+
+    def add(self, kid: str, bits: int = 2048) -> None:
+        pub, priv = rsa.newkeys(bits)
+        self.private[kid] = priv.save_pkcs1()
+        self.public[kid] = pub.save_pkcs1().decode()
+
+    def sign(self, kid: str, *, aud: str = CLIENT_ID, iss: str = "https://accounts.google.com", ttl: int = 3600) -> str:
+        now = int(time.time())
+        claims = {"iss": iss, "aud": aud, "sub": "1234567890", "email": "bench@example.com", "iat": now, "exp": now + ttl}
+        signer = crypt.RSASigner.from_string(self.private[kid], key_id=kid)
+        return jwt.encode(signer, claims).decode()
+
+
+def serve_certs(keys: Keys, fetch_ms: float) -> tuple[str, dict]:
+    counter = {"requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            counter["requests"] += 1
+            time.sleep(fetch_ms / 1000)
+            body = json.dumps(keys.public).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "public, max-age=300")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/certs", counter
+
+
+def timed(fn, n: int) -> float:
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 3)
+
+
+async def expect_invalid(verifier: google_auth.GoogleTokenVerifier, token: str) -> bool:
+    try:
+        await verifier.verify(token)
+    except google_auth.InvalidToken:
+        return True
+    return False
+
+
+async def run_new(keys: Keys, url: str, counter: dict, logins: int) -> dict:
+    source = google_auth.CachedCertsSource(url, min_refresh_interval=0)
+    verifier = google_auth.GoogleTokenVerifier(CLIENT_ID, source)
+    token = keys.sign("k1")
+    before = counter["requests"]
+    times = []
+    for _ in range(logins):
+        start = time.perf_counter()
+        claims = await verifier.verify(token)
+        times.append((time.perf_counter() - start) * 1000)
+    assert claims["sub"] == "1234567890"
+
+    checks = {
+        "expired_rejected": await expect_invalid(verifier, keys.sign("k1", ttl=-3600)),
+        "wrong_audience_rejected": await expect_invalid(verifier, keys.sign("k1", aud="someone-else")),
+        "wrong_issuer_rejected": await expect_invalid(verifier, keys.sign("k1", iss="https://evil.example")),
+        "garbage_rejected": await expect_invalid(verifier, "not-a-jwt"),
+    }
+    # Google rotates in a new key: the first token signed with it forces one refresh
+    keys.add("k2")
+    fetches = source.fetches
+    checks["rotated_key_accepted"] = (await verifier.verify(keys.sign("k2")))["sub"] == "1234567890"
+    checks["rotation_refetched_once"] = source.fetches == fetches + 1
+
+    # Concurrent cold-cache logins share a single fetch
+    cold = google_auth.CachedCertsSource(url)
+    cold_verifier = google_auth.GoogleTokenVerifier(CLIENT_ID, cold)
+    await asyncio.gather(*(cold_verifier.verify(token) for _ in range(50)))
+    checks["cold_cache_single_fetch"] = cold.fetches == 1
+
+    # Offline key source: no HTTP at all
+    offline = google_auth.GoogleTokenVerifier(CLIENT_ID, google_auth.StaticKeySource(keys.public))
+    requests_before = counter["requests"]
+    checks["static_source_offline"] = (await offline.verify(token))["sub"] == "1234567890" and counter["requests"] == requests_before
+
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "first_login_ms": round(times[0], 3),
+        "certs_fetches": counter["requests"] - before,
+        "checks": checks,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--fetch-ms", type=float, default=40)
+    args = parser.parse_args()
+
+    keys = Keys()
+    keys.add("k1")
+    url, counter = serve_certs(keys, args.fetch_ms)
+    token = keys.sign("k1")
+
+    before = counter["requests"]
+    request = google_requests.Request()
+    old_ms = timed(lambda: id_token.verify_token(token, request, CLIENT_ID, certs_url=url), args.logins)
+    old = {"median_ms": old_ms, "certs_fetches": counter["requests"] - before}
+
+    new = asyncio.run(run_new(keys, url, counter, args.logins))
+    print(json.dumps({"logins": args.logins, "fetch_ms": args.fetch_ms, "per_call_fetch": old, "cached_keys": new}, indent=2))
+    if not all(new["checks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Idempotency-Key retries: no duplicate orders, and what a replay costs.
+
+Starts the API under uvicorn twice, with the per-worker replay cache on and
+with IDEMPOTENCY_CACHE_SIZE=0 (every replay read from idempotency_keys, as
+on a worker that didn't see the first attempt). Each run posts --orders
+keyed orders and retries each one --retries times, fires --racers
+concurrent copies of another --orders/4 keys at once (the flaky-tablet
+case), and reuses one key with a different body. Exits 1 if any key
+created more than one order, a racing copy failed, or the mismatched body
+wasn't refused.
+
+    python bench/bench_idempotency.py --orders 200 --retries 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import psycopg
+
+from bench_concurrency import percentile
+from bench_startup import free_port
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+PHONE = "idempotency-bench"
+
+
+def order_body(n: int) -> dict:
+    return {"customer": {"name": f"Idempotency Bench {n % 50}", "phone": PHONE}, "items": [{"sku": "shirt", "qty": 1 + n % 3}]}
+
+
+async def post(client: httpx.AsyncClient, key: str, body: dict) -> tuple[float, httpx.Response]:
+    start = time.perf_counter()
+    resp = await client.post("/api/orders", json=body, headers={"Idempotency-Key": key})
+    return (time.perf_counter() - start) * 1000, resp
+
+
+async def workload(base_url: str, args) -> dict:
+    first, replays, order_ids, race_errors = [], [], {}, 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        for n in range(args.orders):
+            key, body = str(uuid.uuid4()), order_body(n)
+            ms, resp = await post(client, key, body)
+            first.append(ms)
+            order_ids[key] = {resp.json()["order_id"]}
+            for _ in range(args.retries):
+                ms, resp = await post(client, key, body)
+                assert resp.headers.get("Idempotent-Replayed") == "true", resp.text
+                replays.append(ms)
+                order_ids[key].add(resp.json()["order_id"])
+
+        for n in range(args.orders // 4):
+            key, body = str(uuid.uuid4()), order_body(n)
+            results = await asyncio.gather(*(post(client, key, body) for _ in range(args.racers)))
+            order_ids[key] = {resp.json()["order_id"] for _, resp in results if resp.status_code == 200}
+            race_errors += sum(resp.status_code != 200 for _, resp in results)
+
+        key = next(iter(order_ids))
+        _, reused = await post(client, key, order_body(args.orders + 1))
+    return {
+        "first_attempt_ms": {"p50": percentile(first, 50), "p95": percentile(first, 95)},
+        "replay_ms": {"p50": percentile(replays, 50), "p95": percentile(replays, 95)},
+        "keys": len(order_ids),
+        "keys_with_duplicate_orders": sum(len(ids) != 1 for ids in order_ids.values()),
+        "racing_requests_failed": race_errors,
+        "reused_key_status": reused.status_code,
+    }
+
+
+def run_server(database_url: str, cache_size: int, args) -> dict:
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "IDEMPOTENCY_CACHE_SIZE": str(cache_size)}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"], cwd=APP_DIR, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            try:
+                if httpx.get(f"{base_url}/healthz").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        return asyncio.run(workload(base_url, args))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--racers", type=int, default=5)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        count = "SELECT count(*) FROM orders o JOIN customers c ON c.id = o.customer_id WHERE c.phone = %s"
+        before = conn.execute(count, (PHONE,)).fetchone()[0]
+        results = {
+            "replay_cache": run_server(args.database_url, 10000, args),
+            "table_only": run_server(args.database_url, 0, args),
+        }
+        created = conn.execute(count, (PHONE,)).fetchone()[0] - before
+
+    expected = sum(r["keys"] for r in results.values())
+    print(json.dumps({"orders_created": created, "keys_used": expected, **results}, indent=2))
+    ok = created == expected and all(
+        r["keys_with_duplicate_orders"] == r["racing_requests_failed"] == 0 and r["reused_key_status"] == 422 for r in results.values()
+    )
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
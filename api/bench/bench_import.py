@@ -0,0 +1,68 @@
+"""Compare bulk import against one POST /api/orders per order.
+
+Runs in-process through the FastAPI test client against DATABASE_URL, so it
+measures handler + database time without HTTP overhead. Writes real rows;
+point it at a throwaway database.
+
+    DATABASE_URL=postgresql://... python bench/bench_import.py --orders 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app  # noqa: E402
+
+
+def synthetic_orders(n: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    skus = ["shirt", "pants", "towel", "sheet", "dress", "jacket"]
+    return [
+        {
+            "customer": {"name": f"Customer {rng.randint(1, n // 4 + 1)}", "phone": f"555-{rng.randint(0, 9999):04d}"},
+            "items": [
+                {"sku": rng.choice(skus), "qty": rng.randint(1, 4), "unit_price_cents": rng.choice([300, 400, 1200])}
+                for _ in range(rng.randint(1, 6))
+            ],
+        }
+        for _ in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000)
+    args = parser.parse_args()
+
+    orders = synthetic_orders(args.orders)
+    with TestClient(app.app) as client:
+        start = time.perf_counter()
+        for order in orders:
+            client.post("/api/orders", json=order).raise_for_status()
+        per_order = time.perf_counter() - start
+
+        body = "\n".join(json.dumps(o) for o in orders)
+        start = time.perf_counter()
+        resp = client.post("/api/orders/import", content=body, headers={"content-type": "application/x-ndjson"})
+        resp.raise_for_status()
+        bulk = time.perf_counter() - start
+        assert resp.json()["imported"] == args.orders
+
+    print(json.dumps({
+        "orders": args.orders,
+        "per_order_seconds": round(per_order, 3),
+        "bulk_seconds": round(bulk, 3),
+        "per_order_rate": round(args.orders / per_order, 1),
+        "bulk_rate": round(args.orders / bulk, 1),
+        "speedup": round(per_order / bulk, 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
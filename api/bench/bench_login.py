@@ -0,0 +1,70 @@
+"""Login latency under contention, and its effect on an unrelated read route.
+
+Runs --logins concurrent login loops alongside --readers loops on
+/api/stock against a running server, and reports latency percentiles for
+both. Run once with --logins 0 for the readers' baseline.
+
+    python bench/bench_login.py --url http://localhost:8080 --logins 20 --readers 10
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from bench_concurrency import percentile
+
+USERNAME = "bench_login_user"
+PASSWORD = "bench-password"
+
+
+async def loop(client: httpx.AsyncClient, method: str, path: str, body, deadline: float, latencies: list, statuses: dict):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        resp = await client.request(method, path, json=body)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        if resp.status_code < 400:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+def summary(latencies: list, statuses: dict, seconds: float) -> dict:
+    return {
+        "ok_per_s": round(len(latencies) / seconds, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "statuses": statuses,
+    }
+
+
+async def run(url: str, logins: int, readers: int, seconds: float) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        await client.post("/api/auth/register", json={"username": USERNAME, "password": PASSWORD})
+        login_lat, read_lat, login_st, read_st = [], [], {}, {}
+        deadline = time.perf_counter() + seconds
+        creds = {"username": USERNAME, "password": PASSWORD}
+        await asyncio.gather(
+            *(loop(client, "POST", "/api/auth/login", creds, deadline, login_lat, login_st) for _ in range(logins)),
+            *(loop(client, "GET", "/api/stock", None, deadline, read_lat, read_st) for _ in range(readers)),
+        )
+    return {
+        "logins": logins,
+        "readers": readers,
+        "login": summary(login_lat, login_st, seconds),
+        "stock": summary(read_lat, read_st, seconds),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=10)
+    parser.add_argument("--seconds", type=float, default=15)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.url, args.logins, args.readers, args.seconds))))
+
+
+if __name__ == "__main__":
+    main()
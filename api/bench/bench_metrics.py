@@ -0,0 +1,116 @@
+"""Per-request cost of MetricsMiddleware, and the cost of a /metrics scrape.
+
+Two measurements:
+- middleware alone: a trivial ASGI app called in-process with and without
+  the middleware, so the difference is the middleware's own work;
+- end to end: uvicorn started with METRICS_ENABLED=false and =true, with
+  sequential requests to --path reported as median/p99 latency.
+
+    python bench/bench_metrics.py --requests 3000 --path /api/product-types
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import metrics  # noqa: E402
+from bench_concurrency import percentile  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+class Route:
+    path = "/bench/{item_id}"
+
+
+async def bare_app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def middleware_overhead_us(n: int) -> dict:
+    wrapped = metrics.MetricsMiddleware(bare_app)
+    scope = {"type": "http", "method": "GET", "path": "/bench/1"}
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        pass
+
+    async def run(app) -> float:
+        start = time.perf_counter()
+        for _ in range(n):
+            await app(dict(scope), receive, send)
+        return (time.perf_counter() - start) / n * 1e6
+
+    await run(wrapped)  # warm the label cache
+    bare = min([await run(bare_app) for _ in range(5)])
+    with_metrics = min([await run(wrapped) for _ in range(5)])
+    return {"bare_us": round(bare, 2), "with_metrics_us": round(with_metrics, 2), "overhead_us": round(with_metrics - bare, 2)}
+
+
+def end_to_end(enabled: bool, path: str, n: int) -> dict:
+    port = free_port()
+    env = {**os.environ, "METRICS_ENABLED": "true" if enabled else "false", "METRICS_TOKEN": ""}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        with httpx.Client(base_url=base) as client:
+            for _ in range(600):
+                try:
+                    if client.get("/healthz").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            for _ in range(200):
+                client.get(path)
+            latencies = []
+            for _ in range(n):
+                start = time.perf_counter()
+                client.get(path).raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+            result = {"median_ms": round(statistics.median(latencies), 3), "p99_ms": percentile(latencies, 99)}
+            if enabled:
+                scrape = []
+                for _ in range(20):
+                    start = time.perf_counter()
+                    resp = client.get("/metrics")
+                    scrape.append((time.perf_counter() - start) * 1000)
+                result["scrape_ms"] = round(statistics.median(scrape), 3)
+                result["scrape_bytes"] = len(resp.content)
+            return result
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--path", default="/api/product-types")
+    args = parser.parse_args()
+
+    out = {"middleware": asyncio.run(middleware_overhead_us(20000)), "path": args.path}
+    out["metrics_off"] = end_to_end(False, args.path, args.requests)
+    out["metrics_on"] = end_to_end(True, args.path, args.requests)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
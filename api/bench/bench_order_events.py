@@ -0,0 +1,165 @@
+"""Order status fan-out: many SSE clients, one LISTEN connection.
+
+Against a running server, opens --clients EventSource-style streams on
+/api/events/orders, creates an order and walks it through its workflow
+--rounds times, and reports how long each transition took to reach every
+client plus how many pool connections the server checked out meanwhile
+(from /metrics) next to the number of API calls made: the open streams
+themselves should add none. Also checks
+refused transitions and Last-Event-ID replay. The all-orders stream is
+admin only, so the bench signs in as --username (the server's
+ADMIN_USERNAME).
+
+    python bench/bench_order_events.py --url http://localhost:8080 --clients 300 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import statistics
+import sys
+import time
+
+import httpx
+import psycopg
+
+from bench_concurrency import percentile
+
+WORKFLOW = ("in_process", "ready", "delivered")
+
+
+def session_cookie(database_url: str, username: str = "events-bench") -> str:
+    """A session token for `username` (created without a password if missing), straight in the database."""
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        user_id = conn.execute(
+            """
+            INSERT INTO users (username, password_hash) VALUES (%s, '')
+            ON CONFLICT (username) DO UPDATE SET active = TRUE
+            RETURNING user_id
+            """,
+            (username,),
+        ).fetchone()[0]
+        token = secrets.token_urlsafe(32)
+        conn.execute(
+            "INSERT INTO sessions (session_token, user_id, expires_at) VALUES (%s, %s, NOW() + interval '1 hour')",
+            (token, user_id),
+        )
+    return token
+
+
+async def pool_requests(client: httpx.AsyncClient) -> float:
+    text = (await client.get("/metrics")).text
+    for line in text.splitlines():
+        if line.startswith("laundry_db_requests_num_total"):
+            return float(line.split()[-1])
+    return float("nan")
+
+
+async def listen(client: httpx.AsyncClient, path: str, headers: dict, received: dict, ready: asyncio.Event, counter: list):
+    async with client.stream("GET", path, headers=headers) as resp:
+        resp.raise_for_status()
+        counter[0] += 1
+        if counter[0] == counter[1]:
+            ready.set()
+        event_id = None
+        async for line in resp.aiter_lines():
+            if line.startswith("id: "):
+                event_id = int(line[4:])
+            elif line.startswith("data: ") and event_id is not None:
+                received.setdefault(event_id, []).append(time.perf_counter())
+                event_id = None
+
+
+async def run(args) -> dict:
+    token = session_cookie(args.database_url, args.username)
+    limits = httpx.Limits(max_connections=args.clients + 10)
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits, cookies={"session": token}) as client:
+        received: dict[int, list[float]] = {}
+        ready = asyncio.Event()
+        counter = [0, args.clients]
+        listeners = [
+            asyncio.create_task(listen(client, "/api/events/orders", {}, received, ready, counter))
+            for _ in range(args.clients)
+        ]
+        await asyncio.wait_for(ready.wait(), 60)
+        await asyncio.sleep(0.5)
+        before = await pool_requests(client)
+
+        sent: dict[int, float] = {}
+        api_calls = 0
+        refused = 0
+        first_event = None
+        for _ in range(args.rounds):
+            resp = await client.post(
+                "/api/orders", json={"customer": {"name": "events-bench", "phone": "eb"}, "items": [{"sku": "shirt", "qty": 1}]}
+            )
+            order_id = resp.json()["order_id"]
+            api_calls += 1
+            for status in WORKFLOW:
+                start = time.perf_counter()
+                resp = await client.post(f"/api/orders/{order_id}/status", json={"status": status})
+                resp.raise_for_status()
+                api_calls += 1
+                event_id = resp.json()["data"]["event_id"]
+                first_event = first_event or event_id
+                sent[event_id] = start
+            resp = await client.post(f"/api/orders/{order_id}/status", json={"status": "canceled"})
+            api_calls += 1
+            refused += resp.status_code == 409
+        await asyncio.sleep(1)
+        after = await pool_requests(client)
+
+        fanout = []
+        delivered_all = 0
+        for event_id, start in sent.items():
+            times = received.get(event_id, [])
+            delivered_all += len(times) == args.clients
+            if times:
+                fanout.append((max(times) - start) * 1000)
+
+        # A reconnecting client replays what it missed from order_events
+        # (create_order's `received` events come back too; only transitions are compared)
+        replayed = set()
+        async with client.stream("GET", "/api/events/orders", headers={"Last-Event-ID": str(first_event - 1)}) as resp:
+            async for line in resp.aiter_lines():
+                if line.startswith("id: "):
+                    replayed.add(int(line[4:]))
+                elif line == ": ping" or replayed >= sent.keys():
+                    break
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    return {
+        "clients": args.clients,
+        "transitions": len(sent),
+        "delivered_to_every_client": delivered_all,
+        "fanout_all_clients_ms": {
+            "p50": round(statistics.median(fanout), 2) if fanout else None,
+            "p95": percentile(fanout, 95),
+            "max": round(max(fanout), 2) if fanout else None,
+        },
+        "pool_checkouts_during_run": after - before,
+        "api_calls_during_run": api_calls,
+        "refused_transitions_409": refused,
+        "replay_ok": replayed >= sent.keys(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--username", default=os.getenv("ADMIN_USERNAME", "admin"), help="the server's ADMIN_USERNAME")
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    ok = result["delivered_to_every_client"] == result["transitions"] and result["replay_ok"]
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Latency and errors per priority class when requests arrive faster than the pool can serve.
+
+Starts the API from --app-dir with its database behind latency_proxy.py
+(--rtt-ms per round trip, so each query holds a pooled connection about
+as long as it would against a remote database) and the catalog cache off.
+It then sends an open-loop mix for --seconds: requests are fired on
+schedule whether or not earlier ones have finished, as real clients do.
+--rate is the total arrivals per second, split into:
+
+- critical: POST /api/orders (1 in 10);
+- normal: GET /api/orders and GET /api/orders/{id} (6 in 10);
+- low: GET /api/product-types and /healthz (3 in 10).
+
+For each class it reports status counts and latency percentiles for all
+responses and for the successful ones. Run it against an older checkout
+to compare, as with bench_startup.py:
+
+    git worktree add /tmp/api-before <rev>
+    python bench/bench_overload.py --app-dir /tmp/api-before/api
+    python bench/bench_overload.py
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_concurrency import percentile  # noqa: E402
+from bench_order_events import session_cookie  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+from latency_proxy import LatencyProxy  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ORDER = {"customer": {"name": "Overload Bench", "phone": "overload-bench"}, "items": [{"sku": "shirt", "qty": 1}]}
+# (class, method, path) in arrival order, repeated
+MIX = [
+    ("critical", "POST", "/api/orders"),
+    ("normal", "GET", "/api/orders?limit=20"),
+    ("low", "GET", "/api/product-types"),
+    ("normal", "GET", "/api/orders/{order_id}"),
+    ("normal", "GET", "/api/orders?limit=20&status=received"),
+    ("low", "GET", "/healthz"),
+    ("normal", "GET", "/api/orders/{order_id}"),
+    ("normal", "GET", "/api/orders?limit=20"),
+    ("low", "GET", "/api/product-types"),
+    ("normal", "GET", "/api/orders/{order_id}"),
+]
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, results: list, level: str) -> None:
+    start = time.perf_counter()
+    try:
+        resp = await client.request(method, path, json=ORDER if method == "POST" else None)
+        status = resp.status_code
+    except httpx.HTTPError as exc:
+        status = type(exc).__name__
+    results.append((level, status, (time.perf_counter() - start) * 1000))
+
+
+async def workload(base_url: str, rate: float, seconds: float, session: str) -> dict:
+    limits = httpx.Limits(max_connections=2000, max_keepalive_connections=200)
+    results: list[tuple[str, object, float]] = []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120, cookies={"session": session}) as client:
+        order_id = (await client.post("/api/orders", json=ORDER)).json()["order_id"]
+        tasks = []
+        start = time.perf_counter()
+        for n in range(int(rate * seconds)):
+            await asyncio.sleep(max(0.0, start + n / rate - time.perf_counter()))
+            level, method, path = MIX[n % len(MIX)]
+            tasks.append(asyncio.create_task(send(client, method, path.format(order_id=order_id), results, level)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    out = {"offered_rps": rate, "elapsed_s": round(elapsed, 1)}
+    for level in ("critical", "normal", "low"):
+        rows = [r for r in results if r[0] == level]
+        ok = [ms for _, status, ms in rows if status == 200]
+        out[level] = {
+            "requests": len(rows),
+            "status": dict(collections.Counter(str(status) for _, status, _ in rows)),
+            "all_ms": {p: percentile([ms for *_, ms in rows], n) for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+            "ok_ms": {p: percentile(ok, n) for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+        }
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--app-dir", default=APP_DIR)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    parser.add_argument("--rate", type=float, default=150, help="arrivals per second, all classes")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--pool-max", type=int, default=5)
+    args = parser.parse_args()
+
+    proxied = LatencyProxy(args.database_url, args.rtt_ms).start()
+    port = free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": proxied,
+        "DB_POOL_MAX": str(args.pool_max),
+        "READ_CACHE_ENABLED": "false",
+        "SESSION_SWEEP_INTERVAL": "3600",
+        "IDEMPOTENCY_SWEEP_INTERVAL": "3600",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=args.app_dir,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            try:
+                if httpx.get(f"{base_url}/healthz").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        out = asyncio.run(workload(base_url, args.rate, args.seconds, session_cookie(args.database_url, "overload-bench")))
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(json.dumps({"rtt_ms": args.rtt_ms, "pool_max": args.pool_max, **out}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Recent-data latency and retention cost with order_events and sessions partitioned, at multi-year volume.
+
+Builds two databases on the server of --database-url, with the same data:
+
+- `laundry_bench_flat`: migrations up to 0007, so order_events and sessions are single tables;
+- `laundry_bench_partitioned`: a copy of the first with 0008 applied (its run time is reported).
+
+The data is --years of history at --orders-per-day, in time order as the API
+writes it: one item and three status events per order, and --users users with
+a session for each of --logins-per-day over the last 40 days (7-day expiry,
+so most have expired and wait for the sweeper). Both databases are then vacuumed
+and analyzed, and the statements from db/queries.sql (for the flat database,
+--flat-queries) are run as prepared statements, as the API runs them:
+
+- order_detail for orders from the last week, and for orders over two years old;
+- order_events_since for an SSE replay of the latest events, for all orders and for one;
+- session_lookup for live tokens;
+- an order_events insert (INSERT_ORDER_EVENT, the same in both).
+
+Each op is reported as median/p99 ms over --queries calls. Then retention:
+removing the oldest month of order_events (DELETE in the flat database,
+`partitions.archive` to a file in the partitioned one), and removing expired sessions
+(the API's batched sweeper, against `partitions.maintain` plus the sweeper), with
+time and WAL written.
+
+    git worktree add /tmp/api-before <rev>
+    python bench/bench_partitions.py --flat-queries /tmp/api-before/api/db/queries.sql
+
+--keep leaves both databases in place and a later run reuses them.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import migrate  # noqa: E402
+import order_feed  # noqa: E402
+import partitions  # noqa: E402
+import statements  # noqa: E402
+from bench_concurrency import percentile  # noqa: E402
+
+FLAT, PARTITIONED = "laundry_bench_flat", "laundry_bench_partitioned"
+SESSION_DAYS = 40
+SWEEP_BATCH = 1000
+INSERT_ORDER_EVENT = """
+INSERT INTO order_events (order_id, status, note, created_by)
+VALUES (%(order_id)s, %(status)s, %(note)s, %(created_by)s)
+RETURNING id, created_at
+"""
+
+
+def database_url(base_url: str, name: str) -> str:
+    return make_conninfo(base_url, dbname=name)
+
+
+def exists(admin: psycopg.Connection, name: str) -> bool:
+    return admin.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,)).fetchone() is not None
+
+
+def populate(conn: psycopg.Connection, years: float, orders_per_day: int) -> dict:
+    days = int(years * 365)
+    total = days * orders_per_day
+    print(f"inserting {total} orders over {days} days...", file=sys.stderr)
+    conn.execute(
+        """
+        INSERT INTO customers (name, phone)
+        SELECT 'partition-bench-' || g, 'pb-' || g FROM generate_series(1, 50000) g
+        ON CONFLICT (name, phone) DO NOTHING
+        """
+    )
+    conn.execute(
+        """
+        WITH c AS (SELECT array_agg(id) AS ids FROM customers WHERE name LIKE 'partition-bench-%%')
+        INSERT INTO orders (customer_id, status, pickup_notes, total_items, total_price_cents, created_at, updated_at)
+        SELECT c.ids[1 + (g::bigint * 7919) %% array_length(c.ids, 1)],
+               (ARRAY['received','in_process','ready','delivered','canceled'])[1 + g %% 5],
+               'partition-bench', 2, 800, t, t
+        FROM c, generate_series(0, %(total)s - 1) g,
+             LATERAL (SELECT NOW() - %(days)s * interval '1 day' + g * (%(days)s * interval '1 day' / %(total)s)) AS at(t)
+        """,
+        {"total": total, "days": days},
+    )
+    conn.execute(
+        """
+        INSERT INTO order_items (order_id, sku, description, qty, unit_price_cents)
+        SELECT id, 'shirt', 'shirt', 2, 400 FROM orders WHERE pickup_notes = 'partition-bench'
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO order_events (order_id, status, note, created_by, created_at)
+        SELECT o.id, s.status, 'synthetic', 'bench', o.created_at + s.after
+        FROM orders o, (VALUES ('received', interval '0'), ('in_process', interval '3 hours'), ('ready', interval '1 day'))
+             AS s(status, after)
+        WHERE o.pickup_notes = 'partition-bench' AND o.created_at + s.after < NOW()
+        ORDER BY o.created_at + s.after
+        """
+    )
+    return {
+        "orders": total,
+        "order_events": conn.execute("SELECT count(*) FROM order_events").fetchone()[0],
+    }
+
+
+def add_sessions(conn: psycopg.Connection, users: int, logins_per_day: int) -> None:
+    conn.execute(
+        """
+        INSERT INTO users (username, password_hash)
+        SELECT 'partition-bench-user-' || g, 'unused' FROM generate_series(1, %s) g
+        ON CONFLICT (username) DO NOTHING
+        """,
+        (users,),
+    )
+    conn.execute(
+        """
+        WITH u AS (SELECT array_agg(user_id) AS ids FROM users WHERE username LIKE 'partition-bench-user-%%')
+        INSERT INTO sessions (session_token, user_id, expires_at, created_at)
+        SELECT md5('partition-bench' || g), u.ids[1 + g %% array_length(u.ids, 1)], t + interval '7 days', t
+        FROM u, generate_series(0, %(total)s - 1) g,
+             LATERAL (SELECT NOW() - %(days)s * interval '1 day' + g * (%(days)s * interval '1 day' / %(total)s)) AS at(t)
+        """,
+        {"total": SESSION_DAYS * logins_per_day, "days": SESSION_DAYS},
+    )
+    if conn.execute("SELECT to_regclass('sessions_default')").fetchone()[0] is not None:
+        # Sessions that expired in earlier months: give them their partitions, as they'd have had
+        conn.execute(
+            """
+            SELECT ensure_month_partition('sessions', m)
+            FROM (SELECT DISTINCT date_trunc('month', expires_at AT TIME ZONE 'UTC')::date AS m FROM sessions_default) s
+            """
+        )
+
+
+def build(admin: psycopg.Connection, base_url: str, args) -> dict:
+    info = {}
+    migrations = migrate.load_migrations()
+    if not exists(admin, FLAT):
+        admin.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(FLAT)))
+        try:
+            with psycopg.connect(database_url(base_url, FLAT), autocommit=True) as conn:
+                migrate.migrate(conn, [m for m in migrations if m.version < 8])
+                populate(conn, args.years, args.orders_per_day)
+        except BaseException:
+            admin.execute(sql.SQL("DROP DATABASE {}").format(sql.Identifier(FLAT)))
+            raise
+    if not exists(admin, PARTITIONED):
+        admin.execute(sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(sql.Identifier(PARTITIONED), sql.Identifier(FLAT)))
+        with psycopg.connect(database_url(base_url, PARTITIONED), autocommit=True) as conn:
+            start = time.perf_counter()
+            migrate.migrate(conn, migrations)
+            info["migration_0008_s"] = round(time.perf_counter() - start, 1)
+    for name in (FLAT, PARTITIONED):
+        with psycopg.connect(database_url(base_url, name), autocommit=True) as conn:
+            if conn.execute("SELECT count(*) FROM sessions").fetchone()[0] == 0:
+                add_sessions(conn, args.users, args.logins_per_day)
+            conn.execute("VACUUM ANALYZE")
+    return info
+
+
+def time_op(conn: psycopg.Connection, query: str, params_list: list[dict]) -> dict:
+    for params in params_list[: max(10, len(params_list) // 10)]:  # warm up and settle on a plan
+        conn.execute(query, params, prepare=True).fetchall()
+    latencies = []
+    for params in params_list:
+        start = time.perf_counter()
+        conn.execute(query, params, prepare=True).fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(latencies), 3), "p99_ms": percentile(latencies, 99)}
+
+
+def latencies(conn: psycopg.Connection, queries: dict[str, statements.Statement], n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    sql_for = {name: statement.sql for name, statement in queries.items()}
+    recent = [r[0] for r in conn.execute(
+        "SELECT id FROM orders WHERE pickup_notes = 'partition-bench' AND created_at > NOW() - interval '7 days'"
+    )]
+    old = [r[0] for r in conn.execute(
+        "SELECT id FROM orders WHERE pickup_notes = 'partition-bench'"
+        " AND created_at BETWEEN NOW() - interval '800 days' AND NOW() - interval '730 days'"
+    )]
+    last_event, = conn.execute("SELECT max(id) FROM order_events").fetchone()
+    tokens = [r[0] for r in conn.execute("SELECT session_token FROM sessions WHERE expires_at > NOW()")]
+    recent.sort()
+    tokens.sort()
+    bounds = order_feed.replay_bounds()  # older queries.sql files ignore these
+    out = {
+        "order_detail (last week)": time_op(conn, sql_for["order_detail"], [{"order_id": rng.choice(recent)} for _ in range(n)]),
+        "order_detail (2 years old)": time_op(conn, sql_for["order_detail"], [{"order_id": rng.choice(old)} for _ in range(n)]),
+        "order_events_since (all orders)": time_op(conn, sql_for["order_events_since"], [
+            {"after": last_event - rng.randint(0, 200), "order_id": None, "limit": 100, **bounds} for _ in range(n)
+        ]),
+        "order_events_since (one order)": time_op(conn, sql_for["order_events_since"], [
+            {"after": last_event - 5000, "order_id": rng.choice(recent), "limit": 100, **bounds} for _ in range(n)
+        ]),
+        "session_lookup": time_op(conn, sql_for["session_lookup"], [{"token": rng.choice(tokens)} for _ in range(n)]),
+        "insert_order_event": time_op(conn, INSERT_ORDER_EVENT, [
+            {"order_id": rng.choice(recent), "status": "ready", "note": "bench", "created_by": "bench"} for _ in range(n)
+        ]),
+    }
+    return out
+
+
+def wal_bytes(conn: psycopg.Connection, since: str) -> int:
+    return int(conn.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s::pg_lsn)", (since,)).fetchone()[0])
+
+
+def sweep_sessions(conn: psycopg.Connection) -> int:
+    """sessions.sweep_expired, on a plain connection."""
+    deleted = 0
+    while True:
+        cur = conn.execute(
+            """
+            DELETE FROM sessions
+            WHERE session_token IN (
+                SELECT session_token FROM sessions WHERE expires_at < NOW()
+                ORDER BY expires_at LIMIT %s FOR UPDATE SKIP LOCKED
+            )
+            """,
+            (SWEEP_BATCH,),
+        )
+        deleted += cur.rowcount
+        if cur.rowcount < SWEEP_BATCH:
+            return deleted
+
+
+def retention(conn: psycopg.Connection, partitioned: bool, archive_dir: Path) -> dict:
+    out = {}
+    oldest = conn.execute("SELECT date_trunc('month', min(created_at) AT TIME ZONE 'UTC')::date FROM order_events").fetchone()[0]
+    lsn = conn.execute("SELECT pg_current_wal_lsn()").fetchone()[0]
+    start = time.perf_counter()
+    if partitioned:
+        archived = partitions.archive(conn, partitions.add_months(oldest, 1), archive_dir)
+        rows = sum(m["rows"] for m in archived)
+        out["archive_file_bytes"] = sum((archive_dir / m["file"]).stat().st_size for m in archived)
+    else:
+        rows = conn.execute(
+            "DELETE FROM order_events WHERE created_at < (%s::date + interval '1 month') AT TIME ZONE 'UTC'", (oldest,)
+        ).rowcount
+    out["oldest_month_events"] = {"rows": rows, "seconds": round(time.perf_counter() - start, 2), "wal_bytes": wal_bytes(conn, lsn)}
+
+    lsn = conn.execute("SELECT pg_current_wal_lsn()").fetchone()[0]
+    start = time.perf_counter()
+    dropped = partitions.maintain(conn)["dropped"] if partitioned else []
+    swept = sweep_sessions(conn)
+    out["expired_sessions"] = {
+        "partitions_dropped": len(dropped),
+        "rows_swept": swept,
+        "seconds": round(time.perf_counter() - start, 2),
+        "wal_bytes": wal_bytes(conn, lsn),
+    }
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), help="any database on the server to use")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--orders-per-day", type=int, default=1500)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--logins-per-day", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--flat-queries", type=Path, default=statements.QUERIES_PATH,
+        help="queries.sql to run against the flat database, e.g. from a checkout before partitioning",
+    )
+    parser.add_argument("--keep", action="store_true", help="leave the databases for the next run (skips retention)")
+    args = parser.parse_args()
+
+    with psycopg.connect(args.database_url, autocommit=True) as admin:
+        out = build(admin, args.database_url, args)
+        archive_dir = Path(tempfile.mkdtemp(prefix="laundry-archive-"))
+        queries = {FLAT: statements.load(args.flat_queries), PARTITIONED: statements.STATEMENTS}
+        try:
+            for name in (FLAT, PARTITIONED):
+                with psycopg.connect(database_url(args.database_url, name), autocommit=True) as conn:
+                    out[name] = {
+                        "order_events": conn.execute("SELECT count(*) FROM order_events").fetchone()[0],
+                        "partitions": len(partitions.month_partitions(conn, "order_events")) if name == PARTITIONED else 0,
+                        "latency": latencies(conn, queries[name], args.queries, args.seed),
+                    }
+                    if not args.keep:
+                        out[name]["retention"] = retention(conn, name == PARTITIONED, archive_dir)
+        finally:
+            shutil.rmtree(archive_dir, ignore_errors=True)
+            if not args.keep:
+                for name in (PARTITIONED, FLAT):
+                    admin.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+    out["settings"] = {k: v for k, v in vars(args).items() if k != "database_url"}
+    print(json.dumps(out, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
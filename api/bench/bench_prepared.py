@@ -0,0 +1,58 @@
+"""Per-execution latency of hot statements, planned every time vs prepared.
+
+Runs two registry statements and a customer upsert (the first step of
+create_order, on its own) --runs times on one connection with prepare=False
+(parse and plan on every call) and with prepare=True (what statements.py
+does), and reports mean milliseconds. The upsert writes one fixed row.
+
+    DATABASE_URL=postgresql://... python bench/bench_prepared.py --runs 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import statements  # noqa: E402
+
+UPSERT_CUSTOMER = """
+INSERT INTO customers (name, phone, email, address)
+VALUES (%(name)s, %(phone)s, %(email)s, %(address)s)
+ON CONFLICT (name, phone) DO UPDATE SET email = EXCLUDED.email, address = EXCLUDED.address
+RETURNING id
+"""
+HOT = {
+    "session_lookup": (statements.STATEMENTS["session_lookup"].sql, {"token": "bench-prepared-no-such-token"}),
+    "list_product_types": (statements.STATEMENTS["list_product_types"].sql, None),
+    "upsert_customer": (UPSERT_CUSTOMER, {"name": "bench-prepared", "phone": "0", "email": None, "address": None}),
+}
+
+
+def mean_ms(conn: psycopg.Connection, sql: str, params, runs: int, prepare: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        conn.execute(sql, params, prepare=prepare).fetchall()
+    return round((time.perf_counter() - start) * 1000 / runs, 4)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        for name, (sql, params) in HOT.items():
+            mean_ms(conn, sql, params, 10, True)  # warm caches either way
+            print(json.dumps({
+                "statement": name,
+                "unprepared_ms": mean_ms(conn, sql, params, args.runs, False),
+                "prepared_ms": mean_ms(conn, sql, params, args.runs, True),
+            }))
+
+
+if __name__ == "__main__":
+    main()
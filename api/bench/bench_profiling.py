@@ -0,0 +1,101 @@
+"""What the request profiler costs, switched off and on.
+
+- in-process: a `profiling.record` call outside a profiled request (what
+  the pool, bcrypt and Google hooks pay with PROFILE_ENABLED=false),
+  against an empty function call;
+- end to end: uvicorn started with PROFILE_ENABLED=false and =true
+  (SLOW_REQUEST_MS high enough that nothing is logged), with sequential
+  requests to each --path reported as median/p99 latency and server CPU
+  per request.
+
+    python bench/bench_profiling.py --requests 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import profiling  # noqa: E402
+from bench_catalog_responses import cpu_seconds  # noqa: E402
+from bench_concurrency import percentile  # noqa: E402
+from bench_order_events import session_cookie  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ORDER = {"customer": {"name": "Profiling Bench", "phone": "profiling-bench"}, "items": [{"sku": "shirt", "qty": 1}]}
+
+
+def record_overhead_ns(n: int) -> dict:
+    def noop(kind, what, started):
+        pass
+
+    started = time.perf_counter()
+    empty = min(timeit.repeat(lambda: noop("db", "x", started), number=n, repeat=5)) / n * 1e9
+    record = min(timeit.repeat(lambda: profiling.record("db", "x", started), number=n, repeat=5)) / n * 1e9
+    return {"empty_call_ns": round(empty, 1), "record_ns": round(record, 1)}
+
+
+def end_to_end(enabled: bool, paths: list[str], n: int, session: str) -> dict:
+    port = free_port()
+    env = {**os.environ, "PROFILE_ENABLED": "true" if enabled else "false", "SLOW_REQUEST_MS": "60000"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+    )
+    out = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", cookies={"session": session}) as client:
+            for _ in range(600):
+                try:
+                    if client.get("/healthz").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            for path in paths:
+                method, _, url = path.partition(" ")
+                body = ORDER if method == "POST" else None
+                for _ in range(100):
+                    client.request(method, url, json=body)
+                latencies = []
+                cpu = cpu_seconds(proc.pid)
+                for _ in range(n):
+                    start = time.perf_counter()
+                    client.request(method, url, json=body).raise_for_status()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                out[path] = {
+                    "median_ms": round(statistics.median(latencies), 3),
+                    "p99_ms": percentile(latencies, 99),
+                    "server_cpu_ms": round((cpu_seconds(proc.pid) - cpu) * 1000 / n, 3),
+                }
+    finally:
+        proc.terminate()
+        proc.wait()
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--path", action="append", help='"METHOD /path"; repeatable')
+    args = parser.parse_args()
+    paths = args.path or ["GET /api/orders?limit=20", "POST /api/orders"]
+
+    session = session_cookie(os.environ["DATABASE_URL"], "profiling-bench")
+    out = {"in_process": record_overhead_ns(1_000_000)}
+    out["profiling_off"] = end_to_end(False, paths, args.requests, session)
+    out["profiling_on"] = end_to_end(True, paths, args.requests, session)
+    print(json.dumps(out, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Cold-start time: process launch until /healthz answers.
+
+Starts uvicorn --runs times against a Postgres reached through a proxy that
+adds --rtt-ms per round-trip (roughly Cloud Run to Cloud SQL) and reports
+the median, plus the time spent in the app's startup hook alone (measured
+in a fresh interpreter, excluding imports). Point --app-dir at a checkout of
+an older revision to compare, e.g. one that still runs DDL at startup:
+
+    git worktree add /tmp/api-before <rev>
+    python bench/bench_startup.py --rtt-ms 3 --app-dir /tmp/api-before/api
+    python bench/bench_startup.py --rtt-ms 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from latency_proxy import LatencyProxy  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_once(app_dir: str, database_url: str, timeout: float) -> float:
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "READ_CACHE_ENABLED": "false"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port)],
+        cwd=app_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as resp:
+                    if resp.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not become healthy in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def hook_child(app_dir: str) -> None:
+    """Run in a subprocess: import the app, then time only its startup hook."""
+    sys.path.insert(0, app_dir)
+    import app
+
+    async def timed() -> float:
+        start = time.perf_counter()
+        await app.app.router.startup()
+        elapsed = time.perf_counter() - start
+        await app.app.router.shutdown()
+        return elapsed
+
+    print(asyncio.run(timed()) * 1000)
+
+
+def hook_once(app_dir: str, database_url: str) -> float:
+    env = {**os.environ, "DATABASE_URL": database_url, "READ_CACHE_ENABLED": "false", "PYTHONPATH": ""}
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--hook-child", app_dir],
+        cwd=app_dir,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    if len(sys.argv) == 3 and sys.argv[1] == "--hook-child":
+        hook_child(sys.argv[2])
+        return
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--app-dir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    parser.add_argument("--rtt-ms", type=float, default=3.0)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    database_url = LatencyProxy(args.database_url, args.rtt_ms).start() if args.rtt_ms else args.database_url
+    times = [start_once(args.app_dir, database_url, args.timeout) for _ in range(args.runs)]
+    hooks = [hook_once(args.app_dir, database_url) for _ in range(args.runs)]
+    print(json.dumps({
+        "app_dir": os.path.abspath(args.app_dir),
+        "rtt_ms": args.rtt_ms,
+        "runs": args.runs,
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "max_ms": round(max(times), 1),
+        "startup_hook_median_ms": round(statistics.median(hooks), 1),
+    }))
+
+
+if __name__ == "__main__":
+    main()
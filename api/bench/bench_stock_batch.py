@@ -0,0 +1,54 @@
+"""Supplier intake: one /api/stock/add call per SKU versus a single /api/stock/batch.
+
+Creates --skus product types on a running server, then records the same
+intake both ways and reports wall time. Writes real rows.
+
+    python bench/bench_stock_batch.py --url http://localhost:8080 --skus 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+async def run(url: str, skus: int) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        ids = []
+        for i in range(skus):
+            resp = await client.post("/api/product-types", json={"description": f"bench-intake-{i}"})
+            ids.append(resp.json()["data"]["id"])
+
+        start = time.perf_counter()
+        for product_type_id in ids:
+            resp = await client.post("/api/stock/add", json={"product_type_id": product_type_id, "quantity": 10})
+            resp.raise_for_status()
+        per_item_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        resp = await client.post(
+            "/api/stock/batch",
+            json={"items": [{"product_type_id": pid, "delta": 10} for pid in ids], "reason": "intake"},
+        )
+        resp.raise_for_status()
+        batch_ms = (time.perf_counter() - start) * 1000
+    return {
+        "skus": skus,
+        "per_item_requests": skus,
+        "per_item_ms": round(per_item_ms, 1),
+        "batch_requests": 1,
+        "batch_ms": round(batch_ms, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--skus", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.url, args.skus))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Concurrency stress test for stock adjustments on a single hot product.
+
+For each --writers count, that many tasks hammer one fresh product type with
+a random mix of additions and subtractions for --seconds, while the
+compactor runs every --compact-every seconds. Two paths:
+
+- ledger: stock_ledger.add / subtract (what the API uses)
+- legacy: the previous handler's SELECT, then UPDATE ... - qty, unlocked
+
+Afterwards the final level is checked against the sum of the deltas every
+writer was told were applied (no lost updates), and against zero (no
+overselling). Writes real rows.
+
+    python bench/bench_stock_ledger.py --writers 1 8 32 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+from psycopg_pool import AsyncConnectionPool
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import stock_ledger  # noqa: E402
+
+START_LEVEL = 100
+
+
+async def new_product(pool: AsyncConnectionPool, label: str) -> int:
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            """
+            WITH product AS (
+                INSERT INTO product_types (description) VALUES (%s) RETURNING product_type_id
+            ), stock_row AS (
+                INSERT INTO stock (product_type_id, available_quantity) SELECT product_type_id, %s FROM product
+            )
+            SELECT product_type_id FROM product
+            """,
+            (label, START_LEVEL),
+        )
+        return (await cur.fetchone())[0]
+
+
+async def ledger_op(conn, product_type_id: int, delta: int) -> bool:
+    try:
+        if delta > 0:
+            await stock_ledger.add(conn, product_type_id, delta, "bench")
+        else:
+            await stock_ledger.subtract(conn, product_type_id, -delta, "bench")
+        return True
+    except stock_ledger.InsufficientStock:
+        return False
+
+
+async def legacy_op(conn, product_type_id: int, delta: int) -> bool:
+    if delta > 0:
+        await conn.execute(
+            "UPDATE stock SET available_quantity = available_quantity + %s WHERE product_type_id = %s",
+            (delta, product_type_id),
+        )
+        return True
+    cur = await conn.execute("SELECT available_quantity FROM stock WHERE product_type_id = %s", (product_type_id,))
+    if (await cur.fetchone())[0] + delta < 0:
+        return False
+    await conn.execute(
+        "UPDATE stock SET available_quantity = available_quantity + %s WHERE product_type_id = %s",
+        (delta, product_type_id),
+    )
+    return True
+
+
+async def level(pool: AsyncConnectionPool, mode: str, product_type_id: int) -> int:
+    table = "stock_levels" if mode == "ledger" else "stock"
+    async with pool.connection() as conn:
+        cur = await conn.execute(f"SELECT available_quantity FROM {table} WHERE product_type_id = %s", (product_type_id,))
+        return (await cur.fetchone())[0]
+
+
+async def run_one(pool: AsyncConnectionPool, mode: str, writers: int, seconds: float, compact_every: float) -> dict:
+    product_type_id = await new_product(pool, f"bench-stock-{mode}-{writers}")
+    op = ledger_op if mode == "ledger" else legacy_op
+    applied = [0] * writers
+    counts = {"ok": 0, "rejected": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def writer(i: int) -> None:
+        rng = random.Random(i)
+        while time.perf_counter() < deadline:
+            delta = rng.choice((1, 2, 3)) * rng.choice((1, -1))
+            async with pool.connection() as conn:
+                ok = await op(conn, product_type_id, delta)
+            counts["ok" if ok else "rejected"] += 1
+            if ok:
+                applied[i] += delta
+
+    async def compactor() -> None:
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(compact_every)
+            if mode == "ledger":
+                await stock_ledger.compact(pool)
+
+    await asyncio.gather(compactor(), *(writer(i) for i in range(writers)))
+    if mode == "ledger":
+        await stock_ledger.compact(pool)
+    final = await level(pool, mode, product_type_id)
+    expected = START_LEVEL + sum(applied)
+    return {
+        "mode": mode,
+        "writers": writers,
+        "ops_per_s": round((counts["ok"] + counts["rejected"]) / seconds, 1),
+        "applied": counts["ok"],
+        "rejected": counts["rejected"],
+        "final_level": final,
+        "expected_level": expected,
+        "lost_updates": expected != final,
+        "went_negative": final < 0,
+    }
+
+
+async def run(args) -> list[dict]:
+    pool = AsyncConnectionPool(
+        args.database_url, min_size=1, max_size=max(args.writers) + 1, kwargs={"autocommit": True}, open=False
+    )
+    await pool.open()
+    try:
+        results = []
+        for mode in args.modes:
+            for writers in args.writers:
+                results.append(await run_one(pool, mode, writers, args.seconds, args.compact_every))
+        return results
+    finally:
+        await pool.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--modes", nargs="+", choices=["ledger", "legacy"], default=["ledger", "legacy"])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--compact-every", type=float, default=0.5)
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    for result in results:
+        print(json.dumps(result))
+    if any(r["mode"] == "ledger" and (r["lost_updates"] or r["went_negative"]) for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""Reproducible load test: throwaway Postgres, seeded data, mixed workload.
+
+`run` starts a private Postgres cluster (initdb + pg_ctl in a temp dir),
+applies migrations and db/seed.sql, tops it up with synthetic data
+(--customers, --orders with items and events, product types with stock,
+login users), starts the API under uvicorn and drives a closed-loop mix of
+catalog/stock/order reads, create_order, stock adjustments and logins from
+--concurrency clients. Each request's op is drawn from a seeded RNG, so
+two runs issue the same sequence. Results (throughput and p50/p95/p99 per
+route, plus commit, dataset and settings) are written as JSON.
+
+`compare` diffs two result files route by route and exits 1 when any
+route's p95 grew by more than --threshold percent.
+
+    python bench/bench_suite.py run --output before.json
+    git checkout <other>; python bench/bench_suite.py run --output after.json
+    python bench/bench_suite.py compare before.json after.json
+
+Pass --database-url to use an existing scratch database instead of a
+throwaway cluster (synthetic rows are added, never removed, and reused on
+the next run). initdb refuses to run as root.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import migrate  # noqa: E402
+import passwords  # noqa: E402
+from bench_concurrency import percentile  # noqa: E402
+from bench_order_events import session_cookie  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+
+APP_DIR = Path(__file__).resolve().parent.parent
+PASSWORD = "bench-password"
+
+# Relative weights per op; each op maps to one route.
+WORKLOADS = {
+    "mixed": {
+        "catalog": 30,
+        "stock_read": 10,
+        "order_detail": 15,
+        "order_list": 10,
+        "create_order": 15,
+        "stock_add": 8,
+        "stock_subtract": 7,
+        "login": 5,
+    },
+    "reads": {"catalog": 40, "stock_read": 20, "order_detail": 25, "order_list": 15},
+    "writes": {"create_order": 50, "stock_add": 25, "stock_subtract": 25},
+    "login": {"login": 1},
+}
+
+
+class ThrowawayPostgres:
+    """A private cluster on a Unix socket in a temp dir, deleted on stop()."""
+
+    def __init__(self, bin_dir: str | None):
+        self.bin_dir = Path(bin_dir) if bin_dir else self._find_bin_dir()
+        self.root = Path(tempfile.mkdtemp(prefix="laundry-bench-"))
+        self.data = self.root / "data"
+
+    @staticmethod
+    def _find_bin_dir() -> Path:
+        pg_ctl = shutil.which("pg_ctl")
+        if pg_ctl:
+            return Path(pg_ctl).parent
+        pg_config = shutil.which("pg_config")
+        if pg_config:
+            return Path(subprocess.check_output([pg_config, "--bindir"], text=True).strip())
+        raise SystemExit("pg_ctl not found; pass --pg-bin")
+
+    def start(self) -> str:
+        subprocess.run(
+            [self.bin_dir / "initdb", "-D", self.data, "-U", "postgres", "-A", "trust", "--no-sync"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        options = f"-k {self.root} -c listen_addresses='' -c max_connections=200"
+        subprocess.run(
+            [self.bin_dir / "pg_ctl", "-D", self.data, "-l", self.root / "postgres.log", "-o", options, "-w", "start"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        with psycopg.connect(f"postgresql://postgres@/postgres?host={self.root}", autocommit=True) as conn:
+            conn.execute("CREATE DATABASE laundry")
+        return f"postgresql://postgres@/laundry?host={self.root}"
+
+    def stop(self) -> None:
+        subprocess.run([self.bin_dir / "pg_ctl", "-D", self.data, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def seed(database_url: str, customers: int, orders: int, products: int, users: int) -> dict:
+    """Apply migrations and seed.sql, then top up synthetic rows to the requested counts."""
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        migrate.migrate(conn)
+        if conn.execute("SELECT count(*) FROM customers WHERE name = 'Walk-in Customer'").fetchone()[0] == 0:
+            conn.execute((APP_DIR / "db" / "seed.sql").read_text())
+
+        have = conn.execute("SELECT count(*) FROM customers WHERE name LIKE 'bench-customer-%'").fetchone()[0]
+        conn.execute(
+            """
+            INSERT INTO customers (name, phone, email)
+            SELECT 'bench-customer-' || g, 'bc-' || g, 'bench' || g || '@example.com'
+            FROM generate_series(%s::int, %s::int) g
+            ON CONFLICT (name, phone) DO NOTHING
+            """,
+            (have + 1, customers),
+        )
+
+        have = conn.execute("SELECT count(*) FROM orders WHERE pickup_notes = 'bench'").fetchone()[0]
+        if orders > have:
+            print(f"inserting {orders - have} synthetic orders...", file=sys.stderr)
+            conn.execute(
+                """
+                WITH c AS (SELECT array_agg(id) AS ids FROM customers WHERE name LIKE 'bench-customer-%%'),
+                new_orders AS (
+                    INSERT INTO orders (customer_id, status, pickup_notes, total_items, total_price_cents, created_at)
+                    SELECT c.ids[1 + (g::bigint * 7919) %% array_length(c.ids, 1)],
+                           (ARRAY['received','in_process','ready','delivered','canceled'])[1 + g %% 5],
+                           'bench', 3, 1600, NOW() - (g * interval '30 seconds')
+                    FROM c, generate_series(%s::int, %s::int) g
+                    RETURNING id, status, created_at
+                ), items AS (
+                    INSERT INTO order_items (order_id, sku, description, qty, unit_price_cents)
+                    SELECT id, i.sku, i.sku, i.qty, i.price
+                    FROM new_orders, (VALUES ('shirt', 2, 400), ('pants', 1, 800)) AS i(sku, qty, price)
+                )
+                INSERT INTO order_events (order_id, status, note, created_by, created_at)
+                SELECT id, status, 'synthetic', 'bench', created_at FROM new_orders
+                """,
+                (have + 1, orders),
+            )
+
+        have = conn.execute("SELECT count(*) FROM product_types WHERE description LIKE 'bench-product-%'").fetchone()[0]
+        conn.execute(
+            """
+            WITH p AS (
+                INSERT INTO product_types (description, unit_price_cents)
+                SELECT 'bench-product-' || g, 100 * g FROM generate_series(%s::int, %s::int) g
+                RETURNING product_type_id
+            )
+            INSERT INTO stock (product_type_id, available_quantity)
+            SELECT product_type_id, 1000000 FROM p
+            """,
+            (have + 1, products),
+        )
+
+        have = conn.execute("SELECT count(*) FROM users WHERE username LIKE 'bench-user-%'").fetchone()[0]
+        if users > have:
+            # One hash with the app's settings, shared by every bench user
+            conn.execute(
+                """
+                INSERT INTO users (username, password_hash)
+                SELECT 'bench-user-' || g, %s FROM generate_series(%s::int, %s::int) g
+                ON CONFLICT (username) DO NOTHING
+                """,
+                (passwords.hash_password(PASSWORD), have + 1, users),
+            )
+        conn.execute("ANALYZE")
+
+        return {
+            "customers": conn.execute("SELECT count(*) FROM customers").fetchone()[0],
+            "orders": conn.execute("SELECT count(*) FROM orders").fetchone()[0],
+            "order_ids": conn.execute("SELECT min(id), max(id) FROM orders WHERE pickup_notes = 'bench'").fetchone(),
+            "product_type_ids": [r[0] for r in conn.execute(
+                "SELECT product_type_id FROM product_types WHERE description LIKE 'bench-product-%' AND active"
+            )],
+            "users": users,
+            "postgres": conn.execute("SHOW server_version").fetchone()[0],
+        }
+
+
+class Workload:
+    """Builds requests for each op. All randomness comes from the caller's RNG."""
+
+    def __init__(self, dataset: dict, customers: int, users: int):
+        self.order_ids = dataset["order_ids"]
+        self.products = dataset["product_type_ids"]
+        self.customers = customers
+        self.users = users
+
+    def request(self, op: str, rng: random.Random) -> tuple[str, str, str, dict | None]:
+        """Return (route label, method, url, json body)."""
+        if op == "catalog":
+            return "GET /api/product-types", "GET", "/api/product-types", None
+        if op == "stock_read":
+            return "GET /api/stock", "GET", "/api/stock", None
+        if op == "order_detail":
+            order_id = rng.randint(*self.order_ids)
+            return "GET /api/orders/{order_id}", "GET", f"/api/orders/{order_id}", None
+        if op == "order_list":
+            status = rng.choice(("", "?status=received", "?status=ready"))
+            return "GET /api/orders", "GET", f"/api/orders{status}", None
+        if op == "create_order":
+            n = rng.randint(1, self.customers)
+            items = [
+                {"sku": rng.choice(("shirt", "pants", "towel", "sheet")), "qty": rng.randint(1, 5), "unit_price_cents": 400}
+                for _ in range(rng.randint(1, 4))
+            ]
+            body = {"customer": {"name": f"bench-customer-{n}", "phone": f"bc-{n}"}, "items": items}
+            return "POST /api/orders", "POST", "/api/orders", body
+        if op in ("stock_add", "stock_subtract"):
+            body = {"product_type_id": rng.choice(self.products), "quantity": rng.randint(1, 5), "reason": "bench"}
+            path = "/api/stock/add" if op == "stock_add" else "/api/stock/subtract"
+            return f"POST {path}", "POST", path, body
+        if op == "login":
+            body = {"username": f"bench-user-{rng.randint(1, self.users)}", "password": PASSWORD}
+            return "POST /api/auth/login", "POST", "/api/auth/login", body
+        raise ValueError(f"unknown op {op}")
+
+
+async def drive(base_url: str, workload: Workload, weights: dict, concurrency: int, warmup: float, duration: float, seed_value: int, session: str) -> tuple[dict, float]:
+    ops, op_weights = zip(*weights.items())
+    samples: dict[str, list[float]] = {}
+    errors: dict[str, dict[str, int]] = {}
+    measuring = False
+
+    async def client_loop(index: int, stop_at: float) -> None:
+        rng = random.Random(seed_value * 1000 + index)
+        async with httpx.AsyncClient(base_url=base_url, timeout=30, cookies={"session": session}) as client:
+            while time.perf_counter() < stop_at:
+                label, method, url, body = workload.request(rng.choices(ops, op_weights)[0], rng)
+                start = time.perf_counter()
+                try:
+                    resp = await client.request(method, url, json=body)
+                    status = str(resp.status_code)
+                except httpx.HTTPError as exc:
+                    status = type(exc).__name__
+                elapsed = (time.perf_counter() - start) * 1000
+                if not measuring:
+                    continue
+                if status.startswith("2"):
+                    samples.setdefault(label, []).append(elapsed)
+                else:
+                    route_errors = errors.setdefault(label, {})
+                    route_errors[status] = route_errors.get(status, 0) + 1
+
+    start = time.perf_counter()
+    stop_at = start + warmup + duration
+    tasks = [asyncio.create_task(client_loop(i, stop_at)) for i in range(concurrency)]
+    await asyncio.sleep(warmup)
+    measuring = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - measured_from
+
+    routes = {}
+    for label in sorted(set(samples) | set(errors)):
+        latencies = samples.get(label, [])
+        routes[label] = {
+            "ok": len(latencies),
+            "errors": errors.get(label, {}),
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": round(max(latencies), 2) if latencies else 0.0,
+        }
+    return routes, elapsed
+
+
+def start_server(database_url: str, workers: int) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {**os.environ, "DATABASE_URL": database_url, "METRICS_TOKEN": ""}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/healthz", timeout=1).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise SystemExit("server did not become healthy")
+
+
+def git_revision() -> dict:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=APP_DIR, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def run(args: argparse.Namespace) -> None:
+    weights = WORKLOADS[args.workload]
+    cluster = None
+    database_url = args.database_url
+    if not database_url:
+        cluster = ThrowawayPostgres(args.pg_bin)
+        database_url = cluster.start()
+    try:
+        seed_start = time.perf_counter()
+        dataset = seed(database_url, args.customers, args.orders, args.products, args.users)
+        seed_seconds = time.perf_counter() - seed_start
+        proc, base_url = start_server(database_url, args.workers)
+        try:
+            workload = Workload(dataset, args.customers, args.users)
+            session = session_cookie(database_url, "suite-bench")
+            routes, elapsed = asyncio.run(
+                drive(base_url, workload, weights, args.concurrency, args.warmup, args.duration, args.seed, session)
+            )
+        finally:
+            proc.terminate()
+            proc.wait()
+    finally:
+        if cluster is not None:
+            cluster.stop()
+
+    ok = sum(r["ok"] for r in routes.values())
+    failed = sum(sum(r["errors"].values()) for r in routes.values())
+    result = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "postgres": dataset["postgres"],
+            "cpus": os.cpu_count(),
+            "throwaway_cluster": cluster is not None,
+        },
+        "settings": {
+            "workload": args.workload,
+            "weights": weights,
+            "concurrency": args.concurrency,
+            "warmup_s": args.warmup,
+            "duration_s": args.duration,
+            "workers": args.workers,
+            "seed": args.seed,
+            "customers": args.customers,
+            "orders": args.orders,
+            "products": args.products,
+            "users": args.users,
+        },
+        "dataset": {k: dataset[k] for k in ("customers", "orders", "users")} | {"products": len(dataset["product_type_ids"])},
+        "seed_seconds": round(seed_seconds, 1),
+        "total": {"ok": ok, "errors": failed, "rps": round(ok / elapsed, 1)},
+        "routes": routes,
+    }
+    text = json.dumps(result, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    print(text)
+
+
+def compare(args: argparse.Namespace) -> None:
+    base = json.loads(Path(args.base).read_text())
+    new = json.loads(Path(args.new).read_text())
+    print(f"base {base['meta']['commit'][:10]}  new {new['meta']['commit'][:10]}")
+    if base["settings"] != new["settings"]:
+        print("warning: runs used different settings", file=sys.stderr)
+    print(f"{'route':34} {'rps':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+    regressed = []
+    for label in sorted(set(base["routes"]) | set(new["routes"])):
+        b, n = base["routes"].get(label), new["routes"].get(label)
+        if b is None or n is None:
+            print(f"{label:34} only in {'new' if b is None else 'base'}")
+            continue
+        cells = [f"{b[k]:>7} -> {n[k]:<6}" for k in ("rps", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{label:34} {' '.join(cells)}")
+        if b["p95_ms"] and (n["p95_ms"] - b["p95_ms"]) / b["p95_ms"] * 100 > args.threshold:
+            regressed.append(label)
+    if regressed:
+        print(f"p95 regressed by more than {args.threshold}%: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="seed a database, load the API, write results")
+    run_parser.add_argument("--database-url", help="existing scratch database (default: throwaway cluster)")
+    run_parser.add_argument("--pg-bin", help="directory with initdb/pg_ctl (default: from PATH or pg_config)")
+    run_parser.add_argument("--customers", type=int, default=100_000)
+    run_parser.add_argument("--orders", type=int, default=1_000_000)
+    run_parser.add_argument("--products", type=int, default=50)
+    run_parser.add_argument("--users", type=int, default=20)
+    run_parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--warmup", type=float, default=5)
+    run_parser.add_argument("--duration", type=float, default=30)
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", help="write the JSON result here as well as stdout")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub.add_parser("compare", help="diff two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="allowed p95 growth, percent")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
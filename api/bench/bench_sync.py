@@ -0,0 +1,233 @@
+"""What a store tablet downloads to stay current, and whether delta sync misses anything.
+
+Starts the API and, for a few rounds of typical activity between two loads
+(nothing, one stock adjustment, a handful of orders and stock changes, a
+product disabled), reports the response body bytes of
+
+- refetching the lists the pages load today: /api/product-types,
+  /api/stock and /api/orders?limit=--orders-limit, plain and revalidated
+  with If-None-Match;
+- GET /api/sync?since=<previous watermark>.
+
+Then it checks the watermark: writers add stock, create orders and move
+them along (one holding its transaction open for several syncs)
+while a client syncs every --interval seconds and applies each delta. At
+the end the client's product types and stock must equal a fresh full sync,
+and every order it has seen (the slow writer's included) must have its
+current status; exit 1 if not.
+
+Writes rows (`sync-bench-*`); use a scratch database.
+
+    python bench/bench_sync.py --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_order_events import session_cookie  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LISTS = ["/api/product-types", "/api/stock"]
+
+
+def order_payload(n: int) -> dict:
+    return {"customer": {"name": f"sync-bench-{n}", "phone": f"sync-bench-{n % 50}"}, "items": [{"sku": "shirt", "qty": 1}]}
+
+
+class Tablet:
+    """Client-side state kept current through /api/sync."""
+
+    def __init__(self, client: httpx.Client):
+        self.client = client
+        self.watermark = None
+        self.products: dict[int, dict] = {}
+        self.stock: dict[int, dict] = {}
+        self.orders: dict[int, dict] = {}
+        self.full_syncs = 0
+
+    def sync(self) -> int:
+        res = self.client.get("/api/sync", params={"since": self.watermark} if self.watermark else None)
+        res.raise_for_status()
+        body = res.json()
+        if body["full"]:
+            self.full_syncs += 1
+            self.products, self.stock = {}, {}
+        self.products.update((p["id"], p) for p in body["product_types"])
+        self.stock.update((s["product_type_id"], s) for s in body["stock"])
+        for product_id in body["deleted_product_types"]:
+            self.products.pop(product_id, None)
+            self.stock.pop(product_id, None)
+        self.orders.update((o["id"], o) for o in body["orders"])
+        self.watermark = body["watermark"]
+        return len(res.content)
+
+
+def list_bytes(client: httpx.Client, orders_limit: int, etags: dict) -> tuple[int, int]:
+    plain = revalidated = 0
+    for path in LISTS + [f"/api/orders?limit={orders_limit}"]:
+        res = client.get(path)
+        res.raise_for_status()
+        plain += len(res.content)
+        headers = {"If-None-Match": etags[path]} if path in etags else {}
+        res = client.get(path, headers=headers)
+        revalidated += len(res.content)
+        if "etag" in res.headers:
+            etags[path] = res.headers["etag"]
+    return plain, revalidated
+
+
+def payload_rounds(client: httpx.Client, db: psycopg.Connection, orders_limit: int) -> list[dict]:
+    product_ids = [row[0] for row in db.execute("SELECT product_type_id FROM product_types WHERE active LIMIT 20")]
+    created = db.execute("SELECT count(*) FROM orders").fetchone()[0]
+
+    def adjust(n):
+        for _ in range(n):
+            client.post("/api/stock/add", json={"product_type_id": random.choice(product_ids), "quantity": 1}).raise_for_status()
+
+    def orders_and_stock(n):
+        nonlocal created
+        for _ in range(n):
+            created += 1
+            client.post("/api/orders", json=order_payload(created)).raise_for_status()
+        adjust(n)
+
+    def disable(_):
+        res = client.post("/api/product-types", json={"description": f"sync-bench-{time.time_ns()}", "unit_price_cents": 1})
+        client.post("/api/product-types/disable", json={"product_type_id": res.json()["data"]["id"]}).raise_for_status()
+
+    tablet, etags = Tablet(client), {}
+    tablet.sync()
+    list_bytes(client, orders_limit, etags)
+    out = []
+    for name, change, n in [
+        ("nothing changed", adjust, 0),
+        ("1 stock adjustment", adjust, 1),
+        ("5 orders + 5 stock adjustments", orders_and_stock, 5),
+        ("1 product added and disabled", disable, 1),
+    ]:
+        change(n)
+        plain, revalidated = list_bytes(client, orders_limit, etags)
+        out.append({"between_loads": name, "lists_bytes": plain, "lists_if_none_match_bytes": revalidated, "sync_bytes": tablet.sync()})
+    return out
+
+
+def writer(base_url: str, dsn: str, stop: threading.Event, seed: int) -> None:
+    rng = random.Random(seed)
+    with httpx.Client(base_url=base_url) as client, psycopg.connect(dsn, autocommit=True) as db:
+        product_ids = [row[0] for row in db.execute("SELECT product_type_id FROM product_types WHERE active LIMIT 20")]
+        while not stop.is_set():
+            action = rng.random()
+            if action < 0.4:
+                client.post("/api/stock/add", json={"product_type_id": rng.choice(product_ids), "quantity": 1})
+            elif action < 0.7:
+                client.post("/api/orders", json=order_payload(rng.randrange(10**9)))
+            else:
+                db.execute(
+                    """
+                    UPDATE orders SET status = CASE status WHEN 'received' THEN 'in_process' WHEN 'in_process' THEN 'ready' ELSE 'delivered' END
+                    WHERE id = (SELECT id FROM orders WHERE status IN ('received', 'in_process', 'ready') ORDER BY id DESC LIMIT 1 OFFSET %s)
+                    """,
+                    (rng.randrange(20),),
+                )
+            time.sleep(rng.random() * 0.02)
+
+
+def slow_writer(dsn: str, stop: threading.Event, hold: float) -> int:
+    """One transaction that writes early and commits `hold` seconds later."""
+    with psycopg.connect(dsn) as db:
+        row = db.execute(
+            "UPDATE orders SET status = 'in_process' WHERE id = (SELECT max(id) FROM orders WHERE status = 'received') RETURNING id"
+        ).fetchone()
+        stop.wait(hold)
+        db.commit()
+    return row[0]
+
+
+def consistency(base_url: str, dsn: str, seconds: float, interval: float, hold: float) -> dict:
+    stop = threading.Event()
+    threads = [threading.Thread(target=writer, args=(base_url, dsn, stop, seed)) for seed in range(2)]
+    slow = {}
+    threads.append(threading.Thread(target=lambda: slow.setdefault("id", slow_writer(dsn, threading.Event(), hold))))
+    with httpx.Client(base_url=base_url) as client:
+        tablet = Tablet(client)
+        tablet.sync()
+        for thread in threads:
+            thread.start()
+        syncs, sync_bytes = 0, 0
+        deadline = time.monotonic() + max(seconds, hold + 1)
+        while time.monotonic() < deadline:
+            sync_bytes += tablet.sync()
+            syncs += 1
+            time.sleep(interval)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        time.sleep(0.2)
+        tablet.sync()
+
+        fresh = client.get("/api/sync").json()
+    with psycopg.connect(dsn) as db:
+        statuses = dict(db.execute("SELECT id, status FROM orders WHERE id = ANY(%s)", (list(tablet.orders),)).fetchall())
+    stale_orders = [i for i, o in tablet.orders.items() if statuses.get(i) != o["status"]]
+    products_ok = tablet.products == {p["id"]: p for p in fresh["product_types"]}
+    stock_ok = tablet.stock == {s["product_type_id"]: s for s in fresh["stock"]}
+    return {
+        "syncs": syncs,
+        "avg_sync_bytes": round(sync_bytes / syncs),
+        "full_syncs_after_first": tablet.full_syncs - 1,
+        "orders_seen": len(tablet.orders),
+        "slow_writer_order_tracked": slow["id"] in tablet.orders,
+        "stale_orders": stale_orders[:10],
+        "product_types_match": products_ok,
+        "stock_matches": stock_ok,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders-limit", type=int, default=50, help="page size of the orders list refetch")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between a tablet's syncs")
+    parser.add_argument("--hold", type=float, default=5, help="how long the slow writer keeps its transaction open")
+    args = parser.parse_args()
+    dsn = os.environ["DATABASE_URL"]
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"], cwd=APP_DIR
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        session = session_cookie(dsn, "sync-bench")
+        with httpx.Client(base_url=base_url, cookies={"session": session}) as client, psycopg.connect(dsn, autocommit=True) as db:
+            for _ in range(600):
+                try:
+                    if client.get("/healthz").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+            out = {"payloads": payload_rounds(client, db, args.orders_limit)}
+        out["consistency"] = consistency(base_url, dsn, args.seconds, args.interval, args.hold)
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(json.dumps(out, indent=2))
+    result = out["consistency"]
+    if result["stale_orders"] or not (result["product_types_match"] and result["stock_matches"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""End-to-end check of read-replica routing against a real streaming standby.
+
+Creates a throwaway primary (as bench_suite.py does) and a hot standby of
+it with pg_basebackup, starts the API with DATABASE_READ_URL pointing at
+the standby (REPLICA_MAX_LAG=1, REPLICA_CHECK_INTERVAL=0.2), and checks:
+
+1. reads are served by the replica;
+2. with replay paused on the standby, the client that just created an
+   order reads it back (its laundry_lsn cookie routes it to the primary),
+   while a client without the cookie still gets the replica's 404;
+3. once the replica is more than REPLICA_MAX_LAG behind, every read goes
+   to the primary and /healthz reports the replica as bypassed;
+4. after replay resumes, reads return to the replica;
+5. with the standby shut down, reads keep working from the primary, and
+   return to the replica once it is back.
+
+Exits 1 if any check fails. Postgres refuses to run as root; run it as an
+unprivileged user with the Postgres binaries on PATH (or pass --pg-bin):
+
+    python bench/check_read_replica.py
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import psycopg
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import migrate  # noqa: E402
+from bench_order_events import session_cookie  # noqa: E402
+from bench_startup import free_port  # noqa: E402
+from bench_suite import ThrowawayPostgres  # noqa: E402
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+ORDER = {"customer": {"name": "Replica Check", "phone": "replica-check"}, "items": [{"sku": "shirt", "qty": 1}]}
+
+
+class Standby:
+    """Hot standby of a ThrowawayPostgres, on its own socket directory."""
+
+    def __init__(self, primary: ThrowawayPostgres):
+        self.bin_dir = primary.bin_dir
+        self.primary_host = primary.root
+        self.root = Path(tempfile.mkdtemp(prefix="laundry-standby-"))
+        self.data = self.root / "data"
+
+    def create(self) -> str:
+        subprocess.run(
+            [self.bin_dir / "pg_basebackup", "-D", self.data, "-R", "-X", "stream", "-d", f"host={self.primary_host} user=postgres"],
+            check=True,
+        )
+        self.start()
+        return f"postgresql://postgres@/laundry?host={self.root}"
+
+    def start(self) -> None:
+        options = f"-k {self.root} -c listen_addresses='' -c hot_standby=on -c max_connections=200"
+        subprocess.run(
+            [self.bin_dir / "pg_ctl", "-D", self.data, "-l", self.root / "postgres.log", "-o", options, "-w", "start"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    def stop(self, mode: str = "fast") -> None:
+        subprocess.run([self.bin_dir / "pg_ctl", "-D", self.data, "-m", mode, "stop"], stdout=subprocess.DEVNULL)
+
+    def remove(self) -> None:
+        self.stop("immediate")
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def replica_stats(client: httpx.Client) -> dict:
+    out = {}
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(("laundry_reads_total", "laundry_replica_")):
+            name, value = line.rsplit(" ", 1)
+            out[name] = float(value)
+    return out
+
+
+def wait_for(predicate, timeout: float = 15) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def run_checks(base_url: str, standby: Standby, standby_url: str, session: str) -> dict:
+    checks = {}
+    writer = httpx.Client(base_url=base_url, timeout=10, cookies={"session": session})  # keeps the laundry_lsn cookie
+    reader = httpx.Client(base_url=base_url, timeout=10, cookies={"session": session})  # never writes
+    replica_ok = lambda: reader.get("/healthz").json().get("replica") == "ok"  # noqa: E731
+
+    checks["replica_in_use_at_start"] = wait_for(replica_ok)
+    order_id = writer.post("/api/orders", json=ORDER).json()["order_id"]
+    wait_for(lambda: reader.get(f"/api/orders/{order_id}").status_code == 200)
+    before = replica_stats(reader)
+    for _ in range(20):
+        reader.get("/api/orders?limit=5")
+    after = replica_stats(reader)
+    key = 'laundry_reads_total{target="replica"}'
+    checks["reads_served_by_replica"] = after.get(key, 0) - before.get(key, 0) >= 20
+
+    with psycopg.connect(standby_url, autocommit=True) as conn:
+        conn.execute("SELECT pg_wal_replay_pause()")
+    order_id = writer.post("/api/orders", json=ORDER).json()["order_id"]
+    checks["writer_reads_own_write"] = writer.get(f"/api/orders/{order_id}").status_code == 200
+    checks["other_client_still_on_replica"] = reader.get(f"/api/orders/{order_id}").status_code == 404
+
+    checks["lagging_replica_bypassed"] = wait_for(lambda: reader.get("/healthz").json().get("replica") == "bypassed")
+    checks["reads_from_primary_while_lagging"] = reader.get(f"/api/orders/{order_id}").status_code == 200
+
+    with psycopg.connect(standby_url, autocommit=True) as conn:
+        conn.execute("SELECT pg_wal_replay_resume()")
+    checks["replica_back_after_resume"] = wait_for(replica_ok)
+
+    standby.stop("immediate")
+    codes = [reader.get("/api/orders?limit=5").status_code for _ in range(20)]
+    codes.append(reader.get(f"/api/orders/{order_id}").status_code)
+    checks["reads_survive_replica_down"] = set(codes) == {200}
+    checks["replica_down_reported"] = wait_for(lambda: reader.get("/healthz").json().get("replica") == "bypassed")
+    standby.start()
+    checks["replica_back_after_restart"] = wait_for(replica_ok, timeout=30)
+    checks["metrics"] = replica_stats(reader)
+    return checks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pg-bin", help="directory with initdb/pg_ctl/pg_basebackup")
+    args = parser.parse_args()
+    if os.geteuid() == 0:
+        raise SystemExit("Postgres won't run as root; run this as an unprivileged user")
+
+    primary = ThrowawayPostgres(args.pg_bin)
+    standby = None
+    proc = None
+    try:
+        primary_url = primary.start()
+        with psycopg.connect(primary_url, autocommit=True) as conn:
+            migrate.migrate(conn)
+        standby = Standby(primary)
+        standby_url = standby.create()
+
+        port = free_port()
+        env = {
+            **os.environ,
+            "DATABASE_URL": primary_url,
+            "DATABASE_READ_URL": standby_url,
+            "REPLICA_MAX_LAG": "1",
+            "REPLICA_CHECK_INTERVAL": "0.2",
+        }
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"], cwd=APP_DIR, env=env
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        wait_for(lambda: _healthy(base_url), timeout=60)
+        checks = run_checks(base_url, standby, standby_url, session_cookie(primary_url, "replica-check"))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if standby is not None:
+            standby.remove()
+        primary.stop()
+
+    print(json.dumps(checks, indent=2))
+    sys.exit(0 if all(v for k, v in checks.items() if k != "metrics") else 1)
+
+
+def _healthy(base_url: str) -> bool:
+    try:
+        return httpx.get(f"{base_url}/healthz").status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+if __name__ == "__main__":
+    main()
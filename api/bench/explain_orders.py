@@ -0,0 +1,143 @@
+"""Check that order reads stay on index range scans at production-like volume.
+
+Tops the orders table up to --orders rows of synthetic data (customers named
+`explain-bench-*`), then runs EXPLAIN (ANALYZE, BUFFERS) on every listing
+shape the API can produce, including a deep keyset page, plus the order
+detail query. A shape fails if its plan reads orders with a Seq Scan, or
+sorts more than --max-sorted orders rows (a small top-N sort over one
+customer's bitmap-scanned orders is fine; sorting a whole range is not).
+Exits non-zero on any failure.
+
+Use a scratch database; the synthetic rows are not cleaned up.
+
+    DATABASE_URL=postgresql://... python bench/explain_orders.py --orders 1000000
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import timedelta
+
+import psycopg
+from psycopg.rows import dict_row
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import orders  # noqa: E402
+import statements  # noqa: E402
+
+CUSTOMERS = 20000
+
+
+def populate(conn: psycopg.Connection, target: int) -> None:
+    missing = target - conn.execute("SELECT count(*) FROM orders").fetchone()[0]
+    if missing <= 0:
+        return
+    print(f"inserting {missing} synthetic orders...", file=sys.stderr)
+    conn.execute(
+        """
+        INSERT INTO customers (name, phone)
+        SELECT 'explain-bench-' || g, 'eb-' || g FROM generate_series(1, %s) g
+        ON CONFLICT (name, phone) DO NOTHING
+        """,
+        (CUSTOMERS,),
+    )
+    conn.execute(
+        """
+        WITH c AS (SELECT array_agg(id) AS ids FROM customers WHERE name LIKE 'explain-bench-%%'),
+        new_orders AS (
+            INSERT INTO orders (customer_id, status, total_items, total_price_cents, created_at)
+            SELECT c.ids[1 + (g::bigint * 7919) %% array_length(c.ids, 1)],
+                   (ARRAY['received','in_process','ready','delivered','canceled'])[1 + g %% 5],
+                   1 + g %% 9, 500 + g %% 5000,
+                   NOW() - (g * interval '20 seconds')
+            FROM c, generate_series(1, %s) g
+            RETURNING id, status, created_at
+        )
+        INSERT INTO order_events (order_id, status, note, created_by, created_at)
+        SELECT id, status, 'synthetic', 'bench', created_at FROM new_orders
+        """,
+        (missing,),
+    )
+    conn.commit()
+    conn.execute("ANALYZE customers, orders, order_events")
+    conn.commit()
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def reads_orders(node: dict) -> bool:
+    return any(n.get("Relation Name") == "orders" for n in plan_nodes(node))
+
+
+def explain(conn: psycopg.Connection, query, params, max_sorted: int) -> dict:
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(psycopg.sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ") + query, params)
+        plan = cur.fetchone()["QUERY PLAN"][0]
+    nodes = list(plan_nodes(plan["Plan"]))
+    problems = ["Seq Scan on orders" for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "orders"]
+    problems += [
+        f"Sort of {n['Plans'][0]['Actual Rows']} orders rows"
+        for n in nodes
+        if n["Node Type"] == "Sort" and reads_orders(n) and n["Plans"][0]["Actual Rows"] > max_sorted
+    ]
+    return {
+        "ms": round(plan["Execution Time"], 3),
+        "scans": sorted({f"{n['Node Type']} using {n['Index Name']}" for n in nodes if "Index Name" in n}),
+        "shared_hit_read": [plan["Plan"].get("Shared Hit Blocks"), plan["Plan"].get("Shared Read Blocks")],
+        "problems": problems,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--max-sorted", type=int, default=1000)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.database_url) as conn:
+        populate(conn, args.orders)
+        newest, customer_id = conn.execute(
+            "SELECT created_at, customer_id FROM orders ORDER BY created_at DESC, id DESC LIMIT 1"
+        ).fetchone()
+        deep = conn.execute(
+            "SELECT created_at, id FROM orders ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 1",
+            (args.orders // 2,),
+        ).fetchone()
+        shapes = {
+            "first_page": {},
+            "deep_page": {"after": tuple(deep)},
+            "status": {"status": "ready"},
+            "status_deep_page": {"status": "ready", "after": tuple(deep)},
+            "customer": {"customer_id": customer_id},
+            "date_range": {"created_from": newest - timedelta(days=7), "created_to": newest - timedelta(days=6)},
+            "status_and_range": {
+                "status": "delivered",
+                "created_from": newest - timedelta(days=30),
+                "created_to": newest,
+            },
+        }
+        results = {}
+        for name, filters in shapes.items():
+            query, params = orders.build_list_query(limit=args.limit + 1, **filters)
+            results[name] = explain(conn, query, params, args.max_sorted)
+        order_id = conn.execute("SELECT max(id) FROM orders").fetchone()[0]
+        results["detail"] = explain(
+            conn, psycopg.sql.SQL(statements.STATEMENTS["order_detail"].sql), {"order_id": order_id}, args.max_sorted
+        )
+
+    print(json.dumps(results, indent=2))
+    failed = [name for name, r in results.items() if r["problems"]]
+    if failed:
+        print(f"non-index plans: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
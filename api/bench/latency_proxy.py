@@ -0,0 +1,70 @@
+"""Tiny TCP proxy that adds a fixed round-trip delay in front of Postgres.
+
+Local Postgres answers in microseconds, which hides the cost of extra
+round-trips. Benchmarks route their connections through this proxy to mimic
+Cloud Run talking to Cloud SQL a few milliseconds away.
+"""
+import asyncio
+import socket
+import threading
+
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+
+
+class LatencyProxy:
+    def __init__(self, database_url: str, rtt_ms: float):
+        params = conninfo_to_dict(database_url)
+        host = params.get("host") or "localhost"
+        port = int(params.get("port") or 5432)
+        if host.startswith("/"):
+            self.upstream = {"path": f"{host}/.s.PGSQL.{port}"}
+        else:
+            self.upstream = {"host": host, "port": port}
+        self.database_url = database_url
+        self.delay = rtt_ms / 2000.0
+        self.port = 0
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+
+    def start(self) -> str:
+        """Start the proxy in a background thread and return a DSN that goes through it."""
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return make_conninfo(self.database_url, host="127.0.0.1", port=self.port)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _handle(self, client_reader, client_writer) -> None:
+        if "path" in self.upstream:
+            reader, writer = await asyncio.open_unix_connection(self.upstream["path"])
+        else:
+            reader, writer = await asyncio.open_connection(self.upstream["host"], self.upstream["port"])
+            writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client_writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        await asyncio.gather(self._pump(client_reader, writer), self._pump(reader, client_writer))
+
+    async def _pump(self, reader, writer) -> None:
+        # Each chunk is delivered `delay` after it arrived, so bursts of small
+        # protocol messages pay the latency once rather than once per chunk.
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def deliver() -> None:
+            while (item := await queue.get()) is not None:
+                due, data = item
+                await asyncio.sleep(max(0.0, due - self._loop.time()))
+                writer.write(data)
+                await writer.drain()
+
+        sender = asyncio.ensure_future(deliver())
+        try:
+            while data := await reader.read(65536):
+                queue.put_nowait((self._loop.time() + self.delay, data))
+        finally:
+            queue.put_nowait(None)
+            await sender
+            writer.close()
@@ -0,0 +1,85 @@
+"""Small in-process caches shared by the request handlers."""
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a time-to-live.
+
+    Not thread-safe; it is only touched from the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        entry = self._data.pop(key, None)
+        return None if entry is None else entry[1]
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        """Drop every entry whose value matches; returns how many were removed."""
+        stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class ReadThroughCache(TTLCache):
+    """TTLCache that loads on miss and can be invalidated wholesale.
+
+    A generation counter guards against caching a result that was read
+    before an invalidation arrived but finished loading after it.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: Callable[[], bool] = lambda: True):
+        super().__init__(maxsize, ttl)
+        self.enabled = enabled
+        self.generation = 0
+        self.invalidations = 0
+
+    def invalidate(self, *_: Any) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        self.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled():
+            return await loader()
+        value = self.get(key)
+        if value is None:
+            generation = self.generation
+            value = await loader()
+            if generation == self.generation:
+                self.set(key, value)
+        return value
@@ -0,0 +1,63 @@
+"""Customer typeahead search (GET /api/customers/search).
+
+Names and phones are indexed as normalized prefix terms in
+`customer_search_terms` (migration 0006), kept current by triggers on
+customers, so a search is a few bounded index range scans. Results for
+recently typed prefixes are kept per worker for SEARCH_CACHE_TTL seconds;
+a customer created on another worker shows up once that expires.
+"""
+import os
+import re
+
+from psycopg_pool import AsyncConnectionPool
+
+import statements
+from cache import TTLCache
+
+SEARCH_LIMIT_MAX = int(os.getenv("CUSTOMER_SEARCH_LIMIT_MAX", "20"))
+SEARCH_CACHE_SIZE = int(os.getenv("CUSTOMER_SEARCH_CACHE_SIZE", "2000"))
+SEARCH_CACHE_TTL = float(os.getenv("CUSTOMER_SEARCH_CACHE_TTL", "10"))
+
+search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+# Same folding as customer_search_norm() in the migration
+_ACCENTS = str.maketrans("áàâäãéèêëíìîïóòôöõúùûüñç", "aaaaaeeeeiiiiooooouuuunc")
+_SEPARATORS = re.compile(r"[\W_]+")
+_PHONE_LIKE = re.compile(r"^[\d\s()+.-]+$")
+
+
+def normalize(value: str) -> str:
+    return _SEPARATORS.sub(" ", value.lower().translate(_ACCENTS)).strip()
+
+
+def _prefix_range(prefix: str | None) -> tuple[str | None, str | None]:
+    """[prefix, prefix_end) in "C" collation (code point order)."""
+    if not prefix:
+        return None, None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def search_params(query: str, limit: int) -> dict:
+    """Parameters for the search_customers statement."""
+    digits = re.sub(r"\D", "", query) if _PHONE_LIKE.match(query.strip()) else None
+    params = {"limit": limit}
+    params["prefix"], params["prefix_end"] = _prefix_range(normalize(query))
+    params["phone_prefix"], params["phone_prefix_end"] = _prefix_range(digits)
+    return params
+
+
+async def search(pool: AsyncConnectionPool, query: str, limit: int) -> list[dict]:
+    """Best matches for a partially typed name or phone, at most `limit` (capped at SEARCH_LIMIT_MAX)."""
+    prefix = normalize(query)
+    limit = min(limit, SEARCH_LIMIT_MAX)
+    if not prefix:
+        return []
+    key = (prefix, limit)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async with pool.connection() as conn:
+        rows = await statements.fetchall(conn, "search_customers", search_params(query, limit))
+    search_cache.set(key, rows)
+    return rows
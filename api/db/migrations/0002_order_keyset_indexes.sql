@@ -0,0 +1,11 @@
+-- Keyset paging on (created_at, id), optionally scoped to a customer or a status.
+-- The composite indexes also serve plain customer_id / status lookups.
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id ON orders(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_created_at ON orders(customer_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders(status, created_at, id);
+DROP INDEX IF EXISTS idx_orders_customer_id;
+DROP INDEX IF EXISTS idx_orders_status;
+
+-- Latest event per order is a single backward index probe
+CREATE INDEX IF NOT EXISTS idx_order_events_order_created_at ON order_events(order_id, created_at, id);
+DROP INDEX IF EXISTS idx_order_events_order_id;
@@ -0,0 +1,27 @@
+-- Append-only stock ledger (see api/stock_ledger.py). stock.available_quantity is
+-- the snapshot of all movements with id <= compacted_through.
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id               BIGSERIAL PRIMARY KEY,
+    product_type_id  INTEGER NOT NULL REFERENCES product_types(product_type_id),
+    delta            INTEGER NOT NULL CHECK (delta <> 0),
+    reason           TEXT NOT NULL,
+    order_id         BIGINT REFERENCES orders(id),
+    created_at       TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_product_id ON stock_movements(product_type_id, id);
+ALTER TABLE stock ADD COLUMN IF NOT EXISTS compacted_through BIGINT NOT NULL DEFAULT 0;
+INSERT INTO stock (product_type_id, available_quantity)
+SELECT product_type_id, 0 FROM product_types
+ON CONFLICT (product_type_id) DO NOTHING;
+CREATE OR REPLACE VIEW stock_levels AS
+SELECT
+    s.stock_id,
+    s.product_type_id,
+    s.available_quantity + COALESCE(pending.delta, 0) AS available_quantity,
+    GREATEST(s.updated_at, pending.last_at) AS updated_at
+FROM stock s
+LEFT JOIN LATERAL (
+    SELECT sum(m.delta)::int AS delta, max(m.created_at)::timestamp AS last_at
+    FROM stock_movements m
+    WHERE m.product_type_id = s.product_type_id AND m.id > s.compacted_through
+) pending ON TRUE;
@@ -0,0 +1,2 @@
+-- The API used to create this on every startup; users.username is already UNIQUE.
+DROP INDEX IF EXISTS uq_users_username;
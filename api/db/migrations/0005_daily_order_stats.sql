@@ -0,0 +1,88 @@
+-- Per-day order aggregates for the dashboard (see api/order_stats.py).
+-- One row per (day, current status) of the orders created that day, kept up to date by
+-- statement-level triggers on orders in the writing transaction, so bulk imports add
+-- one aggregated upsert per statement rather than one per row.
+--
+-- Days are calendar days in laundry.stats_timezone (default UTC), e.g.
+--   ALTER DATABASE laundry SET laundry.stats_timezone = 'America/Argentina/Buenos_Aires';
+-- followed by `python order_stats.py --rebuild`.
+CREATE OR REPLACE FUNCTION order_stats_day(ts TIMESTAMPTZ) RETURNS DATE AS $$
+    SELECT (ts AT TIME ZONE COALESCE(NULLIF(current_setting('laundry.stats_timezone', true), ''), 'UTC'))::date;
+$$ LANGUAGE sql STABLE;
+
+CREATE TABLE IF NOT EXISTS daily_order_stats (
+    day             DATE NOT NULL,
+    status          TEXT NOT NULL CHECK (status IN ('received','in_process','ready','delivered','canceled')),
+    orders          BIGINT NOT NULL DEFAULT 0,
+    items           BIGINT NOT NULL DEFAULT 0,
+    revenue_cents   BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+);
+
+-- Upserts go in (day, status) order so concurrent writers lock rows in the same order.
+CREATE OR REPLACE FUNCTION apply_daily_order_stats() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO daily_order_stats AS d (day, status, orders, items, revenue_cents)
+        SELECT order_stats_day(created_at), status, count(*), sum(total_items), sum(total_price_cents)
+        FROM new_rows
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE
+        SET orders = d.orders + EXCLUDED.orders,
+            items = d.items + EXCLUDED.items,
+            revenue_cents = d.revenue_cents + EXCLUDED.revenue_cents;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO daily_order_stats AS d (day, status, orders, items, revenue_cents)
+        SELECT day, status, sum(orders), sum(items), sum(revenue_cents)
+        FROM (
+            SELECT order_stats_day(created_at) AS day, status, -1 AS orders,
+                   -total_items::bigint AS items, -total_price_cents::bigint AS revenue_cents
+            FROM old_rows
+            UNION ALL
+            SELECT order_stats_day(created_at), status, 1, total_items, total_price_cents
+            FROM new_rows
+        ) delta
+        GROUP BY 1, 2
+        HAVING sum(orders) <> 0 OR sum(items) <> 0 OR sum(revenue_cents) <> 0
+        ORDER BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE
+        SET orders = d.orders + EXCLUDED.orders,
+            items = d.items + EXCLUDED.items,
+            revenue_cents = d.revenue_cents + EXCLUDED.revenue_cents;
+    ELSE
+        INSERT INTO daily_order_stats AS d (day, status, orders, items, revenue_cents)
+        SELECT order_stats_day(created_at), status, -count(*), -sum(total_items), -sum(total_price_cents)
+        FROM old_rows
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE
+        SET orders = d.orders + EXCLUDED.orders,
+            items = d.items + EXCLUDED.items,
+            revenue_cents = d.revenue_cents + EXCLUDED.revenue_cents;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Creating the triggers locks out order writers until this migration commits, so the
+-- backfill below sees every order written without them.
+CREATE TRIGGER trg_orders_daily_stats_insert
+AFTER INSERT ON orders
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_daily_order_stats();
+
+CREATE TRIGGER trg_orders_daily_stats_update
+AFTER UPDATE ON orders
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_daily_order_stats();
+
+CREATE TRIGGER trg_orders_daily_stats_delete
+AFTER DELETE ON orders
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_daily_order_stats();
+
+INSERT INTO daily_order_stats (day, status, orders, items, revenue_cents)
+SELECT order_stats_day(created_at), status, count(*), sum(total_items), sum(total_price_cents)
+FROM orders
+GROUP BY 1, 2;
@@ -0,0 +1,77 @@
+-- Typeahead search over customers by name or phone (see api/customers.py).
+-- Each customer gets a few normalized search terms: the full name, the name from each
+-- later word on (so "garc" finds "Maria Garcia" and "jose gar" finds "Maria Jose Garcia"),
+-- and the phone's digits from each digit group on ("+54 11 4567-8901" is found by "5411",
+-- "11 4567" or "8901"). A prefix search is then one btree range scan per kind of term,
+-- independent of table size; no extension is needed.
+--
+-- customer_search_norm must stay in step with customers.normalize().
+CREATE OR REPLACE FUNCTION customer_search_norm(value TEXT) RETURNS TEXT AS $$
+    SELECT btrim(regexp_replace(
+        translate(lower(value), 'áàâäãéèêëíìîïóòôöõúùûüñç', 'aaaaaeeeeiiiiooooouuuunc'),
+        '[^[:alnum:]]+', ' ', 'g'
+    ));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- rank: 0 = full name, 1 = name from a later word, 2 = phone digits (any group on)
+CREATE TABLE IF NOT EXISTS customer_search_terms (
+    customer_id     BIGINT NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    rank            SMALLINT NOT NULL,
+    term            TEXT COLLATE "C" NOT NULL,
+    PRIMARY KEY (rank, term, customer_id)
+);
+CREATE INDEX IF NOT EXISTS idx_customer_search_terms_customer ON customer_search_terms(customer_id);
+
+CREATE OR REPLACE FUNCTION customer_search_terms_for(name TEXT, phone TEXT)
+RETURNS TABLE (rank SMALLINT, term TEXT) AS $$
+    SELECT DISTINCT CASE WHEN i = 1 THEN 0 ELSE 1 END::smallint,
+           array_to_string(words[i:], ' ')
+    FROM (SELECT string_to_array(customer_search_norm(name), ' ') AS words) w,
+         generate_series(1, least(cardinality(w.words), 4)) i
+    WHERE w.words[i] <> ''
+    UNION ALL
+    SELECT DISTINCT 2::smallint, array_to_string(groups[i:], '')
+    FROM (SELECT array_remove(regexp_split_to_array(phone, '\D+'), '') AS groups) p,
+         generate_series(1, least(cardinality(p.groups), 4)) i
+    WHERE p.groups[i] IS NOT NULL;
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION apply_customer_search_terms() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        -- create_order's upsert updates email/address on every repeat customer; skip those
+        DELETE FROM customer_search_terms s
+        USING new_rows n JOIN old_rows o USING (id)
+        WHERE s.customer_id = n.id
+          AND (n.name IS DISTINCT FROM o.name OR n.phone IS DISTINCT FROM o.phone);
+        INSERT INTO customer_search_terms (customer_id, rank, term)
+        SELECT n.id, t.rank, t.term
+        FROM new_rows n JOIN old_rows o USING (id), customer_search_terms_for(n.name, n.phone) t
+        WHERE n.name IS DISTINCT FROM o.name OR n.phone IS DISTINCT FROM o.phone
+        ON CONFLICT DO NOTHING;
+    ELSE
+        INSERT INTO customer_search_terms (customer_id, rank, term)
+        SELECT n.id, t.rank, t.term
+        FROM new_rows n, customer_search_terms_for(n.name, n.phone) t
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_customers_search_insert
+AFTER INSERT ON customers
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_customer_search_terms();
+
+CREATE TRIGGER trg_customers_search_update
+AFTER UPDATE ON customers
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_customer_search_terms();
+
+INSERT INTO customer_search_terms (customer_id, rank, term)
+SELECT c.id, t.rank, t.term
+FROM customers c, customer_search_terms_for(c.name, c.phone) t
+ON CONFLICT DO NOTHING;
+
+ANALYZE customer_search_terms;
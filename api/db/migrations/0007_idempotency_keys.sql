@@ -0,0 +1,14 @@
+-- Idempotency-Key support for POST /api/orders (see api/idempotency.py).
+-- create_order inserts the key row in the same statement as the order, so a key exists
+-- exactly when its order does; a retry finds it and gets `response` back without writing.
+-- request_hash is a digest of the request body, to refuse a key reused for a different order.
+-- Rows older than IDEMPOTENCY_TTL are deleted by the API's sweeper.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key             TEXT PRIMARY KEY,
+    request_hash    BYTEA NOT NULL,
+    order_id        BIGINT NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    response        JSONB NOT NULL,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_order_id ON idempotency_keys(order_id);
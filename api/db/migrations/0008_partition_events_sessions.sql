@@ -0,0 +1,127 @@
+-- Monthly range partitions for the two append-only tables that grow without bound:
+-- order_events by created_at and sessions by expires_at (see api/partitions.py).
+-- Old months can then be detached and archived, or dropped, without a DELETE.
+--
+-- Partition keys have to be part of every unique constraint. The primary keys therefore
+-- become (id, created_at) and (session_token, expires_at). Nothing in the API looks rows up
+-- by a unique id alone; event ids still come from the same sequence, and session tokens
+-- are 32 random bytes. Each table keeps a DEFAULT partition, so rows outside the created
+-- months still insert; ensure_month_partition moves them out once their month exists.
+--
+-- orders and order_items stay single tables. Four tables reference orders(id) with foreign
+-- keys, and every order read is by id or by a (created_at, id) keyset index whose cost
+-- doesn't depend on table size. Partitioning orders would need created_at in all of
+-- those keys. Instead, order_detail bounds its latest-event lookup by the order's
+-- created_at, so only the partitions from the order's month onward are probed.
+--
+-- This migration copies both tables. It holds an exclusive lock on them while it runs,
+-- about 15 s per million order events (bench/bench_partitions.py reports it).
+
+-- Create (or attach an existing standalone table as) the partition of `parent` for the
+-- UTC calendar month containing `month`, named <parent>_pYYYY_MM. Rows for that month
+-- already in the DEFAULT partition are moved into it first. ATTACH needs only a SHARE
+-- UPDATE EXCLUSIVE lock on the parent, so readers and writers are not blocked.
+CREATE OR REPLACE FUNCTION ensure_month_partition(parent REGCLASS, month DATE) RETURNS REGCLASS AS $$
+DECLARE
+    first_day   DATE := date_trunc('month', month)::date;
+    next_day    DATE := (date_trunc('month', month) + interval '1 month')::date;
+    lower_bound TIMESTAMPTZ;
+    upper_bound TIMESTAMPTZ;
+    key_column  TEXT;
+    schema_name TEXT;
+    part_name   TEXT;
+    part        REGCLASS;
+    default_part REGCLASS;
+BEGIN
+    lower_bound := make_timestamptz(extract(year FROM first_day)::int, extract(month FROM first_day)::int, 1, 0, 0, 0, 'UTC');
+    upper_bound := make_timestamptz(extract(year FROM next_day)::int, extract(month FROM next_day)::int, 1, 0, 0, 0, 'UTC');
+    key_column := substring(pg_get_partkeydef(parent) FROM '^RANGE \((\w+)\)$');
+    IF key_column IS NULL THEN
+        RAISE EXCEPTION '% is not range partitioned on a single column', parent;
+    END IF;
+
+    SELECT n.nspname, c.relname || '_p' || to_char(first_day, 'YYYY_MM')
+    INTO schema_name, part_name
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = parent;
+    part := to_regclass(format('%I.%I', schema_name, part_name));
+    IF part IS NOT NULL AND EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = part AND inhparent = parent) THEN
+        RETURN part;
+    END IF;
+    IF part IS NULL THEN
+        EXECUTE format('CREATE TABLE %I.%I (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', schema_name, part_name, parent);
+        part := format('%I.%I', schema_name, part_name)::regclass;
+    END IF;
+
+    SELECT i.inhrelid::regclass INTO default_part
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT';
+    IF default_part IS NOT NULL THEN
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING *) INSERT INTO %s SELECT * FROM moved',
+            default_part, key_column, lower_bound, key_column, upper_bound, part
+        );
+    END IF;
+    EXECUTE format('ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM (%L) TO (%L)', parent, part, lower_bound, upper_bound);
+    RETURN part;
+END;
+$$ LANGUAGE plpgsql;
+
+-- order_events: one partition per month of existing events, through two months ahead
+ALTER TABLE order_events RENAME TO order_events_unpartitioned;
+ALTER TABLE order_events_unpartitioned DROP CONSTRAINT order_events_pkey;
+DROP INDEX idx_order_events_order_created_at;
+
+CREATE TABLE order_events (
+    id              BIGINT NOT NULL DEFAULT nextval('order_events_id_seq'),
+    order_id        BIGINT NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
+    status          TEXT NOT NULL CHECK (status IN ('received','in_process','ready','delivered','canceled')),
+    note            TEXT,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    created_by      TEXT,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+ALTER SEQUENCE order_events_id_seq OWNED BY order_events.id;
+CREATE INDEX idx_order_events_order_created_at ON order_events(order_id, created_at, id);
+CREATE TABLE order_events_default PARTITION OF order_events DEFAULT;
+
+SELECT ensure_month_partition('order_events', month::date)
+FROM generate_series(
+    date_trunc('month', COALESCE((SELECT min(created_at) FROM order_events_unpartitioned), NOW()) AT TIME ZONE 'UTC'),
+    date_trunc('month', NOW() AT TIME ZONE 'UTC') + interval '2 months',
+    interval '1 month'
+) AS month;
+
+INSERT INTO order_events (id, order_id, status, note, created_at, created_by)
+SELECT id, order_id, status, note, created_at, created_by FROM order_events_unpartitioned;
+DROP TABLE order_events_unpartitioned;
+
+-- sessions: only unexpired ones are copied, so partitions start at the current month
+ALTER TABLE sessions RENAME TO sessions_unpartitioned;
+ALTER TABLE sessions_unpartitioned DROP CONSTRAINT sessions_pkey;
+DROP INDEX idx_sessions_user_id;
+DROP INDEX idx_sessions_expires_at;
+
+CREATE TABLE sessions (
+    session_token   TEXT NOT NULL,
+    user_id         BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    expires_at      TIMESTAMPTZ NOT NULL,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (session_token, expires_at)
+) PARTITION BY RANGE (expires_at);
+CREATE INDEX idx_sessions_user_id ON sessions(user_id);
+CREATE INDEX idx_sessions_expires_at ON sessions(expires_at);
+CREATE TABLE sessions_default PARTITION OF sessions DEFAULT;
+
+SELECT ensure_month_partition('sessions', month::date)
+FROM generate_series(
+    date_trunc('month', NOW() AT TIME ZONE 'UTC'),
+    date_trunc('month', NOW() AT TIME ZONE 'UTC') + interval '2 months',
+    interval '1 month'
+) AS month;
+
+INSERT INTO sessions (session_token, user_id, expires_at, created_at)
+SELECT session_token, user_id, expires_at, created_at FROM sessions_unpartitioned WHERE expires_at > NOW();
+DROP TABLE sessions_unpartitioned;
+
+ANALYZE order_events, sessions;
@@ -0,0 +1,31 @@
+-- Change tracking for GET /api/sync (see api/sync.py), which returns only the product types,
+-- stock levels and orders that changed after a client's watermark.
+--
+-- product_types gets the same updated_at column and trigger as orders, so a disabled or edited
+-- product shows up as changed. Existing rows take their creation time.
+--
+-- Stock levels change only through stock_movements, so that table's created_at is what marks a
+-- stock row as changed. Compaction rewrites stock.updated_at without changing any level, so that
+-- column is not used.
+ALTER TABLE product_types ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+UPDATE product_types SET updated_at = date_time_created WHERE updated_at IS NULL;
+ALTER TABLE product_types
+    ALTER COLUMN updated_at SET DEFAULT NOW(),
+    ALTER COLUMN updated_at SET NOT NULL;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger WHERE tgname = 'trg_product_types_updated_at'
+    ) THEN
+        CREATE TRIGGER trg_product_types_updated_at
+        BEFORE UPDATE ON product_types
+        FOR EACH ROW
+        EXECUTE FUNCTION set_updated_at();
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_product_types_updated_at ON product_types(updated_at);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_created_at ON stock_movements(created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at_id ON orders(updated_at, id);
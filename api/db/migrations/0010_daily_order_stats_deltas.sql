@@ -0,0 +1,53 @@
+-- Order writes no longer upsert daily_order_stats directly (see api/order_stats.py).
+-- Upserting one (day, status) row per statement made every order written on the same day
+-- queue on that row's lock, and a bulk import held it until it committed. The triggers now
+-- append their aggregated delta to daily_order_stats_deltas, which takes no shared row lock,
+-- and the API folds pending deltas into daily_order_stats every STATS_COMPACT_INTERVAL
+-- seconds. Reads add the pending deltas to the folded rows (daily_order_stats_current).
+CREATE TABLE IF NOT EXISTS daily_order_stats_deltas (
+    id              BIGSERIAL PRIMARY KEY,
+    day             DATE NOT NULL,
+    status          TEXT NOT NULL,
+    orders          BIGINT NOT NULL,
+    items           BIGINT NOT NULL,
+    revenue_cents   BIGINT NOT NULL
+);
+
+CREATE OR REPLACE VIEW daily_order_stats_current AS
+SELECT day, status, sum(orders)::bigint AS orders, sum(items)::bigint AS items, sum(revenue_cents)::bigint AS revenue_cents
+FROM (
+    SELECT day, status, orders, items, revenue_cents FROM daily_order_stats
+    UNION ALL
+    SELECT day, status, orders, items, revenue_cents FROM daily_order_stats_deltas
+) s
+GROUP BY day, status;
+
+CREATE OR REPLACE FUNCTION apply_daily_order_stats() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO daily_order_stats_deltas (day, status, orders, items, revenue_cents)
+        SELECT order_stats_day(created_at), status, count(*), sum(total_items), sum(total_price_cents)
+        FROM new_rows
+        GROUP BY 1, 2;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO daily_order_stats_deltas (day, status, orders, items, revenue_cents)
+        SELECT day, status, sum(orders), sum(items), sum(revenue_cents)
+        FROM (
+            SELECT order_stats_day(created_at) AS day, status, -1 AS orders,
+                   -total_items::bigint AS items, -total_price_cents::bigint AS revenue_cents
+            FROM old_rows
+            UNION ALL
+            SELECT order_stats_day(created_at), status, 1, total_items, total_price_cents
+            FROM new_rows
+        ) delta
+        GROUP BY 1, 2
+        HAVING sum(orders) <> 0 OR sum(items) <> 0 OR sum(revenue_cents) <> 0;
+    ELSE
+        INSERT INTO daily_order_stats_deltas (day, status, orders, items, revenue_cents)
+        SELECT order_stats_day(created_at), status, -count(*), -sum(total_items), -sum(total_price_cents)
+        FROM old_rows
+        GROUP BY 1, 2;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,10 @@
+-- Correction to migration 0008, whose comment on ensure_month_partition says ATTACH needs only a
+-- SHARE UPDATE EXCLUSIVE lock on the parent, so readers and writers are not blocked. That is
+-- wrong, and an applied migration can't be edited, so the accurate description is recorded on the
+-- function itself. The function is unchanged.
+COMMENT ON FUNCTION ensure_month_partition(REGCLASS, DATE) IS
+'Create (or attach an existing standalone table as) the partition of parent for the UTC month '
+'containing month, moving that month''s rows out of the DEFAULT partition first. ATTACH takes a '
+'SHARE UPDATE EXCLUSIVE lock on the parent, which queues behind other DDL and VACUUM on it, and an '
+'ACCESS EXCLUSIVE lock on the attached table and on the DEFAULT partition while it scans it, so '
+'queries that cannot prune DEFAULT wait. Call it under a lock_timeout (api/partitions.py does).';
@@ -0,0 +1,48 @@
+-- GET /api/sync tracks changes by the id of the transaction that wrote them instead of its start
+-- time (see api/sync.py). A time watermark had to be held back to the start of the oldest
+-- transaction still writing, read from pg_stat_activity, where a role without pg_read_all_stats
+-- can't see other sessions' transactions; the watermark then passed open writers and tablets
+-- missed their rows for good. pg_snapshot_xmin(pg_current_snapshot()) needs no privileges: every
+-- transaction id below it has finished, so a row with a lower changed_xid can't appear later.
+--
+-- Rows written before this migration keep a NULL changed_xid and only come with a full sync,
+-- which every client does again because older watermarks no longer decode.
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS changed_xid XID8;
+ALTER TABLE orders ALTER COLUMN changed_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE product_types ADD COLUMN IF NOT EXISTS changed_xid XID8;
+ALTER TABLE product_types ALTER COLUMN changed_xid SET DEFAULT pg_current_xact_id();
+ALTER TABLE stock_movements ADD COLUMN IF NOT EXISTS changed_xid XID8;
+ALTER TABLE stock_movements ALTER COLUMN changed_xid SET DEFAULT pg_current_xact_id();
+
+CREATE OR REPLACE FUNCTION set_changed_xid() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.changed_xid = pg_current_xact_id();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_orders_changed_xid') THEN
+        CREATE TRIGGER trg_orders_changed_xid
+        BEFORE UPDATE ON orders
+        FOR EACH ROW
+        EXECUTE FUNCTION set_changed_xid();
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_product_types_changed_xid') THEN
+        CREATE TRIGGER trg_product_types_changed_xid
+        BEFORE UPDATE ON product_types
+        FOR EACH ROW
+        EXECUTE FUNCTION set_changed_xid();
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_orders_changed_xid_id ON orders(changed_xid, id);
+CREATE INDEX IF NOT EXISTS idx_product_types_changed_xid ON product_types(changed_xid);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_changed_xid ON stock_movements(changed_xid);
+
+-- Only the time-based sync read these (migration 0009)
+DROP INDEX IF EXISTS idx_orders_updated_at_id;
+DROP INDEX IF EXISTS idx_product_types_updated_at;
+DROP INDEX IF EXISTS idx_stock_movements_created_at;
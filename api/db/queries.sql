@@ -1,46 +1,121 @@
--- Parameterized query snippets for FastAPI usage
-
--- Create or reuse a customer based on (name, phone)
--- $1: name, $2: phone, $3: email, $4: address
-INSERT INTO customers (name, phone, email, address)
-VALUES ($1, $2, $3, $4)
-ON CONFLICT (name, phone) DO UPDATE
-SET email = EXCLUDED.email,
-    address = EXCLUDED.address
-RETURNING id;
-
--- Create order header
--- $1: customer_id, $2: status, $3: pickup_notes, $4: delivery_notes, $5: pickup_at, $6: delivery_at
-INSERT INTO orders (customer_id, status, pickup_notes, delivery_notes, pickup_at, delivery_at)
-VALUES ($1, $2, $3, $4, $5, $6)
-RETURNING id, created_at;
-
--- Bulk insert items for an order
--- $1: order_id, $2: sku, $3: description, $4: qty, $5: unit_price_cents
-INSERT INTO order_items (order_id, sku, description, qty, unit_price_cents)
-VALUES ($1, $2, $3, $4, $5)
-RETURNING id;
-
--- Persist a status change/event
--- $1: order_id, $2: status, $3: note, $4: created_by
-INSERT INTO order_events (order_id, status, note, created_by)
-VALUES ($1, $2, $3, $4)
-RETURNING id, created_at;
-
--- Update order totals and status in one statement
--- $1: total_items, $2: total_price_cents, $3: status, $4: order_id
-UPDATE orders
-SET total_items = $1, total_price_cents = $2, status = $3
-WHERE id = $4
-RETURNING id;
+-- Named SQL statements, loaded once by statements.py and executed as server-side
+-- prepared statements. Each block starts with `-- name: <name>`; the comment lines
+-- right after it describe the parameters, which use psycopg's %(name)s style.
+-- `python statements.py --check` prepares every statement against the database
+-- to catch drift from db/schema.sql.
 
+-- name: create_order
+-- Customer upsert, order header, items and first event in one statement.
+-- Items are parallel arrays: skus, descriptions, qtys, prices.
+-- With an idempotency_key (and request_hash), the key row is written along with the order;
+-- if the key is already stored nothing is written and its stored response comes back instead
+-- (replayed = true). Two first attempts racing on one key: the second fails on the key's
+-- primary key and is rolled back whole.
+WITH existing AS (
+    SELECT order_id, request_hash, response
+    FROM idempotency_keys
+    WHERE key = %(idempotency_key)s
+), customer AS (
+    INSERT INTO customers (name, phone, email, address)
+    SELECT %(name)s, %(phone)s, %(email)s, %(address)s
+    WHERE NOT EXISTS (SELECT 1 FROM existing)
+    ON CONFLICT (name, phone) DO UPDATE
+    SET email = EXCLUDED.email,
+        address = EXCLUDED.address
+    RETURNING id
+), new_order AS (
+    INSERT INTO orders (customer_id, status, pickup_notes, delivery_notes, pickup_at, delivery_at,
+                        total_items, total_price_cents)
+    SELECT id, 'received', %(pickup_notes)s, %(delivery_notes)s, %(pickup_at)s, %(delivery_at)s,
+           %(total_items)s, %(total_price_cents)s
+    FROM customer
+    RETURNING id, created_at
+), items AS (
+    INSERT INTO order_items (order_id, sku, description, qty, unit_price_cents)
+    SELECT o.id, i.sku, i.description, i.qty, i.unit_price_cents
+    FROM new_order o,
+         unnest(%(skus)s::text[], %(descriptions)s::text[], %(qtys)s::int[], %(prices)s::int[])
+             WITH ORDINALITY AS i(sku, description, qty, unit_price_cents, n)
+    ORDER BY i.n
+), event AS (
+    INSERT INTO order_events (order_id, status, note, created_by)
+    SELECT id, 'received', 'Order created via API', 'api' FROM new_order
+    RETURNING id, order_id, status, created_at
+), keyed AS (
+    INSERT INTO idempotency_keys (key, request_hash, order_id, response)
+    SELECT %(idempotency_key)s, %(request_hash)s, id, %(response)s::jsonb || jsonb_build_object('order_id', id)
+    FROM new_order
+    WHERE %(idempotency_key)s::text IS NOT NULL
+)
+SELECT o.id, o.created_at, FALSE AS replayed, NULL::bytea AS request_hash, NULL::jsonb AS response
+FROM new_order o
+JOIN event e ON e.order_id = o.id
+CROSS JOIN LATERAL pg_notify('laundry_orders', json_build_object(
+    'event_id', e.id, 'order_id', e.order_id, 'status', e.status, 'created_at', e.created_at
+)::text)
+UNION ALL
+SELECT order_id, NULL, TRUE, request_hash, response FROM existing;
+
+-- name: transition_order_status
+-- Move an order to a new status if it is currently in one of from_statuses: update, event and
+-- NOTIFY in one statement. The status re-check happens on the locked row, so concurrent
+-- transitions cannot both apply. Returns no row for an unknown order; event_id is NULL when
+-- the transition was refused, with the status the order had.
+WITH updated AS (
+    UPDATE orders SET status = %(status)s
+    WHERE id = %(order_id)s AND status = ANY(%(from_statuses)s::text[])
+    RETURNING id, status
+), event AS (
+    INSERT INTO order_events (order_id, status, note, created_by)
+    SELECT id, status, %(note)s, %(created_by)s FROM updated
+    RETURNING id, order_id, status, created_at
+), notified AS (
+    SELECT e.*
+    FROM event e
+    CROSS JOIN LATERAL pg_notify('laundry_orders', json_build_object(
+        'event_id', e.id, 'order_id', e.order_id, 'status', e.status, 'created_at', e.created_at
+    )::text)
+)
+SELECT o.status AS previous_status, n.status, n.id AS event_id, n.created_at
+FROM orders o
+LEFT JOIN notified n ON n.order_id = o.id
+WHERE o.id = %(order_id)s;
+
+-- name: order_events_since
+-- Status events after a client's Last-Event-ID, for SSE replay on reconnect. `known` is false,
+-- with no events, unless the client's own event was created after `seen_since`; events are
+-- only looked for from `events_since` on (a little earlier, as a later event can carry an
+-- earlier timestamp by the length of the transaction that wrote it) up to `until`, which is
+-- past any event. Passing the bounds as values rather than NOW() expressions lets the planner
+-- read only those months' partitions, skipping DEFAULT and the months ahead.
+WITH last_seen AS (
+    SELECT EXISTS (
+        SELECT 1 FROM order_events
+        WHERE id = %(after)s AND created_at > %(seen_since)s AND created_at < %(until)s
+    ) AS known
+)
+SELECT l.known, e.id AS event_id, e.order_id, e.status, e.created_at
+FROM last_seen l
+LEFT JOIN LATERAL (
+    SELECT id, order_id, status, created_at
+    FROM order_events
+    WHERE l.known
+      AND id > %(after)s
+      AND created_at > %(events_since)s AND created_at < %(until)s
+      AND (%(order_id)s::bigint IS NULL OR order_id = %(order_id)s)
+    ORDER BY id
+    LIMIT %(limit)s
+) e ON true;
+
+-- name: order_detail
 -- Order detail with items and latest status event
--- $1: order_id
 SELECT
     o.id,
     o.status,
     o.total_items,
     o.total_price_cents,
+    o.pickup_notes,
+    o.delivery_notes,
     o.pickup_at,
     o.delivery_at,
     o.created_at,
@@ -69,24 +144,227 @@ SELECT
             'created_by', oe.created_by
         )
         FROM order_events oe
-        WHERE oe.order_id = o.id
-        ORDER BY oe.created_at DESC
+        -- an order's events are never older than the order; skips earlier partitions
+        WHERE oe.order_id = o.id AND oe.created_at >= o.created_at
+        ORDER BY oe.created_at DESC, oe.id DESC
         LIMIT 1
     ) AS latest_event
 FROM orders o
 JOIN customers c ON c.id = o.customer_id
-WHERE o.id = $1;
+WHERE o.id = %(order_id)s;
+
+-- name: session_lookup
+-- Resolve a session token to its active user
+SELECT s.user_id, u.username, s.expires_at
+FROM sessions s
+JOIN users u ON u.user_id = s.user_id
+WHERE s.session_token = %(token)s AND s.expires_at > NOW() AND u.active;
+
+-- name: insert_session
+INSERT INTO sessions (session_token, user_id, expires_at)
+VALUES (%(token)s, %(user_id)s, %(expires_at)s);
+
+-- name: delete_session
+-- Every worker drops the session from its cache on the notification (sessions.py)
+WITH deleted AS (
+    DELETE FROM sessions WHERE session_token = %(token)s RETURNING session_token
+)
+SELECT pg_notify('laundry_sessions', 'session:' || encode(sha256(convert_to(session_token, 'UTF8')), 'hex'))
+FROM deleted;
+
+-- name: user_for_login
+SELECT user_id, password_hash, active FROM users WHERE username = %(username)s;
+
+-- name: update_password_hash
+UPDATE users SET password_hash = %(password_hash)s WHERE user_id = %(user_id)s;
+
+-- name: register_user
+-- Create the user and its first session; no row if the username is taken
+WITH new_user AS (
+    INSERT INTO users (username, password_hash)
+    VALUES (%(username)s, %(password_hash)s)
+    ON CONFLICT (username) DO NOTHING
+    RETURNING user_id
+), new_session AS (
+    INSERT INTO sessions (session_token, user_id, expires_at)
+    SELECT %(token)s, user_id, %(expires_at)s FROM new_user
+)
+SELECT user_id FROM new_user;
+
+-- name: list_product_types
+-- Active product types with their current stock level
+SELECT
+    pt.product_type_id AS id,
+    pt.description,
+    pt.unit_price_cents,
+    pt.date_time_created,
+    COALESCE(s.available_quantity, 0) AS available_quantity,
+    COALESCE(s.updated_at, pt.date_time_created) AS updated_at
+FROM product_types pt
+LEFT JOIN stock_levels s ON s.product_type_id = pt.product_type_id
+WHERE pt.active = TRUE
+ORDER BY pt.product_type_id DESC;
+
+-- name: list_stock
+-- Stock levels of active product types, most recently changed first
+SELECT
+    s.stock_id AS id,
+    s.product_type_id,
+    pt.description,
+    s.available_quantity,
+    s.updated_at
+FROM stock_levels s
+JOIN product_types pt ON pt.product_type_id = s.product_type_id
+WHERE pt.active = TRUE
+ORDER BY s.updated_at DESC NULLS LAST, s.stock_id DESC;
+
+-- name: create_product_type
+-- Create the product and its empty stock row together
+WITH product AS (
+    INSERT INTO product_types (description, date_time_created, unit_price_cents)
+    VALUES (%(description)s, now(), COALESCE(%(unit_price_cents)s, 0))
+    RETURNING product_type_id AS id, description, unit_price_cents, date_time_created
+), stock_row AS (
+    INSERT INTO stock (product_type_id, available_quantity, updated_at)
+    SELECT id, 0, NOW() FROM product
+    ON CONFLICT (product_type_id) DO NOTHING
+)
+SELECT product.* FROM product, pg_notify('laundry_cache', 'catalog');
+
+-- name: sync_watermark
+-- The oldest transaction still running on the server, for GET /api/sync, as text (psycopg has no
+-- xid8 loader). Every transaction id below it has committed or aborted, so no row with a lower
+-- changed_xid can still appear. Needs no privileges, unlike other sessions' pg_stat_activity rows.
+SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS watermark;
+
+-- name: sync_product_types
+-- Product types edited, disabled or with a stock movement by transaction since_xid or later, in
+-- the shape of list_product_types plus `active` (inactive rows are the client's tombstones)
+WITH changed AS (
+    SELECT product_type_id FROM product_types WHERE changed_xid >= %(since_xid)s::text::xid8
+    UNION
+    SELECT product_type_id FROM stock_movements WHERE changed_xid >= %(since_xid)s::text::xid8
+)
+SELECT
+    pt.product_type_id AS id,
+    pt.description,
+    pt.unit_price_cents,
+    pt.date_time_created,
+    COALESCE(s.available_quantity, 0) AS available_quantity,
+    COALESCE(s.updated_at, pt.date_time_created) AS updated_at,
+    pt.active
+FROM changed
+JOIN product_types pt ON pt.product_type_id = changed.product_type_id
+LEFT JOIN stock_levels s ON s.product_type_id = pt.product_type_id
+ORDER BY pt.product_type_id DESC;
+
+-- name: sync_stock
+-- Stock levels of active product types changed by transaction since_xid or later, in the shape
+-- of list_stock
+WITH changed AS (
+    SELECT product_type_id FROM product_types WHERE changed_xid >= %(since_xid)s::text::xid8
+    UNION
+    SELECT product_type_id FROM stock_movements WHERE changed_xid >= %(since_xid)s::text::xid8
+)
+SELECT
+    s.stock_id AS id,
+    s.product_type_id,
+    pt.description,
+    s.available_quantity,
+    s.updated_at
+FROM changed
+JOIN product_types pt ON pt.product_type_id = changed.product_type_id
+JOIN stock_levels s ON s.product_type_id = pt.product_type_id
+WHERE pt.active = TRUE
+ORDER BY s.updated_at DESC NULLS LAST, s.stock_id DESC;
+
+-- name: sync_orders
+-- Orders created or updated by transaction since_xid or later, oldest change first, at most `limit`
+SELECT
+    o.id,
+    o.status,
+    o.total_items,
+    o.total_price_cents,
+    o.created_at,
+    o.customer_id,
+    c.name AS customer_name,
+    o.updated_at
+FROM orders o
+JOIN customers c ON c.id = o.customer_id
+WHERE o.changed_xid >= %(since_xid)s::text::xid8
+ORDER BY o.changed_xid, o.id
+LIMIT %(limit)s;
 
--- Most recent orders for dashboard
--- $1: limit
+-- name: sync_open_orders
+-- The newest `limit` orders not yet delivered or canceled, for a full sync
 SELECT
     o.id,
     o.status,
     o.total_items,
     o.total_price_cents,
     o.created_at,
-    c.name AS customer_name
+    o.customer_id,
+    c.name AS customer_name,
+    o.updated_at
 FROM orders o
 JOIN customers c ON c.id = o.customer_id
-ORDER BY o.created_at DESC
-LIMIT $1;
+WHERE o.status IN ('received', 'in_process', 'ready')
+ORDER BY o.created_at DESC, o.id DESC
+LIMIT %(limit)s;
+
+-- name: daily_order_stats
+-- One zero-filled row per day from day_from to day_to (default: the 7 days ending today).
+-- Only the first max_days days of the range are returned: a longer range (e.g. day_from alone,
+-- far back) is cut off at its end, not reported whole. Revenue leaves out canceled orders;
+-- items count every order received. Pending trigger deltas are included (order_stats.py).
+WITH bounds AS (
+    SELECT
+        COALESCE(%(day_from)s::date, COALESCE(%(day_to)s::date, order_stats_day(NOW())) - 6) AS first_day,
+        COALESCE(%(day_to)s::date, order_stats_day(NOW())) AS last_day
+), days AS (
+    SELECT d.day::date AS day
+    FROM bounds
+    CROSS JOIN LATERAL generate_series(bounds.first_day, bounds.last_day, interval '1 day') AS d(day)
+    ORDER BY d.day
+    LIMIT %(max_days)s
+)
+SELECT
+    days.day,
+    COALESCE(sum(s.orders), 0)::bigint AS orders,
+    COALESCE(jsonb_object_agg(s.status, s.orders) FILTER (WHERE s.orders > 0), '{}'::jsonb) AS by_status,
+    COALESCE(sum(s.items), 0)::bigint AS items,
+    COALESCE(sum(s.revenue_cents) FILTER (WHERE s.status <> 'canceled'), 0)::bigint AS revenue_cents
+FROM days
+LEFT JOIN daily_order_stats_current s
+    ON s.day = days.day
+    AND s.day BETWEEN (SELECT first_day FROM bounds) AND (SELECT last_day FROM bounds)
+GROUP BY days.day
+ORDER BY days.day;
+
+-- name: search_customers
+-- Typeahead over customer_search_terms: `term >= prefix AND term < prefix_end` is one index
+-- range scan per rank, capped at limit rows, so cost doesn't grow with the table. phone_prefix
+-- is null unless the query looks like a phone number. Full-name matches rank first, then
+-- matches from a later word of the name, then phone matches.
+WITH hits AS (
+    (SELECT customer_id, rank, term FROM customer_search_terms
+     WHERE rank = 0 AND term >= %(prefix)s AND term < %(prefix_end)s
+     ORDER BY term LIMIT %(limit)s)
+    UNION ALL
+    (SELECT customer_id, rank, term FROM customer_search_terms
+     WHERE rank = 1 AND term >= %(prefix)s AND term < %(prefix_end)s
+     ORDER BY term LIMIT %(limit)s)
+    UNION ALL
+    (SELECT customer_id, rank, term FROM customer_search_terms
+     WHERE rank = 2 AND term >= %(phone_prefix)s AND term < %(phone_prefix_end)s
+     ORDER BY term LIMIT %(limit)s)
+), best AS (
+    SELECT DISTINCT ON (customer_id) customer_id, rank, term
+    FROM hits
+    ORDER BY customer_id, rank, term
+)
+SELECT c.id, c.name, c.phone, c.email, c.address
+FROM best b
+JOIN customers c ON c.id = b.customer_id
+ORDER BY b.rank, b.term, c.id
+LIMIT %(limit)s;
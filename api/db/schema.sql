@@ -1,117 +1,21 @@
 -- PostgreSQL schema for Laundry API
--- Entities: customers, orders, order_items, order_events
-
-CREATE TABLE IF NOT EXISTS customers (
-    id              BIGSERIAL PRIMARY KEY,
-    name            TEXT NOT NULL,
-    phone           TEXT,
-    email           TEXT,
-    address         TEXT,
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    UNIQUE (name, phone)
-);
-
-CREATE TABLE IF NOT EXISTS users (
-    user_id         BIGSERIAL PRIMARY KEY,
-    username        TEXT NOT NULL UNIQUE,
-    password_hash   TEXT NOT NULL,
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    active          BOOLEAN NOT NULL DEFAULT TRUE,
-    email           TEXT,
-    auth_provider   TEXT NOT NULL DEFAULT 'local',
-    google_sub      TEXT
-);
-ALTER TABLE users ADD COLUMN IF NOT EXISTS email TEXT;
-ALTER TABLE users ADD COLUMN IF NOT EXISTS auth_provider TEXT NOT NULL DEFAULT 'local';
-ALTER TABLE users ADD COLUMN IF NOT EXISTS google_sub TEXT;
-CREATE UNIQUE INDEX IF NOT EXISTS uq_users_email ON users(email) WHERE email IS NOT NULL;
-CREATE UNIQUE INDEX IF NOT EXISTS uq_users_google_sub ON users(google_sub) WHERE google_sub IS NOT NULL;
-
-CREATE TABLE IF NOT EXISTS sessions (
-    session_token   TEXT PRIMARY KEY,
-    user_id         BIGINT NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
-    expires_at      TIMESTAMPTZ NOT NULL,
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
-CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
-CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
-
--- Inventory catalog: productos en venta, insumos o variantes de LA TINTO
-CREATE TABLE IF NOT EXISTS product_types (
-    product_type_id   INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-    description       VARCHAR NOT NULL,
-    unit_price_cents  INTEGER NOT NULL DEFAULT 0,
-    date_time_created TIMESTAMP NOT NULL DEFAULT NOW(),
-    active            BOOLEAN NOT NULL DEFAULT TRUE
-);
-ALTER TABLE product_types ADD COLUMN IF NOT EXISTS active BOOLEAN NOT NULL DEFAULT TRUE;
-ALTER TABLE product_types
-    ADD COLUMN IF NOT EXISTS unit_price_cents INTEGER NOT NULL DEFAULT 0;
-
--- Información de stock
-CREATE TABLE IF NOT EXISTS stock (
-    stock_id           INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-    product_type_id    INTEGER NOT NULL REFERENCES product_types(product_type_id),
-    available_quantity INTEGER NOT NULL DEFAULT 0,
-    updated_at         TIMESTAMP NOT NULL DEFAULT NOW()
-);
-CREATE INDEX IF NOT EXISTS idx_stock_product_type_id ON stock(product_type_id);
--- Ensure one stock row per product_type for UPSERT logic
-CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_product_type_id ON stock(product_type_id);
-
-CREATE TABLE IF NOT EXISTS orders (
-    id                  BIGSERIAL PRIMARY KEY,
-    customer_id         BIGINT NOT NULL REFERENCES customers(id),
-    status              TEXT NOT NULL CHECK (status IN ('received','in_process','ready','delivered','canceled')),
-    pickup_notes        TEXT,
-    delivery_notes      TEXT,
-    total_items         INTEGER NOT NULL DEFAULT 0,
-    total_price_cents   INTEGER NOT NULL DEFAULT 0,
-    pickup_at           TIMESTAMPTZ,
-    delivery_at         TIMESTAMPTZ,
-    created_at          TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    updated_at          TIMESTAMPTZ NOT NULL DEFAULT NOW()
-);
-CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders(customer_id);
-CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
-
-CREATE TABLE IF NOT EXISTS order_items (
-    id                  BIGSERIAL PRIMARY KEY,
-    order_id            BIGINT NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
-    sku                 TEXT NOT NULL,
-    description         TEXT,
-    qty                 INTEGER NOT NULL CHECK (qty > 0),
-    unit_price_cents    INTEGER NOT NULL DEFAULT 0
-);
-CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
-
-CREATE TABLE IF NOT EXISTS order_events (
-    id              BIGSERIAL PRIMARY KEY,
-    order_id        BIGINT NOT NULL REFERENCES orders(id) ON DELETE CASCADE,
-    status          TEXT NOT NULL CHECK (status IN ('received','in_process','ready','delivered','canceled')),
-    note            TEXT,
-    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    created_by      TEXT
-);
-CREATE INDEX IF NOT EXISTS idx_order_events_order_id ON order_events(order_id);
-
--- Keep updated_at fresh on updates
-CREATE OR REPLACE FUNCTION set_updated_at() RETURNS TRIGGER AS $$
-BEGIN
-    NEW.updated_at = NOW();
-    RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
-DO $$
-BEGIN
-    IF NOT EXISTS (
-        SELECT 1 FROM pg_trigger WHERE tgname = 'trg_orders_updated_at'
-    ) THEN
-        CREATE TRIGGER trg_orders_updated_at
-        BEFORE UPDATE ON orders
-        FOR EACH ROW
-        EXECUTE FUNCTION set_updated_at();
-    END IF;
-END;
-$$;
+-- Entities: customers, orders, order_items, order_events, users, sessions, product_types, stock
+--
+-- This file is the ordered list of migrations and the single source of truth for
+-- `python migrate.py`, which applies each file once and records it (with a checksum)
+-- in schema_migrations. Add new changes as a new numbered file and list it here;
+-- never edit a migration that has been applied. `psql -f db/schema.sql` still works
+-- for throwaway databases, but does not record versions, so the API will refuse to
+-- start against it.
+\ir migrations/0001_baseline.sql
+\ir migrations/0002_order_keyset_indexes.sql
+\ir migrations/0003_stock_ledger.sql
+\ir migrations/0004_drop_duplicate_username_index.sql
+\ir migrations/0005_daily_order_stats.sql
+\ir migrations/0006_customer_search.sql
+\ir migrations/0007_idempotency_keys.sql
+\ir migrations/0008_partition_events_sessions.sql
+\ir migrations/0009_sync_change_tracking.sql
+\ir migrations/0010_daily_order_stats_deltas.sql
+\ir migrations/0011_partition_lock_notes.sql
+\ir migrations/0012_sync_changed_xid.sql
@@ -0,0 +1,41 @@
+"""Pre-serialized JSON bodies with weak ETags for cached read endpoints.
+
+The catalog cache stores `Encoded` bodies rather than rows, so a cache hit
+is served without serializing anything. The ETag is a hash of the body,
+computed once per cache fill; because it depends only on the content, every
+worker hands out the same tag for the same data and a client revalidating
+against any of them gets 304 when nothing has changed.
+"""
+import hashlib
+from typing import Any, NamedTuple
+
+import orjson
+from fastapi import Response
+
+
+class Encoded(NamedTuple):
+    etag: str
+    body: bytes
+
+
+def encode(payload: Any) -> Encoded:
+    body = orjson.dumps(payload)
+    return Encoded(f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', body)
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison against an If-None-Match header (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def respond(encoded: Encoded, if_none_match: str | None) -> Response:
+    # no-cache: clients may keep the body but must revalidate before using it
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if matches(if_none_match, encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(encoded.body, media_type="application/json", headers=headers)
@@ -0,0 +1,189 @@
+"""Streaming order exports (GET /api/exports/orders).
+
+Rows go from Postgres to the client in bounded chunks and are never all in
+memory: CSV is produced by `COPY (...) TO STDOUT`, NDJSON by a named
+(server-side) cursor read `EXPORT_BATCH` rows at a time. uvicorn awaits the
+socket before taking the next chunk, so a slow client slows the query down
+instead of growing a buffer.
+
+Both layouts match `bulk_import.py` (CSV: one line item per row keyed by
+`order_ref`; NDJSON: one `CreateOrder`-shaped document per order with
+`ref`), with the order's id, status, creation time and totals added, so an
+export can be loaded back with the importer.
+
+At most EXPORT_CONCURRENCY exports run at once. The handler takes a slot
+with `reserve()` before responding, and the slot goes back when the body
+ends, fails or never starts (see `ExportResponse`).
+"""
+import logging
+import os
+from datetime import datetime
+from typing import AsyncIterator
+
+from psycopg import sql
+from psycopg_pool import AsyncConnectionPool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_BATCH = int(os.getenv("EXPORT_BATCH", "2000"))
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "2"))
+CHUNK_BYTES = 64 * 1024
+
+_active = 0
+
+logger = logging.getLogger(__name__)
+
+CSV_QUERY = """
+SELECT
+    o.id AS order_ref,
+    o.created_at,
+    o.status,
+    c.id AS customer_id,
+    c.name AS customer_name,
+    c.phone AS customer_phone,
+    c.email AS customer_email,
+    c.address AS customer_address,
+    o.pickup_notes,
+    o.delivery_notes,
+    o.pickup_at,
+    o.delivery_at,
+    o.total_items,
+    o.total_price_cents,
+    i.sku,
+    i.description,
+    i.qty,
+    i.unit_price_cents
+FROM orders o
+JOIN customers c ON c.id = o.customer_id
+LEFT JOIN order_items i ON i.order_id = o.id
+{where}
+ORDER BY o.created_at, o.id, i.id
+"""
+
+NDJSON_QUERY = """
+SELECT json_build_object(
+    'ref', o.id,
+    'order_id', o.id,
+    'created_at', o.created_at,
+    'status', o.status,
+    'customer', json_build_object('id', c.id, 'name', c.name, 'phone', c.phone, 'email', c.email, 'address', c.address),
+    'pickup_notes', o.pickup_notes,
+    'delivery_notes', o.delivery_notes,
+    'pickup_at', o.pickup_at,
+    'delivery_at', o.delivery_at,
+    'total_items', o.total_items,
+    'total_price_cents', o.total_price_cents,
+    'items', COALESCE((
+        SELECT json_agg(json_build_object(
+            'sku', i.sku, 'description', i.description, 'qty', i.qty, 'unit_price_cents', i.unit_price_cents
+        ) ORDER BY i.id)
+        FROM order_items i WHERE i.order_id = o.id
+    ), '[]'::json)
+)::text
+FROM orders o
+JOIN customers c ON c.id = o.customer_id
+{where}
+ORDER BY o.created_at, o.id
+"""
+
+
+class ExportsBusy(Exception):
+    """Raised when EXPORT_CONCURRENCY exports are already streaming."""
+
+
+def _where(created_from: datetime | None, created_to: datetime | None) -> sql.Composable:
+    where = []
+    if created_from is not None:
+        where.append(sql.SQL("o.created_at >= {}").format(sql.Literal(created_from)))
+    if created_to is not None:
+        where.append(sql.SQL("o.created_at < {}").format(sql.Literal(created_to)))
+    return sql.SQL("WHERE ") + sql.SQL(" AND ").join(where) if where else sql.SQL("")
+
+
+class ExportSlot:
+    """One of the EXPORT_CONCURRENCY running exports; release() is idempotent."""
+
+    def __init__(self):
+        self.held = True
+
+    def release(self) -> None:
+        global _active
+        if self.held:
+            self.held = False
+            _active -= 1
+
+
+def reserve() -> ExportSlot:
+    """Take an export slot or raise ExportsBusy; each running export holds a pooled connection.
+
+    The check and the count happen with no await in between, so concurrent
+    requests can't all pass the check before any of them is counted.
+    """
+    global _active
+    if _active >= EXPORT_CONCURRENCY:
+        raise ExportsBusy()
+    _active += 1
+    return ExportSlot()
+
+
+class ExportResponse(StreamingResponse):
+    """StreamingResponse that releases its export slot however the response ends.
+
+    The body generator releases it too, but a generator that never started
+    (the client left before the headers went out) never runs its `finally`.
+    """
+
+    def __init__(self, slot: ExportSlot, content: AsyncIterator[bytes], **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()
+
+
+async def stream_orders(
+    pool: AsyncConnectionPool,
+    fmt: str,
+    slot: ExportSlot,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> AsyncIterator[bytes]:
+    """Yield the export as chunks of about CHUNK_BYTES, oldest order first; releases `slot` when done."""
+    try:
+        where = _where(created_from, created_to)
+        buffer = bytearray()
+        async with pool.connection() as conn:
+            if fmt == "csv":
+                query = sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER)").format(
+                    sql.SQL(CSV_QUERY).format(where=where)
+                )
+                async with conn.cursor() as cur:
+                    async with cur.copy(query) as copy:
+                        async for data in copy:
+                            buffer += data
+                            if len(buffer) >= CHUNK_BYTES:
+                                yield bytes(buffer)
+                                buffer.clear()
+            else:
+                query = sql.SQL(NDJSON_QUERY).format(where=where)
+                async with conn.cursor(name="orders_export") as cur:
+                    await cur.execute(query)
+                    while rows := await cur.fetchmany(EXPORT_BATCH):
+                        for (line,) in rows:
+                            buffer += line.encode()
+                            buffer += b"\n"
+                            if len(buffer) >= CHUNK_BYTES:
+                                yield bytes(buffer)
+                                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+    except Exception:
+        # Headers are already sent; the client sees a truncated body
+        logger.exception("Order export failed")
+        raise
+    finally:
+        slot.release()
@@ -0,0 +1,174 @@
+"""Google ID token verification against locally cached signing keys.
+
+`id_token.verify_oauth2_token` downloads Google's certificates on every call
+unless the transport caches them. Here the certificates are held in memory
+for as long as Google's Cache-Control max-age allows, refreshed in the
+background before they expire, and tokens are verified locally with
+`google.auth.jwt.decode`. A login only waits on Google when the cache is
+cold or the token is signed with a key id we have not seen yet (rotation).
+
+Key sources are pluggable: `CachedCertsSource` fetches over HTTP,
+`StaticKeySource` serves a fixed {kid: PEM} mapping so tokens signed with
+locally generated keys can be verified fully offline (GOOGLE_CERTS_FILE).
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Callable, Mapping, Protocol
+
+import requests
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt
+
+import profiling
+
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_CERTS_FILE = os.getenv("GOOGLE_CERTS_FILE", "")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidToken(ValueError):
+    """The ID token is malformed, expired, mis-signed or not meant for us."""
+
+
+class KeySource(Protocol):
+    async def get_certs(self) -> Mapping[str, str]: ...
+
+    async def refresh(self) -> Mapping[str, str]: ...
+
+
+class StaticKeySource:
+    """Fixed {kid: PEM certificate or public key}; never touches the network."""
+
+    def __init__(self, certs: Mapping[str, str]):
+        self.certs = dict(certs)
+
+    @classmethod
+    def from_file(cls, path: str) -> "StaticKeySource":
+        with open(path) as fh:
+            return cls(json.load(fh))
+
+    async def get_certs(self) -> Mapping[str, str]:
+        return self.certs
+
+    async def refresh(self) -> Mapping[str, str]:
+        return self.certs
+
+
+def _fetch_certs(url: str, session: requests.Session) -> tuple[dict, float]:
+    """Blocking fetch; returns (certs, seconds they may be cached)."""
+    resp = session.get(url, timeout=5)
+    resp.raise_for_status()
+    match = MAX_AGE_RE.search(resp.headers.get("Cache-Control", ""))
+    max_age = int(match.group(1)) if match else 0
+    max_age -= int(resp.headers.get("Age", "0") or 0)
+    return resp.json(), float(max(max_age, 0))
+
+
+class CachedCertsSource:
+    """Google's certificates, cached in memory per Cache-Control.
+
+    Concurrent misses share one fetch, and refreshes within
+    `min_refresh_interval` of the last fetch are no-ops, so tokens with
+    made-up key ids cannot make us hammer Google. A failed refresh keeps
+    serving the previous certificates; Google overlaps key rotation by days,
+    so stale keys are far safer than failing every login during a blip.
+    """
+
+    def __init__(
+        self,
+        url: str = GOOGLE_CERTS_URL,
+        fetch: Callable[[str], tuple[dict, float]] | None = None,
+        min_ttl: float = 60,
+        default_ttl: float = 3600,
+        refresh_margin: float = 0.1,
+        min_refresh_interval: float = 30,
+    ):
+        self.url = url
+        self._session = requests.Session()
+        self._fetch = fetch or (lambda u: _fetch_certs(u, self._session))
+        self.min_ttl = min_ttl
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.fetches = 0
+        self._certs: dict[str, str] = {}
+        self._ttl = 0.0
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def get_certs(self) -> Mapping[str, str]:
+        if self._certs and time.monotonic() < self._expires_at:
+            return self._certs
+        return await self.refresh()
+
+    async def refresh(self) -> Mapping[str, str]:
+        async with self._lock:
+            if self._certs and time.monotonic() - self._fetched_at < self.min_refresh_interval:
+                return self._certs  # just fetched, possibly by a caller we queued behind
+            started = time.perf_counter()
+            try:
+                certs, max_age = await asyncio.to_thread(self._fetch, self.url)
+            except Exception:
+                profiling.record("http", f"GET {self.url}", started, failed=True)
+                if not self._certs:
+                    raise
+                logger.warning("Google certs refresh failed; serving cached keys", exc_info=True)
+                self._expires_at = time.monotonic() + self.min_ttl
+                return self._certs
+            profiling.record("http", f"GET {self.url}", started)
+            self.fetches += 1
+            self._fetched_at = time.monotonic()
+            self._certs = certs
+            self._ttl = max(max_age or self.default_ttl, self.min_ttl)
+            self._expires_at = time.monotonic() + self._ttl
+            return certs
+
+    async def run_refresher(self) -> None:
+        """Refresh shortly before expiry so logins never wait on the fetch."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception:  # pragma: no cover
+                logger.exception("Google certs refresh failed")
+            delay = self._expires_at - time.monotonic() - self._ttl * self.refresh_margin
+            await asyncio.sleep(max(delay, self.min_refresh_interval))
+
+
+def default_source() -> KeySource:
+    if GOOGLE_CERTS_FILE:
+        return StaticKeySource.from_file(GOOGLE_CERTS_FILE)
+    return CachedCertsSource()
+
+
+class GoogleTokenVerifier:
+    def __init__(self, client_id: str, source: KeySource, clock_skew: int = 10):
+        self.client_id = client_id
+        self.source = source
+        self.clock_skew = clock_skew
+
+    async def verify(self, token: str) -> dict:
+        """Return the token's claims, or raise InvalidToken."""
+        try:
+            kid = jwt.decode_header(token).get("kid")
+        except (ValueError, TypeError) as exc:
+            raise InvalidToken("Malformed token") from exc
+        certs = await self.source.get_certs()
+        if kid not in certs:
+            # Signed with a key newer than our cache
+            certs = await self.source.refresh()
+        try:
+            claims = jwt.decode(token, certs=certs, audience=self.client_id, clock_skew_in_seconds=self.clock_skew)
+        except (ValueError, google_exceptions.GoogleAuthError) as exc:
+            raise InvalidToken(str(exc)) from exc
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise InvalidToken("Invalid issuer")
+        return claims
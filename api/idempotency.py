@@ -0,0 +1,90 @@
+"""Idempotency-Key replay for POST /api/orders, and the expired-key sweeper.
+
+The key row is written by the create_order statement itself (migration
+0007), so it commits or rolls back with the order. A retry carrying the
+same key gets the stored response back: from this worker's replay cache
+if it saw the key, otherwise from `idempotency_keys`, in either case
+without writing anything. A key reused with a different body is refused.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+
+from psycopg_pool import AsyncConnectionPool
+from pydantic import BaseModel
+
+from cache import TTLCache
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv("IDEMPOTENCY_CACHE_TTL", "600"))
+IDEMPOTENCY_SWEEP_INTERVAL = float(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL", "600"))
+IDEMPOTENCY_SWEEP_BATCH = int(os.getenv("IDEMPOTENCY_SWEEP_BATCH", "1000"))
+MAX_KEY_LENGTH = 255
+
+logger = logging.getLogger(__name__)
+replay_cache = TTLCache(IDEMPOTENCY_CACHE_SIZE, min(IDEMPOTENCY_CACHE_TTL, IDEMPOTENCY_TTL))
+
+
+class KeyReused(Exception):
+    """Raised when a stored key arrives with a different request body."""
+
+
+def request_hash(payload: BaseModel) -> bytes:
+    return hashlib.sha256(payload.model_dump_json().encode()).digest()[:16]
+
+
+def cached_response(key: str, digest: bytes) -> dict | None:
+    entry = replay_cache.get(key)
+    if entry is None:
+        return None
+    if entry[0] != digest:
+        raise KeyReused()
+    return entry[1]
+
+
+def remember(key: str, digest: bytes, response: dict) -> None:
+    replay_cache.set(key, (digest, response))
+
+
+def replay(key: str, digest: bytes, row: dict) -> dict:
+    """Stored response for a create_order row with replayed = true."""
+    if bytes(row["request_hash"]) != digest:
+        raise KeyReused()
+    remember(key, digest, row["response"])
+    return row["response"]
+
+
+async def sweep_expired(pool: AsyncConnectionPool) -> int:
+    """Delete keys older than IDEMPOTENCY_TTL in bounded batches."""
+    deleted = 0
+    while True:
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                DELETE FROM idempotency_keys
+                WHERE key IN (
+                    SELECT key FROM idempotency_keys
+                    WHERE created_at < NOW() - make_interval(secs => %s)
+                    ORDER BY created_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (IDEMPOTENCY_TTL, IDEMPOTENCY_SWEEP_BATCH),
+            )
+            deleted += cur.rowcount
+        if cur.rowcount < IDEMPOTENCY_SWEEP_BATCH:
+            return deleted
+
+
+async def run_sweeper(pool: AsyncConnectionPool) -> None:
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_SWEEP_INTERVAL)
+        try:
+            deleted = await sweep_expired(pool)
+            if deleted:
+                logger.info("Swept %d expired idempotency keys", deleted)
+        except Exception:  # pragma: no cover
+            logger.exception("Idempotency key sweep failed")
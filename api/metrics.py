@@ -0,0 +1,177 @@
+"""Prometheus metrics for /metrics.
+
+Request latency and counts are recorded by `MetricsMiddleware`, a plain ASGI
+middleware labelled by route template (`/api/orders/{order_id}`, never the
+raw path) so the number of series stays bounded. Everything else is already
+counted by the module that owns it — `pool.get_stats()`, `statements.stats`,
+`passwords.stats`, the caches' hit/miss counters, `ReadRouter.stats`,
+`Gate.stats` — and `AppCollector` only reads those numbers when /metrics
+is scraped, adding nothing per request.
+
+State is per process; the container runs a single uvicorn worker.
+"""
+import time
+from typing import Callable, Mapping
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from psycopg_pool import AsyncConnectionPool
+
+import admission
+import passwords
+import replicas
+import statements
+from cache import TTLCache
+
+UNMATCHED = "<unmatched>"
+
+REQUEST_SECONDS = Histogram(
+    "laundry_http_request_duration_seconds",
+    "Time from request start until the response is fully sent",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter("laundry_http_requests", "Requests by route and response status", ["method", "route", "status"])
+
+# Pool gauges are point-in-time; the rest of get_stats() only grows.
+POOL_GAUGES = ("pool_min", "pool_max", "pool_size", "pool_available", "requests_waiting")
+POOL_COUNTERS = ("requests_num", "requests_queued", "requests_errors", "returns_bad", "connections_num", "connections_errors", "connections_lost")
+POOL_MS_COUNTERS = ("usage_ms", "requests_wait_ms", "connections_ms")
+
+
+class MetricsMiddleware:
+    """Time each HTTP request and count it by status."""
+
+    def __init__(self, app):
+        self.app = app
+        # labels() hashes and validates on every call; resolve each child once
+        self._histograms: dict[tuple, object] = {}
+        self._counters: dict[tuple, object] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", UNMATCHED))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = REQUEST_SECONDS.labels(*key)
+            histogram.observe(time.perf_counter() - start)
+            counter_key = (*key, status)
+            counter = self._counters.get(counter_key)
+            if counter is None:
+                counter = self._counters[counter_key] = REQUESTS.labels(*key, str(status))
+            counter.inc()
+
+
+class AppCollector:
+    """Read pool, statement, bcrypt and cache stats at scrape time."""
+
+    def __init__(
+        self,
+        get_pool: Callable[[], AsyncConnectionPool | None],
+        caches: Mapping[str, TTLCache],
+        replica: replicas.ReadRouter | None = None,
+        gate: admission.Gate | None = None,
+    ):
+        self.get_pool = get_pool
+        self.caches = caches
+        self.replica = replica
+        self.gate = gate
+
+    def collect(self):
+        pool = self.get_pool()
+        if pool is not None:
+            pool_stats = pool.get_stats()
+            for name in POOL_GAUGES:
+                yield GaugeMetricFamily(f"laundry_db_{name}", f"psycopg pool {name}", value=pool_stats.get(name, 0))
+            for name in POOL_COUNTERS:
+                yield CounterMetricFamily(f"laundry_db_{name}", f"psycopg pool {name}", value=pool_stats.get(name, 0))
+            for name in POOL_MS_COUNTERS:
+                seconds = name.removesuffix("_ms") + "_seconds"
+                yield CounterMetricFamily(f"laundry_db_{seconds}", f"psycopg pool {name} / 1000", value=pool_stats.get(name, 0) / 1000)
+
+        calls = CounterMetricFamily("laundry_db_statement_calls", "Named statement executions", labels=["statement"])
+        seconds = CounterMetricFamily("laundry_db_statement_seconds", "Time spent executing named statements", labels=["statement"])
+        peak = GaugeMetricFamily("laundry_db_statement_max_seconds", "Slowest single execution since start", labels=["statement"])
+        for name, entry in statements.stats().items():
+            calls.add_metric([name], entry["calls"])
+            seconds.add_metric([name], entry["total_ms"] / 1000)
+            peak.add_metric([name], entry["max_ms"] / 1000)
+        yield calls
+        yield seconds
+        yield peak
+
+        bcrypt = passwords.stats()
+        yield CounterMetricFamily("laundry_bcrypt_operations", "Completed bcrypt hashes and verifies", value=bcrypt["completed"])
+        yield CounterMetricFamily("laundry_bcrypt_seconds", "Time spent in bcrypt, including pool dispatch", value=bcrypt["seconds"])
+        yield CounterMetricFamily("laundry_bcrypt_rejected", "Hash requests refused because the queue was full", value=bcrypt["rejected"])
+        yield GaugeMetricFamily("laundry_bcrypt_in_flight", "bcrypt operations running now", value=bcrypt["in_flight"])
+        yield GaugeMetricFamily("laundry_bcrypt_queued", "bcrypt operations waiting for a slot", value=bcrypt["queued"])
+
+        hits = CounterMetricFamily("laundry_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("laundry_cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("laundry_cache_hit_ratio", "Hits / lookups since start", labels=["cache"])
+        entries = GaugeMetricFamily("laundry_cache_entries", "Entries currently cached", labels=["cache"])
+        for name, cache in self.caches.items():
+            lookups = cache.hits + cache.misses
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            ratio.add_metric([name], cache.hits / lookups if lookups else 0.0)
+            entries.add_metric([name], len(cache))
+        yield hits
+        yield misses
+        yield ratio
+        yield entries
+
+        if self.replica is not None and self.replica.enabled:
+            replica = self.replica.stats()
+            yield GaugeMetricFamily("laundry_replica_healthy", "1 while reads may go to the replica", value=int(replica["healthy"]))
+            if replica["lag_seconds"] is not None:
+                yield GaugeMetricFamily("laundry_replica_lag_seconds", "Age of the oldest WAL position not yet replayed", value=replica["lag_seconds"])
+            yield CounterMetricFamily("laundry_replica_fallbacks", "Reads retried on the primary after failing on the replica", value=replica["fallbacks"])
+            reads = CounterMetricFamily("laundry_reads", "Routed reads by target", labels=["target"])
+            for target, count in replica["reads"].items():
+                reads.add_metric([target], count)
+            yield reads
+
+        if self.gate is not None:
+            gate = self.gate.stats()
+            yield GaugeMetricFamily("laundry_admission_slots", "Primary pool slots the gate hands out", value=gate["capacity"])
+            admitted = CounterMetricFamily("laundry_admission_admitted", "Checkouts let through the gate", labels=["priority"])
+            rejected = CounterMetricFamily("laundry_admission_rejected", "Requests refused with 503 by the gate", labels=["priority"])
+            waited = CounterMetricFamily("laundry_admission_wait_seconds", "Time spent queued for a slot", labels=["priority"])
+            in_flight = GaugeMetricFamily("laundry_admission_in_flight", "Slots held now", labels=["priority"])
+            waiting = GaugeMetricFamily("laundry_admission_waiting", "Requests queued for a slot now", labels=["priority"])
+            for level, entry in gate["levels"].items():
+                admitted.add_metric([level], entry["admitted"])
+                rejected.add_metric([level], entry["rejected"])
+                waited.add_metric([level], entry["wait_seconds"])
+                in_flight.add_metric([level], entry["in_flight"])
+                waiting.add_metric([level], entry["waiting"])
+            yield admitted
+            yield rejected
+            yield waited
+            yield in_flight
+            yield waiting
+
+
+def register(collector: AppCollector) -> None:
+    REGISTRY.register(collector)
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
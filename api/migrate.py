@@ -0,0 +1,167 @@
+"""Versioned schema migrations.
+
+`db/schema.sql` lists the migration files in order (`\\ir migrations/NNNN_name.sql`);
+this module reads that list, applies each pending file in its own
+transaction and records its version and checksum in `schema_migrations`.
+An applied file whose checksum no longer matches is an error, never
+silently re-run.
+
+Run it as a separate step before deploying; the API itself only checks the
+recorded version at startup (see `verify`).
+
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list migrations, exit 1 if any are pending
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import psycopg
+from psycopg import AsyncConnection
+
+DB_DIR = Path(__file__).resolve().parent / "db"
+MANIFEST = DB_DIR / "schema.sql"
+MIGRATIONS_LOCK = 0x5C11E3A  # advisory lock so two runners never interleave
+
+INCLUDE_RE = re.compile(r"^\\ir\s+(\S+)\s*$")
+NAME_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version     INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    checksum    TEXT NOT NULL,
+    applied_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    sql: str
+    checksum: str
+
+
+def load_migrations(manifest: Path = MANIFEST) -> list[Migration]:
+    """Read the ordered migration list from the manifest."""
+    migrations = []
+    for line in manifest.read_text().splitlines():
+        match = INCLUDE_RE.match(line.strip())
+        if not match:
+            continue
+        path = manifest.parent / match.group(1)
+        name_match = NAME_RE.match(path.name)
+        if not name_match:
+            raise MigrationError(f"Migration file name must look like NNNN_name.sql: {path.name}")
+        sql = path.read_text()
+        migrations.append(
+            Migration(
+                version=int(name_match.group(1)),
+                name=name_match.group(2),
+                sql=sql,
+                checksum=hashlib.sha256(sql.encode()).hexdigest(),
+            )
+        )
+    versions = [m.version for m in migrations]
+    if versions != sorted(set(versions)):
+        raise MigrationError(f"Migration versions must be unique and increasing: {versions}")
+    return migrations
+
+
+def expected_version(migrations: list[Migration] | None = None) -> int:
+    migrations = load_migrations() if migrations is None else migrations
+    return migrations[-1].version if migrations else 0
+
+
+def applied_checksums(conn: psycopg.Connection) -> dict[int, str]:
+    exists = conn.execute("SELECT to_regclass('schema_migrations') IS NOT NULL").fetchone()[0]
+    if not exists:
+        return {}
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+
+def check_checksums(migrations: list[Migration], applied: dict[int, str]) -> None:
+    for m in migrations:
+        if m.version in applied and applied[m.version] != m.checksum:
+            raise MigrationError(f"Migration {m.version:04d}_{m.name} was modified after it was applied")
+
+
+def migrate(conn: psycopg.Connection, migrations: list[Migration] | None = None) -> list[Migration]:
+    """Apply pending migrations in order; returns the ones applied.
+
+    `conn` must be in autocommit mode; each migration runs in its own
+    transaction so a failure leaves earlier ones recorded.
+    """
+    migrations = load_migrations() if migrations is None else migrations
+    conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATIONS_LOCK,))
+    try:
+        conn.execute(CREATE_TABLE_SQL)
+        applied = applied_checksums(conn)
+        check_checksums(migrations, applied)
+        done = []
+        for m in migrations:
+            if m.version in applied:
+                continue
+            with conn.transaction():
+                conn.execute(m.sql)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (m.version, m.name, m.checksum),
+                )
+            done.append(m)
+        return done
+    finally:
+        conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK,))
+
+
+async def verify(conn: AsyncConnection, version: int) -> None:
+    """Fail fast unless the database has at least `version` applied. One cheap query, no DDL."""
+    cur = await conn.execute(
+        "SELECT CASE WHEN to_regclass('schema_migrations') IS NULL THEN 0"
+        " ELSE (SELECT COALESCE(max(version), 0) FROM schema_migrations) END"
+    )
+    current = (await cur.fetchone())[0]
+    if current < version:
+        raise MigrationError(
+            f"Database schema is at version {current}, this build needs {version}; run `python migrate.py`"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--status", action="store_true", help="show applied/pending migrations without applying")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    migrations = load_migrations()
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        if args.status:
+            applied = applied_checksums(conn)
+            check_checksums(migrations, applied)
+            for m in migrations:
+                print(f"{m.version:04d}_{m.name}: {'applied' if m.version in applied else 'pending'}")
+            sys.exit(1 if any(m.version not in applied for m in migrations) else 0)
+        done = migrate(conn, migrations)
+    for m in done:
+        print(f"applied {m.version:04d}_{m.name}")
+    print(f"schema at version {expected_version(migrations)}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except MigrationError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        sys.exit(1)
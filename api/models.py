@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class Customer(BaseModel):
+    name: str
+    phone: str | None = None
+    email: str | None = None
+    address: str | None = None
+
+
+class OrderItem(BaseModel):
+    sku: str
+    qty: int
+    description: str | None = None
+    unit_price_cents: int | None = 0
+
+
+class CreateOrder(BaseModel):
+    customer: Customer
+    items: list[OrderItem]
+    pickup_notes: str | None = None
+    delivery_notes: str | None = None
+    pickup_at: datetime | None = None
+    delivery_at: datetime | None = None
+
+
+class OrderStatusUpdate(BaseModel):
+    status: str
+    note: str | None = None
+
+
+class ProductTypeCreate(BaseModel):
+    description: str
+    unit_price_cents: int | None = 0
+
+
+class StockAdjust(BaseModel):
+    product_type_id: int
+    quantity: int
+    reason: str | None = None
+    order_id: int | None = None
+
+
+class StockBatchItem(BaseModel):
+    product_type_id: int
+    delta: int
+
+
+class StockBatch(BaseModel):
+    items: list[StockBatchItem]
+    reason: str | None = None
+
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+
+class RegisterRequest(BaseModel):
+    username: str
+    password: str
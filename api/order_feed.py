@@ -0,0 +1,158 @@
+"""Fan-out of order status changes to server-sent event streams.
+
+The worker's shared `pubsub.Listener` delivers each `laundry_orders`
+NOTIFY to `OrderFeed.publish`, which formats the SSE message once and puts
+it on every matching subscriber's queue. Open screens therefore cost no
+queries; only a reconnecting client with a Last-Event-ID reads
+`order_events` once to catch up.
+
+A subscriber whose queue fills up (a stalled client), and every subscriber
+after the LISTEN connection drops, gets a `resync` event instead of the
+messages it missed, telling it to refetch. So does a client reconnecting
+with a Last-Event-ID more than SSE_REPLAY_MAX events or SSE_REPLAY_WINDOW
+seconds behind.
+
+A stream's subscriber is registered by `reserve()` in the request handler,
+before the response starts, so the SSE_MAX_CLIENTS check and the count
+can't be raced past, and no live event is missed while the replay runs.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "1000"))
+SSE_HEARTBEAT = float(os.getenv("SSE_HEARTBEAT", "15"))
+SSE_REPLAY_MAX = int(os.getenv("SSE_REPLAY_MAX", "500"))
+SSE_REPLAY_WINDOW = float(os.getenv("SSE_REPLAY_WINDOW", "86400"))
+
+RESYNC = (0, None, "event: resync\ndata: {}\n\n")
+
+
+class FeedFull(Exception):
+    """Raised when SSE_MAX_CLIENTS streams are already open."""
+
+
+def replay_bounds() -> dict:
+    """Time bounds for order_events_since: a Last-Event-ID older than SSE_REPLAY_WINDOW
+    isn't replayed, so the query reads only the latest partitions."""
+    now = datetime.now(timezone.utc)
+    window = timedelta(seconds=SSE_REPLAY_WINDOW)
+    return {"seen_since": now - window, "events_since": now - 2 * window, "until": now + window}
+
+
+def format_event(event: dict) -> str:
+    return f"id: {event['event_id']}\nevent: status\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+class Subscriber:
+    def __init__(self, order_id: int | None):
+        self.order_id = order_id
+        self.queue: asyncio.Queue[tuple[int, int | None, str]] = asyncio.Queue(SSE_QUEUE_SIZE)
+
+    def offer(self, message: tuple[int, int | None, str]) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Too far behind to catch up message by message
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class OrderFeed:
+    def __init__(self, max_clients: int = SSE_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self.subscribers: set[Subscriber] = set()
+        self.published = 0
+
+    def publish(self, payload: str) -> None:
+        """Listener callback for the orders channel."""
+        event = json.loads(payload)
+        message = (event["event_id"], event["order_id"], format_event(event))
+        self.published += 1
+        for sub in self.subscribers:
+            if sub.order_id is None or sub.order_id == event["order_id"]:
+                sub.offer(message)
+
+    def resync(self) -> None:
+        """Listener reconnect callback: notifications may have been lost."""
+        for sub in self.subscribers:
+            sub.offer(RESYNC)
+
+    def reserve(self, order_id: int | None = None) -> Subscriber:
+        """Register a subscriber or raise FeedFull.
+
+        The check and the registration happen with no await in between, so
+        concurrent requests can't all pass the check before any is counted.
+        Events published from here on are queued for it.
+        """
+        if len(self.subscribers) >= self.max_clients:
+            raise FeedFull()
+        sub = Subscriber(order_id)
+        self.subscribers.add(sub)
+        return sub
+
+    def release(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+
+    async def stream(
+        self,
+        sub: Subscriber,
+        last_event_id: int | None,
+        replay: Callable[[int], Awaitable[list[dict] | None]],
+    ) -> AsyncIterator[str]:
+        """SSE body: replay anything after last_event_id, then live events and heartbeats.
+
+        `sub` was reserved before the replay query, so nothing committed in
+        between is missed. Event ids are not in commit order, so a live event
+        is skipped only if the replay actually sent that id. `replay` returns
+        None when it can't tell what the client missed. Releases `sub`.
+        """
+        try:
+            yield "retry: 3000\n\n"
+            replayed: set[int] = set()
+            if last_event_id is not None:
+                events = await replay(last_event_id)
+                if events is None or len(events) >= SSE_REPLAY_MAX:
+                    yield RESYNC[2]  # missed too much; refetch instead
+                else:
+                    for event in events:
+                        replayed.add(event["event_id"])
+                        yield format_event(event)
+            while True:
+                try:
+                    event_id, _, text = await asyncio.wait_for(sub.queue.get(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if event_id in replayed:
+                    replayed.discard(event_id)  # already sent by the replay
+                    continue
+                yield text
+        finally:
+            self.release(sub)
+
+
+class FeedResponse(StreamingResponse):
+    """StreamingResponse that releases its subscriber however the response ends.
+
+    The body generator releases it too, but a generator that never started
+    (the client left before the headers went out) never runs its `finally`.
+    """
+
+    def __init__(self, feed: OrderFeed, sub: Subscriber, content: AsyncIterator[str], **kwargs):
+        super().__init__(content, **kwargs)
+        self.feed = feed
+        self.sub = sub
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.feed.release(self.sub)
@@ -0,0 +1,175 @@
+"""Daily order aggregates behind GET /api/stats/daily.
+
+`daily_order_stats` holds one row per (day, status) with order count, items
+and revenue of the orders created that day. Statement-level triggers on
+`orders` append each write's aggregated change to `daily_order_stats_deltas`
+in the same transaction (migration 0010). Appending takes no lock another
+writer waits on, so neither concurrent orders nor a long bulk import queue
+behind one another on a (day, status) row. `compact`, run by every API worker
+every STATS_COMPACT_INTERVAL seconds, moves the committed deltas into
+`daily_order_stats`; its DELETE only sees committed rows, so a delta still
+in flight stays for the next round. Reads go through the
+`daily_order_stats_current` view (folded rows plus pending deltas) and sum
+a handful of rows per day, whatever the order volume.
+
+`rebuild` recomputes a range from `orders`, e.g. after changing
+`laundry.stats_timezone` or a TRUNCATE; `check` reports drift without
+writing anything.
+
+    python order_stats.py --check
+    python order_stats.py --rebuild [--from 2024-01-01] [--to 2024-12-31]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import date
+
+import psycopg
+from psycopg import AsyncConnection
+from psycopg_pool import AsyncConnectionPool
+
+import statements
+
+STATS_COMPACT_INTERVAL = float(os.getenv("STATS_COMPACT_INTERVAL", "10"))
+
+# Held by compaction and rebuild, so a rebuild never races a fold into the rows it replaces
+COMPACT_LOCK = 0x57A75
+
+logger = logging.getLogger(__name__)
+
+# Rebuild ranges are widened by a day on each side before the exact day filter,
+# so the created_at index narrows the scan whatever laundry.stats_timezone is.
+RANGE_FILTER = """
+    (%(day_from)s::date IS NULL OR created_at >= %(day_from)s::date - 1)
+    AND (%(day_to)s::date IS NULL OR created_at < %(day_to)s::date + 2)
+    AND (%(day_from)s::date IS NULL OR order_stats_day(created_at) >= %(day_from)s::date)
+    AND (%(day_to)s::date IS NULL OR order_stats_day(created_at) <= %(day_to)s::date)
+"""
+
+COMPACT_SQL = """
+SELECT pg_advisory_xact_lock(%(compact_lock)s);
+WITH moved AS (
+    DELETE FROM daily_order_stats_deltas RETURNING day, status, orders, items, revenue_cents
+)
+INSERT INTO daily_order_stats AS d (day, status, orders, items, revenue_cents)
+SELECT day, status, sum(orders), sum(items), sum(revenue_cents)
+FROM moved
+GROUP BY 1, 2
+ORDER BY 1, 2
+ON CONFLICT (day, status) DO UPDATE
+SET orders = d.orders + EXCLUDED.orders,
+    items = d.items + EXCLUDED.items,
+    revenue_cents = d.revenue_cents + EXCLUDED.revenue_cents;
+"""
+
+REBUILD_SQL = f"""
+LOCK TABLE orders IN SHARE MODE;
+SELECT pg_advisory_xact_lock(%(compact_lock)s);
+DELETE FROM daily_order_stats
+WHERE (%(day_from)s::date IS NULL OR day >= %(day_from)s::date)
+  AND (%(day_to)s::date IS NULL OR day <= %(day_to)s::date);
+DELETE FROM daily_order_stats_deltas
+WHERE (%(day_from)s::date IS NULL OR day >= %(day_from)s::date)
+  AND (%(day_to)s::date IS NULL OR day <= %(day_to)s::date);
+INSERT INTO daily_order_stats (day, status, orders, items, revenue_cents)
+SELECT order_stats_day(created_at), status, count(*), sum(total_items), sum(total_price_cents)
+FROM orders
+WHERE {RANGE_FILTER}
+GROUP BY 1, 2;
+"""
+
+CHECK_SQL = f"""
+WITH fresh AS (
+    SELECT order_stats_day(created_at) AS day, status,
+           count(*) AS orders, sum(total_items) AS items, sum(total_price_cents) AS revenue_cents
+    FROM orders
+    WHERE {RANGE_FILTER}
+    GROUP BY 1, 2
+), stored AS (
+    SELECT day, status, orders, items, revenue_cents
+    FROM daily_order_stats_current
+    WHERE (orders, items, revenue_cents) <> (0, 0, 0)
+      AND (%(day_from)s::date IS NULL OR day >= %(day_from)s::date)
+      AND (%(day_to)s::date IS NULL OR day <= %(day_to)s::date)
+)
+SELECT day, status,
+       s.orders AS stored_orders, f.orders AS actual_orders,
+       s.items AS stored_items, f.items AS actual_items,
+       s.revenue_cents AS stored_revenue_cents, f.revenue_cents AS actual_revenue_cents
+FROM fresh f
+FULL JOIN stored s USING (day, status)
+WHERE (f.orders, f.items, f.revenue_cents) IS DISTINCT FROM (s.orders, s.items, s.revenue_cents)
+ORDER BY day, status
+"""
+
+
+async def fetch_daily(conn: AsyncConnection, day_from: date | None, day_to: date | None, max_days: int) -> list[dict]:
+    return await statements.fetchall(
+        conn, "daily_order_stats", {"day_from": day_from, "day_to": day_to, "max_days": max_days}
+    )
+
+
+def rebuild(conn: psycopg.Connection, day_from: date | None = None, day_to: date | None = None) -> int:
+    """Recompute stats for the range (everything by default) in one transaction; returns rows written.
+
+    Order writers wait on the SHARE lock until this commits, so nothing is
+    double counted or missed.
+    """
+    with conn.transaction():
+        with psycopg.ClientCursor(conn) as cur:
+            cur.execute(REBUILD_SQL, {"day_from": day_from, "day_to": day_to, "compact_lock": COMPACT_LOCK})
+            while cur.nextset():
+                pass
+            return cur.rowcount
+
+
+async def compact(pool: AsyncConnectionPool) -> int:
+    """Fold committed deltas into daily_order_stats in one transaction; returns (day, status) rows touched."""
+    async with pool.connection() as conn:
+        async with psycopg.AsyncClientCursor(conn) as cur:
+            await cur.execute(COMPACT_SQL, {"compact_lock": COMPACT_LOCK})
+            cur.nextset()
+            return cur.rowcount
+
+
+async def run_compactor(pool: AsyncConnectionPool) -> None:
+    while True:
+        await asyncio.sleep(STATS_COMPACT_INTERVAL)
+        try:
+            await compact(pool)
+        except Exception:  # pragma: no cover
+            logger.exception("Daily stats compaction failed")
+
+
+def check(conn: psycopg.Connection, day_from: date | None = None, day_to: date | None = None) -> list[tuple]:
+    """Rows where the stored aggregates differ from a fresh count over `orders`."""
+    return conn.execute(CHECK_SQL, {"day_from": day_from, "day_to": day_to}).fetchall()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild or verify daily_order_stats")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--rebuild", action="store_true")
+    action.add_argument("--check", action="store_true", help="exit 1 if stored stats differ from orders")
+    parser.add_argument("--from", dest="day_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="day_to", type=date.fromisoformat)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    with psycopg.connect(args.database_url) as conn:
+        if args.rebuild:
+            print(f"rebuilt {rebuild(conn, args.day_from, args.day_to)} rows")
+            return
+        drift = check(conn, args.day_from, args.day_to)
+    for row in drift:
+        print(" ".join(str(v) for v in row))
+    print(f"{len(drift)} (day, status) rows differ")
+    sys.exit(1 if drift else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Order reads (detail lookup, keyset-paginated listing) and status transitions.
+
+Listings page on (created_at, id) rather than OFFSET, so every page is an
+index range scan no matter how deep the client has scrolled. The cursor is
+an opaque token carrying the last row's sort key.
+"""
+import base64
+from datetime import datetime
+
+from psycopg import AsyncConnection, sql
+from psycopg.rows import dict_row
+
+import statements
+
+ORDER_STATUSES = ("received", "in_process", "ready", "delivered", "canceled")
+# Forward through the workflow, or cancel anything not yet delivered
+ORDER_TRANSITIONS = {
+    "received": ("in_process", "canceled"),
+    "in_process": ("ready", "canceled"),
+    "ready": ("delivered", "canceled"),
+    "delivered": (),
+    "canceled": (),
+}
+ORDERS_CHANNEL = "laundry_orders"  # NOTIFY payload: {event_id, order_id, status, created_at}
+
+
+class OrderNotFound(Exception):
+    pass
+
+
+class InvalidTransition(Exception):
+    def __init__(self, current: str, target: str):
+        super().__init__(f"Cannot move an order from {current} to {target}")
+        self.current = current
+        self.target = target
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def build_list_query(
+    *,
+    limit: int,
+    status: str | None = None,
+    customer_id: int | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    after: tuple[datetime, int] | None = None,
+) -> tuple[sql.Composed, dict]:
+    """Compose the listing statement with only the predicates actually in use.
+
+    Absent filters are left out of the SQL entirely rather than written as
+    `%s IS NULL OR ...`, so the planner always sees a plain range on one of
+    the (…, created_at, id) indexes.
+    """
+    where = []
+    params: dict = {"limit": limit}
+    if status is not None:
+        where.append(sql.SQL("o.status = %(status)s"))
+        params["status"] = status
+    if customer_id is not None:
+        where.append(sql.SQL("o.customer_id = %(customer_id)s"))
+        params["customer_id"] = customer_id
+    if created_from is not None:
+        where.append(sql.SQL("o.created_at >= %(created_from)s"))
+        params["created_from"] = created_from
+    if created_to is not None:
+        where.append(sql.SQL("o.created_at < %(created_to)s"))
+        params["created_to"] = created_to
+    if after is not None:
+        where.append(sql.SQL("(o.created_at, o.id) < (%(after_created_at)s, %(after_id)s)"))
+        params["after_created_at"], params["after_id"] = after
+    query = sql.SQL(
+        """
+        SELECT
+            o.id,
+            o.status,
+            o.total_items,
+            o.total_price_cents,
+            o.created_at,
+            o.customer_id,
+            c.name AS customer_name
+        FROM orders o
+        JOIN customers c ON c.id = o.customer_id
+        {where}
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT %(limit)s
+        """
+    ).format(where=sql.SQL("WHERE ") + sql.SQL(" AND ").join(where) if where else sql.SQL(""))
+    return query, params
+
+
+async def fetch_order(conn: AsyncConnection, order_id: int) -> dict | None:
+    return await statements.fetchone(conn, "order_detail", {"order_id": order_id})
+
+
+async def fetch_orders(conn: AsyncConnection, *, limit: int, **filters) -> tuple[list[dict], str | None]:
+    """Return one page of orders, newest first, and the cursor for the next page (or None)."""
+    query, params = build_list_query(limit=limit + 1, **filters)
+    async with conn.cursor(row_factory=dict_row) as cur:
+        await cur.execute(query, params)
+        rows = await cur.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+
+async def transition(conn: AsyncConnection, order_id: int, status: str, note: str | None, created_by: str) -> dict:
+    """Apply one status change (autocommit: a single statement); returns the new event."""
+    from_statuses = [current for current, targets in ORDER_TRANSITIONS.items() if status in targets]
+    row = await statements.fetchone(
+        conn,
+        "transition_order_status",
+        {"order_id": order_id, "status": status, "from_statuses": from_statuses, "note": note, "created_by": created_by},
+    )
+    if row is None:
+        raise OrderNotFound()
+    if row["event_id"] is None:
+        raise InvalidTransition(row["previous_status"], status)
+    return row
@@ -0,0 +1,339 @@
+"""Monthly partitions of order_events and sessions: creation ahead of time, retention and archival.
+
+Migration 0008 partitions order_events by created_at and sessions by
+expires_at, one partition per UTC month named `<table>_pYYYY_MM`, plus a
+DEFAULT partition that catches rows for months that don't exist yet. All
+of the DDL runs from cron or the deploy, never from the API:
+
+    python partitions.py maintain   # partitions PARTITION_MONTHS_AHEAD ahead, drop expired session months
+    python partitions.py archive    # order_events months older than ORDER_EVENTS_KEEP_MONTHS -> ARCHIVE_DIR
+    python partitions.py restore archive/order_events_p2024_01.csv.gz
+    python partitions.py status     # exit 1 if this or next month has no partition
+
+Each API worker only reads the catalog (`run_coverage_check`, on startup and
+every PARTITION_CHECK_INTERVAL seconds) and logs a warning when this or next
+month has no partition, since that month's rows would pile up in DEFAULT.
+
+`archive` writes each month as `<partition>.csv.gz` (COPY CSV with a header)
+plus `<partition>.json` (row count, columns, sha256 of the file). It reads
+the file back and checks it before detaching and dropping the partition.
+`restore` loads the file into a standalone table and attaches it, so the
+month is queryable again.
+
+None of this DDL is lock-free. ATTACH takes a SHARE UPDATE EXCLUSIVE lock
+on the parent (which doesn't conflict with reads and writes but queues
+behind other DDL and VACUUM) and an ACCESS EXCLUSIVE lock on the attached
+table and on the DEFAULT partition, which it scans; queries that can't
+prune DEFAULT wait for that scan. DETACH and DROP take a brief ACCESS
+EXCLUSIVE lock on the parent. Every DDL statement here runs under
+PARTITION_LOCK_TIMEOUT, so it fails rather than queue behind a long
+transaction and block the API, and creating months ahead keeps DEFAULT
+empty so the scan is short.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import psycopg
+from psycopg import AsyncConnection, sql
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+ORDER_EVENTS_KEEP_MONTHS = int(os.getenv("ORDER_EVENTS_KEEP_MONTHS", "24"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+PARTITION_CHECK_INTERVAL = float(os.getenv("PARTITION_CHECK_INTERVAL", "3600"))
+
+PARENTS = {"order_events": "created_at", "sessions": "expires_at"}
+CHILDREN_SQL = """
+SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = ANY(%s::text[]::regclass[])
+"""
+COPY_CHUNK = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionError(Exception):
+    pass
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return datetime.now(timezone.utc).date().replace(day=1)
+
+
+def parse_month(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+
+
+def partition_name(parent: str, month: date) -> str:
+    return f"{parent}_p{month:%Y_%m}"
+
+
+def month_partitions(conn: psycopg.Connection, parent: str) -> dict[date, str]:
+    """The parent's monthly partitions by month, oldest first."""
+    name_re = re.compile(rf"^{parent}_p(\d{{4}})_(\d{{2}})$")
+    rows = conn.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        (parent,),
+    ).fetchall()
+    months = {}
+    for (name,) in rows:
+        match = name_re.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return dict(sorted(months.items()))
+
+
+def _lock_timeout(conn: psycopg.Connection) -> None:
+    conn.execute("SELECT set_config('lock_timeout', %s, true)", (PARTITION_LOCK_TIMEOUT,))
+
+
+def _ensure(conn: psycopg.Connection, parent: str, month: date) -> None:
+    with conn.transaction():
+        _lock_timeout(conn)
+        conn.execute("SELECT ensure_month_partition(%s::regclass, %s)", (parent, month))
+
+
+def maintain(conn: psycopg.Connection, months_ahead: int = PARTITION_MONTHS_AHEAD) -> dict:
+    """Create missing partitions through `months_ahead` and for any month that has rows in the
+    DEFAULT partition; drop session partitions whose sessions have all expired."""
+    this_month = current_month()
+    created, dropped = [], []
+    for parent, column in PARENTS.items():
+        existing = month_partitions(conn, parent)
+        wanted = {add_months(this_month, n) for n in range(months_ahead + 1)}
+        stray = conn.execute(
+            sql.SQL("SELECT DISTINCT date_trunc('month', {} AT TIME ZONE 'UTC')::date FROM {}").format(
+                sql.Identifier(column), sql.Identifier(f"{parent}_default")
+            )
+        ).fetchall()
+        wanted.update(month for (month,) in stray)
+        for month in sorted(wanted - existing.keys()):
+            _ensure(conn, parent, month)
+            created.append(partition_name(parent, month))
+
+    # A session partition's range ends at the start of the next month; once that's past, every
+    # session in it has expired. Dropping it replaces the sweeper's DELETEs for that month.
+    for month, name in month_partitions(conn, "sessions").items():
+        if month >= this_month:
+            continue
+        with conn.transaction():
+            _lock_timeout(conn)
+            conn.execute(sql.SQL("ALTER TABLE sessions DETACH PARTITION {}").format(sql.Identifier(name)))
+            conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+        dropped.append(name)
+    return {"created": created, "dropped": dropped}
+
+
+def _missing(existing: set[str]) -> list[str]:
+    """Partitions of this UTC month and the next that aren't in `existing`."""
+    this_month = current_month()
+    wanted = [partition_name(parent, add_months(this_month, n)) for parent in PARENTS for n in range(2)]
+    return [name for name in wanted if name not in existing]
+
+
+def uncovered(conn: psycopg.Connection) -> list[str]:
+    """Missing partitions for this or next UTC month; rows for those months go to DEFAULT."""
+    return _missing({name for (name,) in conn.execute(CHILDREN_SQL, (list(PARENTS),))})
+
+
+async def check_coverage(conn: AsyncConnection) -> list[str]:
+    """`uncovered` on the API's pool: a catalog read, no DDL."""
+    cur = await conn.execute(CHILDREN_SQL, (list(PARENTS),))
+    return _missing({name for (name,) in await cur.fetchall()})
+
+
+async def run_coverage_check(pool) -> None:
+    while True:
+        try:
+            async with pool.connection() as conn:
+                missing = await check_coverage(conn)
+            if missing:
+                logger.warning(
+                    "Missing partitions %s; their rows will go to DEFAULT. Run `python partitions.py maintain`",
+                    ", ".join(missing),
+                )
+        except Exception:  # pragma: no cover
+            logger.exception("Partition check failed")
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+
+
+def _columns(conn: psycopg.Connection, table: str) -> list[str]:
+    return [
+        name
+        for (name,) in conn.execute(
+            "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped ORDER BY attnum",
+            (table,),
+        )
+    ]
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(COPY_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def archive_partition(conn: psycopg.Connection, parent: str, month: date, name: str, directory: Path) -> dict:
+    """Dump one partition to `directory`, verify the file, then detach and drop the partition."""
+    columns = _columns(conn, parent)
+    data_path = directory / f"{name}.csv.gz"
+    partial = data_path.with_suffix(".gz.partial")
+    copy_sql = sql.SQL("COPY (SELECT {} FROM {} ORDER BY id) TO STDOUT (FORMAT csv, HEADER)").format(
+        sql.SQL(", ").join(map(sql.Identifier, columns)), sql.Identifier(name)
+    )
+    with partial.open("wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as out:
+        with conn.cursor() as cur:
+            with cur.copy(copy_sql) as copy:
+                for chunk in copy:
+                    out.write(chunk)
+            rows = cur.rowcount
+    with partial.open("rb") as f:
+        os.fsync(f.fileno())
+    partial.replace(data_path)
+
+    # Read it all back: a truncated or corrupt gzip fails here, before anything is dropped
+    with gzip.open(data_path, "rb") as f:
+        lines = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(COPY_CHUNK), b""))
+    if lines < rows + 1:
+        raise PartitionError(f"{data_path} has {lines} lines for {rows} rows")
+    manifest = {
+        "table": parent,
+        "partition": name,
+        "month": f"{month:%Y-%m}",
+        "rows": rows,
+        "columns": columns,
+        "file": data_path.name,
+        "sha256": _sha256(data_path),
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+    }
+    manifest_path = directory / f"{name}.json"
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n")
+
+    with conn.transaction():
+        _lock_timeout(conn)
+        conn.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(parent), sql.Identifier(name)))
+        count = conn.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(name))).fetchone()[0]
+        if count != rows:
+            raise PartitionError(f"{name} has {count} rows, archived {rows}; left in place")
+        conn.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+    return manifest
+
+
+def archive(conn: psycopg.Connection, before: date, directory: Path, parent: str = "order_events") -> list[dict]:
+    """Archive every monthly partition of `parent` for a month before `before`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    return [
+        archive_partition(conn, parent, month, name, directory)
+        for month, name in month_partitions(conn, parent).items()
+        if month < before
+    ]
+
+
+def restore(conn: psycopg.Connection, data_path: Path) -> dict:
+    """Load an archived month back into a table and attach it as that month's partition."""
+    manifest_path = data_path.parent / (data_path.name.removesuffix(".csv.gz") + ".json")
+    manifest = json.loads(manifest_path.read_text())
+    if _sha256(data_path) != manifest["sha256"]:
+        raise PartitionError(f"{data_path} does not match the checksum in {manifest_path.name}")
+    parent, name = manifest["table"], manifest["partition"]
+    month = parse_month(manifest["month"])
+    if conn.execute("SELECT to_regclass(%s)", (name,)).fetchone()[0] is not None:
+        raise PartitionError(f"{name} already exists")
+
+    # Load into a standalone table first: the COPY holds no lock the API needs
+    with conn.transaction():
+        conn.execute(
+            sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(
+                sql.Identifier(name), sql.Identifier(parent)
+            )
+        )
+        copy_sql = sql.SQL("COPY {} ({}) FROM STDIN (FORMAT csv, HEADER)").format(
+            sql.Identifier(name), sql.SQL(", ").join(map(sql.Identifier, manifest["columns"]))
+        )
+        with conn.cursor() as cur, gzip.open(data_path, "rb") as f:
+            with cur.copy(copy_sql) as copy:
+                while chunk := f.read(COPY_CHUNK):
+                    copy.write(chunk)
+            if cur.rowcount != manifest["rows"]:
+                raise PartitionError(f"loaded {cur.rowcount} rows from {data_path}, manifest says {manifest['rows']}")
+    try:
+        _ensure(conn, parent, month)  # attaches the table, checking every row is in range
+    except Exception:
+        conn.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(name)))
+        raise
+    conn.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(name)))
+    return manifest
+
+
+def status(conn: psycopg.Connection) -> list[str]:
+    """Print every partition with its estimated rows and size; returns `uncovered(conn)`."""
+    for parent in PARENTS:
+        for name in [*month_partitions(conn, parent).values(), f"{parent}_default"]:
+            rows, size = conn.execute(
+                "SELECT GREATEST(reltuples, 0)::bigint, pg_size_pretty(pg_total_relation_size(oid)) FROM pg_class WHERE oid = %s::regclass",
+                (name,),
+            ).fetchone()
+            print(f"{name}: ~{rows} rows, {size}")
+    return uncovered(conn)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain, archive and restore monthly partitions")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("maintain", help="create upcoming partitions, drop expired session months")
+    archive_cmd = commands.add_parser("archive", help="dump old order_events months to files and drop them")
+    archive_cmd.add_argument("--before", type=parse_month, help="archive months before YYYY-MM")
+    archive_cmd.add_argument("--dir", type=Path, default=Path(ARCHIVE_DIR))
+    restore_cmd = commands.add_parser("restore", help="re-attach an archived month")
+    restore_cmd.add_argument("file", type=Path, help="<partition>.csv.gz written by archive")
+    commands.add_parser("status", help="list partitions; exit 1 if this or next month has none")
+    args = parser.parse_args()
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set")
+
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        if args.command == "maintain":
+            done = maintain(conn)
+            for name in done["created"]:
+                print(f"created {name}")
+            for name in done["dropped"]:
+                print(f"dropped {name}")
+        elif args.command == "archive":
+            before = args.before or add_months(current_month(), -ORDER_EVENTS_KEEP_MONTHS)
+            for manifest in archive(conn, before, args.dir):
+                print(f"archived {manifest['partition']}: {manifest['rows']} rows -> {args.dir / manifest['file']}")
+        elif args.command == "restore":
+            manifest = restore(conn, args.file)
+            print(f"restored {manifest['partition']}: {manifest['rows']} rows")
+        else:
+            missing = status(conn)
+            if missing:
+                raise PartitionError(f"missing partitions: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except (PartitionError, psycopg.errors.LockNotAvailable) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        sys.exit(1)
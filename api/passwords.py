@@ -0,0 +1,117 @@
+"""Password hashing on a bounded process pool.
+
+bcrypt is deliberately slow CPU work. Running it inline in request threads
+lets a burst of logins at shift start starve unrelated endpoints, so hashes
+are computed in a small process pool behind a concurrency limit, with a
+bounded wait queue that fails fast once full.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+import profiling
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 0 workers hashes in the event loop's default thread pool instead of subprocesses
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 1)))
+BCRYPT_CONCURRENCY = int(os.getenv("BCRYPT_CONCURRENCY", str(max(BCRYPT_WORKERS, 1))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "64"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor: ProcessPoolExecutor | None = None
+_slots: asyncio.Semaphore | None = None
+_stats = {"in_flight": 0, "queued": 0, "max_queued": 0, "rejected": 0, "completed": 0, "seconds": 0.0}
+
+
+class HashQueueFull(Exception):
+    """Raised when too many hashing requests are already waiting."""
+
+
+def hash_password(pw: str) -> str:
+    trimmed = pw[:72]  # bcrypt limit
+    return pwd_context.hash(trimmed)
+
+
+def verify_password(pw: str, hashed: str) -> tuple[bool, str | None]:
+    """Verify and, when the stored hash uses outdated parameters, return a replacement."""
+    if not hashed:
+        return False, None
+    return pwd_context.verify_and_update(pw[:72], hashed)
+
+
+def _new_executor() -> ProcessPoolExecutor:
+    # spawn: workers only import this module, and never inherit the loop or DB sockets
+    executor = ProcessPoolExecutor(max_workers=BCRYPT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    for _ in range(BCRYPT_WORKERS):
+        executor.submit(pwd_context.identify, "")  # warm workers before the first login
+    return executor
+
+
+def start() -> None:
+    """Create the worker pool and semaphore; call from the app's startup hook."""
+    global _executor, _slots
+    _slots = asyncio.Semaphore(BCRYPT_CONCURRENCY)
+    if BCRYPT_WORKERS > 0:
+        _executor = _new_executor()
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "workers": BCRYPT_WORKERS,
+        "concurrency": BCRYPT_CONCURRENCY,
+        "max_queue": BCRYPT_MAX_QUEUE,
+    }
+
+
+async def _run(fn, *args):
+    global _executor
+    if _slots is None:
+        raise RuntimeError("password pool not started")
+    queued_at = time.perf_counter()
+    if _slots.locked() and _stats["queued"] >= BCRYPT_MAX_QUEUE:
+        _stats["rejected"] += 1
+        raise HashQueueFull()
+    _stats["queued"] += 1
+    _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+    try:
+        await _slots.acquire()
+    finally:
+        _stats["queued"] -= 1
+    _stats["in_flight"] += 1
+    start_time = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool and retry once
+            _executor = _new_executor()
+            return await loop.run_in_executor(_executor, fn, *args)
+    finally:
+        _slots.release()
+        _stats["in_flight"] -= 1
+        _stats["completed"] += 1
+        _stats["seconds"] += time.perf_counter() - start_time
+        profiling.record("bcrypt", fn.__name__, queued_at, queued_ms=round((start_time - queued_at) * 1000, 2))
+
+
+async def hash_password_async(pw: str) -> str:
+    return await _run(hash_password, pw)
+
+
+async def verify_password_async(pw: str, hashed: str) -> tuple[bool, str | None]:
+    return await _run(verify_password, pw, hashed)
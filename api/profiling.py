@@ -0,0 +1,175 @@
+"""Opt-in per-request timelines, a slow-request log, and on-demand sampling profiles.
+
+With PROFILE_ENABLED=true, `ProfilingMiddleware` gives each HTTP request a
+`Timeline`, and the code that spends time outside Python records into it:
+
+- every SQL statement, through `statements.TimedCursor` (the pools'
+  cursor_factory): the statement name from db/queries.sql or the start of
+  the SQL, with duration and row count;
+- waiting for a pooled connection (`admission.GatedPool`, the replica pool);
+- bcrypt hashing, including the wait for a worker (`passwords.py`);
+- outbound HTTP (Google certificate downloads).
+
+A request that takes longer than SLOW_REQUEST_MS is logged on the
+`laundry.slow` logger as one JSON object with totals per kind and the
+timeline. A request carrying `X-Profile: <PROFILE_TOKEN>` is also sampled:
+a thread snapshots the event loop thread's stack every
+PROFILE_SAMPLE_INTERVAL_MS, and the log entry gets the most common stacks
+in collapsed form (`outer;inner;leaf count`, flamegraph.pl input). The loop
+thread serves every request, so concurrent requests show up in the samples
+too; profile on a quiet instance. Such a request is logged whatever its
+duration.
+
+Disabled (the default), the middleware and cursor factory aren't
+installed, and `record` returns after a single ContextVar lookup.
+"""
+import collections
+import contextvars
+import json
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+
+PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() == "true"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))
+PROFILE_MAX_EVENTS = int(os.getenv("PROFILE_MAX_EVENTS", "200"))
+PROFILE_TOP_STACKS = 40
+PROFILE_HEADER = b"x-profile"
+
+slow_logger = logging.getLogger("laundry.slow")
+_timeline: contextvars.ContextVar["Timeline | None"] = contextvars.ContextVar("timeline", default=None)
+
+
+class Timeline:
+    """Events of one request, in milliseconds since it started."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.events: list[dict] = []
+        self.totals: dict[str, list[float]] = {}  # kind -> [count, ms]
+        self.dropped = 0
+
+    def add(self, kind: str, what: str, started: float, **fields) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        total = self.totals.setdefault(kind, [0, 0.0])
+        total[0] += 1
+        total[1] += ms
+        if len(self.events) >= PROFILE_MAX_EVENTS:
+            self.dropped += 1
+            return
+        at_ms = (started - self.start) * 1000
+        self.events.append({"at_ms": round(at_ms, 2), "ms": round(ms, 2), "kind": kind, "what": what, **fields})
+
+
+def record(kind: str, what: str, started: float, **fields) -> None:
+    """Add an event that began at `started` (a perf_counter value) and ends now, if profiling."""
+    timeline = _timeline.get()
+    if timeline is not None:
+        timeline.add(kind, what, started, **fields)
+
+
+def active() -> bool:
+    return _timeline.get() is not None
+
+
+class StackSampler:
+    """Counts the stacks a thread is in, sampled from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": [f"{stack} {count}" for stack, count in self.stacks.most_common(PROFILE_TOP_STACKS)],
+        }
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: per-request timeline, slow-request log, X-Profile sampling."""
+
+    def __init__(self, app, slow_ms: float = SLOW_REQUEST_MS, token: str = PROFILE_TOKEN):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.token = token.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timeline = Timeline()
+        token = _timeline.set(timeline)
+        sampler = self._sampler(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _timeline.reset(token)
+            profile = sampler.stop() if sampler is not None else None
+            total_ms = (time.perf_counter() - timeline.start) * 1000
+            if profile is not None or total_ms >= self.slow_ms:
+                self._log(scope, status, total_ms, timeline, profile)
+
+    def _sampler(self, scope) -> StackSampler | None:
+        if not self.token:
+            return None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER and secrets.compare_digest(value, self.token):
+                sampler = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+                sampler.start()
+                return sampler
+        return None
+
+    @staticmethod
+    def _log(scope, status: int, total_ms: float, timeline: Timeline, profile: dict | None) -> None:
+        route = scope.get("route")
+        entry = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status,
+            "ms": round(total_ms, 2),
+            "totals": {kind: {"count": count, "ms": round(ms, 2)} for kind, (count, ms) in timeline.totals.items()},
+            "events": timeline.events,
+        }
+        if timeline.dropped:
+            entry["events_dropped"] = timeline.dropped
+        if profile is not None:
+            entry["profile"] = profile
+        slow_logger.warning(json.dumps(entry, default=str))
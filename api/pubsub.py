@@ -0,0 +1,55 @@
+"""One shared LISTEN connection per worker, fanning notifications out to callbacks."""
+import asyncio
+import logging
+from typing import Callable
+
+import psycopg
+from psycopg import sql
+
+logger = logging.getLogger(__name__)
+
+
+class Listener:
+    """Keeps a dedicated autocommit connection LISTENing and dispatches NOTIFY payloads.
+
+    Callbacks run on the event loop and must not block. Notifications sent
+    while the connection is down are lost, so `on_reconnect` callbacks fire
+    after every (re)connect to let subscribers drop anything they may have
+    missed.
+    """
+
+    def __init__(self, conninfo: str, retry_seconds: float = 2.0):
+        self.conninfo = conninfo
+        self.retry_seconds = retry_seconds
+        self.connected = False
+        self._handlers: dict[str, list[Callable[[str], None]]] = {}
+        self._reconnect_handlers: list[Callable[[], None]] = []
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        self._handlers.setdefault(channel, []).append(callback)
+
+    def on_reconnect(self, callback: Callable[[], None]) -> None:
+        self._reconnect_handlers.append(callback)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self.conninfo, autocommit=True) as conn:
+                    for channel in self._handlers:
+                        await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                    self.connected = True
+                    for callback in self._reconnect_handlers:
+                        callback()
+                    async for notify in conn.notifies():
+                        for callback in self._handlers.get(notify.channel, ()):
+                            try:
+                                callback(notify.payload)
+                            except Exception:  # pragma: no cover
+                                logger.exception("Notification handler failed on %s", notify.channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("LISTEN connection lost: %s", exc)
+            finally:
+                self.connected = False
+            await asyncio.sleep(self.retry_seconds)
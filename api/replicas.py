@@ -0,0 +1,262 @@
+"""Optional read replica: a second pool for read-only handlers, with fallback to the primary.
+
+With DATABASE_READ_URL set, read-only handlers get their connection through
+`ReadRouter` instead of the primary pool. A monitor compares the replica's
+replay LSN with the primary's WAL position every REPLICA_CHECK_INTERVAL
+seconds. Reads go to the primary instead when:
+
+- the replica is more than REPLICA_MAX_LAG seconds behind, or its last
+  check failed;
+- the client's own last write hasn't been replayed there yet. Every
+  successful write request gets a `laundry_lsn` cookie holding the
+  primary's WAL position after it (`WriteLSNMiddleware`). A read carrying
+  it only goes to a replica that has replayed at least that far. The
+  position is read on the connection that did the write, right after its
+  commit (`record_write_lsn`), so it needs no second checkout from the
+  pool and can't be refused by the admission gate.
+
+A read that fails on the replica (connection lost, cancelled by a recovery
+conflict, no replica connection free within REPLICA_CHECK_INTERVAL) is
+retried once on the primary. Without
+DATABASE_READ_URL every read simply uses the primary pool.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+import psycopg
+from psycopg import AsyncConnection
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+import profiling
+import statements
+
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")
+READ_POOL_MIN = int(os.getenv("DB_READ_POOL_MIN", "1"))
+READ_POOL_MAX = int(os.getenv("DB_READ_POOL_MAX", "5"))
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "1"))
+LSN_COOKIE = "laundry_lsn"
+LSN_COOKIE_MAX_AGE = 300
+
+# Errors after which a read is retried on the primary
+REPLICA_ERRORS = (psycopg.OperationalError, psycopg.errors.SerializationFailure, PoolTimeout)
+
+logger = logging.getLogger(__name__)
+_min_lsn: contextvars.ContextVar[int] = contextvars.ContextVar("min_lsn", default=0)
+# Set by WriteLSNMiddleware for write requests: WAL positions seen after this request's commits
+_written_lsns: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("written_lsns", default=None)
+
+
+def parse_lsn(text: str) -> int:
+    """'16/B374D848' -> integer position; raises ValueError on anything else."""
+    high, low = text.split("/")
+    return (int(high, 16) << 32) | int(low, 16)
+
+
+def format_lsn(lsn: int) -> str:
+    return f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+async def record_write_lsn(conn: AsyncConnection) -> None:
+    """GatedPool `after_use` hook: in a write request, commit and note the WAL position after it.
+
+    Runs on the connection the handler wrote with, so the commit is already
+    in the position the cookie carries. Outside write requests (or without a
+    replica) it does nothing.
+    """
+    written = _written_lsns.get()
+    if written is None:
+        return
+    if conn.info.transaction_status == TransactionStatus.INTRANS:
+        await conn.commit()
+    autocommit = conn.autocommit
+    try:
+        # No BEGIN/COMMIT around a read-only function call
+        await conn.set_autocommit(True)
+        cur = await conn.execute("SELECT pg_current_wal_lsn()::text")
+        (lsn,) = await cur.fetchone()
+    except Exception:  # pragma: no cover
+        logger.exception("Failed to read the primary's WAL position")
+        return
+    finally:
+        await conn.set_autocommit(autocommit)
+    written.append(parse_lsn(lsn))
+
+
+class ReadRouter:
+    def __init__(self, get_primary: Callable[[], AsyncConnectionPool], read_url: str | None = DATABASE_READ_URL):
+        self.get_primary = get_primary
+        self.pool = (
+            AsyncConnectionPool(
+                conninfo=read_url,
+                min_size=READ_POOL_MIN,
+                max_size=READ_POOL_MAX,
+                kwargs={"autocommit": False, **statements.connection_kwargs()},
+                open=False,
+            )
+            if read_url
+            else None
+        )
+        self.healthy = False
+        self.replay_lsn = 0
+        self.lag_seconds: float | None = None
+        self.reads = {"replica": 0, "primary": 0}
+        self.fallbacks = 0
+        self._behind: deque[tuple[float, int]] = deque()  # (seen at, primary LSN) not yet replayed
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    async def open(self) -> None:
+        if self.pool is not None:
+            await self.pool.open()
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def primary_lsn(self) -> int:
+        async with self.get_primary().connection() as conn:
+            cur = await conn.execute("SELECT pg_current_wal_lsn()::text")
+            (lsn,) = await cur.fetchone()
+        return parse_lsn(lsn)
+
+    async def check(self) -> None:
+        """Refresh replay LSN and lag. Lag is how long the oldest primary position the
+        replica hasn't replayed has been waiting, so an idle primary doesn't read as lag."""
+        primary = await self.primary_lsn()
+        try:
+            async with self.pool.connection(timeout=REPLICA_CHECK_INTERVAL) as conn:
+                cur = await conn.execute("SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text")
+                in_recovery, replayed = await cur.fetchone()
+        except REPLICA_ERRORS as exc:
+            if self.healthy:
+                logger.warning("Read replica unavailable, reading from the primary: %s", exc)
+            self.healthy = False
+            self.lag_seconds = None
+            return
+        # A promoted (or misconfigured) replica reports no replay LSN; it's as current as it gets
+        self.replay_lsn = parse_lsn(replayed) if in_recovery and replayed else primary
+        now = time.monotonic()
+        if not self._behind or self._behind[-1][1] < primary:
+            self._behind.append((now, primary))
+        while self._behind and self._behind[0][1] <= self.replay_lsn:
+            self._behind.popleft()
+        self.lag_seconds = now - self._behind[0][0] if self._behind else 0.0
+        healthy = self.lag_seconds <= REPLICA_MAX_LAG
+        if healthy != self.healthy:
+            logger.warning("Read replica %s (lag %.1fs)", "in use" if healthy else "lagging, reading from the primary", self.lag_seconds)
+        self.healthy = healthy
+
+    async def run_monitor(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except Exception:  # pragma: no cover
+                logger.exception("Replica check failed")
+                self.healthy = False
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+    def _use_replica(self) -> bool:
+        return self.enabled and self.healthy and self.replay_lsn >= _min_lsn.get()
+
+    def pool_for_read(self) -> AsyncConnectionPool:
+        """The pool a read-only request should use right now (for code that takes a pool)."""
+        if self._use_replica():
+            self.reads["replica"] += 1
+            return self.pool
+        self.reads["primary"] += 1
+        return self.get_primary()
+
+    async def run(self, query: Callable[[AsyncConnection], Awaitable[Any]]) -> Any:
+        """Run a read-only `query(conn)` on the replica if it's fit to serve this client, else the primary."""
+        if self._use_replica():
+            try:
+                started = time.perf_counter()
+                # Waiting out the pool's 30 s default on a busy or hung replica would defeat the routing
+                async with self.pool.connection(timeout=REPLICA_CHECK_INTERVAL) as conn:
+                    profiling.record("pool_wait", "replica", started)
+                    result = await query(conn)
+                self.reads["replica"] += 1
+                return result
+            except REPLICA_ERRORS as exc:
+                logger.warning("Read failed on the replica, retrying on the primary: %s", exc)
+                self.healthy = False
+                self.fallbacks += 1
+        self.reads["primary"] += 1
+        async with self.get_primary().connection() as conn:
+            return await query(conn)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "reads": dict(self.reads),
+            "fallbacks": self.fallbacks,
+        }
+
+
+class WriteLSNMiddleware:
+    """Pure ASGI middleware for read-your-writes across the replica.
+
+    Reads the `laundry_lsn` cookie into the request context, and after a
+    successful write request (any method but GET/HEAD/OPTIONS, status < 400)
+    sets it to the newest WAL position `record_write_lsn` saw during it,
+    with the same flags as the session cookie. Does nothing without a
+    replica.
+    """
+
+    def __init__(self, app, router: ReadRouter, secure: bool = False):
+        self.app = app
+        self.router = router
+        self.cookie_flags = "; Path=/; Max-Age=%d; HttpOnly; SameSite=Lax%s" % (
+            LSN_COOKIE_MAX_AGE,
+            "; Secure" if secure else "",
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.router.enabled:
+            await self.app(scope, receive, send)
+            return
+        token = _min_lsn.set(self._cookie_lsn(scope))
+        try:
+            if scope["method"] in ("GET", "HEAD", "OPTIONS"):
+                await self.app(scope, receive, send)
+                return
+
+            written: list[int] = []
+            written_token = _written_lsns.set(written)
+
+            async def send_with_lsn(message):
+                if message["type"] == "http.response.start" and message["status"] < 400 and written:
+                    cookie = f"{LSN_COOKIE}={format_lsn(max(written))}{self.cookie_flags}"
+                    message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_lsn)
+            finally:
+                _written_lsns.reset(written_token)
+        finally:
+            _min_lsn.reset(token)
+
+    @staticmethod
+    def _cookie_lsn(scope) -> int:
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                for part in value.decode("latin-1").split(";"):
+                    key, _, lsn = part.strip().partition("=")
+                    if key == LSN_COOKIE:
+                        try:
+                            return parse_lsn(lsn)
+                        except ValueError:
+                            return 0
+        return 0
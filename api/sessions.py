@@ -0,0 +1,123 @@
+"""Session lookup with an in-process cache, and the expired-session sweeper.
+
+Revoking a session (logout, user deactivation) issues a NOTIFY on
+SESSIONS_CHANNEL in the statement that deletes it. Every worker LISTENs
+through the shared pubsub.Listener and drops the entry from its cache. While
+that connection is down, notifications can be lost, so callers skip the
+cache (`use_cache=False`) and it is cleared on every reconnect.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+
+from psycopg_pool import AsyncConnectionPool
+
+import statements
+from cache import TTLCache
+
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "30"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+SESSION_SWEEP_BATCH = int(os.getenv("SESSION_SWEEP_BATCH", "1000"))
+
+# NOTIFY payload: "session:<cache_key(token)>" or "user:<user_id>"
+SESSIONS_CHANNEL = "laundry_sessions"
+
+logger = logging.getLogger(__name__)
+# Keyed by cache_key(token), so notifications never carry a usable token
+session_cache = TTLCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+# Bumped on every revocation; a lookup that raced one doesn't cache its result
+_generation = 0
+
+
+def cache_key(token: str) -> str:
+    """sha256 of the token, hex; delete_session notifies the same digest."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def lookup(pool: AsyncConnectionPool, token: str, use_cache: bool = True) -> dict | None:
+    """Resolve a session token to its active user, or None if invalid or expired."""
+    key = cache_key(token)
+    if use_cache:
+        cached = session_cache.get(key)
+        if cached is not None:
+            return cached
+    generation = _generation
+    async with pool.connection() as conn:
+        row = await statements.fetchone(conn, "session_lookup", {"token": token})
+    if row is None:
+        return None
+    if use_cache and generation == _generation:
+        # Never serve a cached session past its own expiry
+        remaining = (row["expires_at"] - datetime.now(timezone.utc)).total_seconds()
+        session_cache.set(key, row, ttl=remaining)
+    return row
+
+
+def forget(token: str) -> None:
+    _forget_key(cache_key(token))
+
+
+def _forget_key(key: str) -> None:
+    global _generation
+    _generation += 1
+    session_cache.pop(key)
+
+
+def forget_user(user_id: int) -> int:
+    global _generation
+    _generation += 1
+    return session_cache.discard_where(lambda row: row["user_id"] == user_id)
+
+
+def reset(*_) -> None:
+    """Drop every cached session (after a LISTEN reconnect, notifications may have been missed)."""
+    global _generation
+    _generation += 1
+    session_cache.clear()
+
+
+def on_notify(payload: str) -> None:
+    kind, _, value = payload.partition(":")
+    if kind == "session":
+        _forget_key(value)
+    elif kind == "user" and value.isdigit():
+        forget_user(int(value))
+    else:
+        reset()
+
+
+async def sweep_expired(pool: AsyncConnectionPool) -> int:
+    """Delete expired sessions in bounded batches so no single statement holds locks for long."""
+    deleted = 0
+    while True:
+        async with pool.connection() as conn:
+            cur = await conn.execute(
+                """
+                DELETE FROM sessions
+                WHERE session_token IN (
+                    SELECT session_token FROM sessions
+                    WHERE expires_at < NOW()
+                    ORDER BY expires_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                """,
+                (SESSION_SWEEP_BATCH,),
+            )
+            deleted += cur.rowcount
+        if cur.rowcount < SESSION_SWEEP_BATCH:
+            return deleted
+
+
+async def run_sweeper(pool: AsyncConnectionPool) -> None:
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        try:
+            deleted = await sweep_expired(pool)
+            if deleted:
+                logger.info("Swept %d expired sessions", deleted)
+        except Exception:  # pragma: no cover
+            logger.exception("Session sweep failed")
@@ -0,0 +1,179 @@
+"""Registry of the named SQL statements in db/queries.sql.
+
+Statements are parsed once at import and always executed with
+`prepare=True`, so each pooled connection plans a statement on first use
+and reuses the plan afterwards. Per-statement call counts and timings are
+kept in-process (see `stats`).
+
+SQL composed at runtime (order listing filters, the stock ledger's
+multi-statement scripts, COPY) stays with its module.
+
+    python statements.py --check   # prepare every statement against DATABASE_URL
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import psycopg
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg.rows import dict_row
+
+import profiling
+
+QUERIES_PATH = Path(__file__).resolve().parent / "db" / "queries.sql"
+
+NAME_RE = re.compile(r"^--\s*name:\s*(\w+)\s*$")
+PARAM_RE = re.compile(r"%\((\w+)\)s")
+
+
+@dataclass(frozen=True)
+class Statement:
+    name: str
+    sql: str
+    doc: str
+
+
+def load(path: Path = QUERIES_PATH) -> dict[str, Statement]:
+    """Parse `-- name:` blocks; leading comment lines of a block become its doc."""
+    blocks: dict[str, list[str]] = {}
+    current = None
+    for line in path.read_text().splitlines():
+        match = NAME_RE.match(line.strip())
+        if match:
+            current = match.group(1)
+            if current in blocks:
+                raise ValueError(f"Duplicate statement name in {path.name}: {current}")
+            blocks[current] = []
+        elif current is not None:
+            blocks[current].append(line)
+
+    statements = {}
+    for name, lines in blocks.items():
+        doc = []
+        while lines and lines[0].startswith("--"):
+            doc.append(lines.pop(0).lstrip("- "))
+        sql = "\n".join(lines).strip()
+        if not sql:
+            raise ValueError(f"Statement {name} in {path.name} is empty")
+        statements[name] = Statement(name=name, sql=sql, doc=" ".join(doc))
+    return statements
+
+
+STATEMENTS = load()
+_stats: dict[str, list[float]] = {}  # name -> [calls, total seconds, max seconds]
+
+
+def _record(name: str, seconds: float) -> None:
+    entry = _stats.setdefault(name, [0, 0.0, 0.0])
+    entry[0] += 1
+    entry[1] += seconds
+    entry[2] = max(entry[2], seconds)
+
+
+async def execute(conn: AsyncConnection, name: str, params: dict | None = None, row_factory=dict_row) -> AsyncCursor:
+    """Execute a named statement as a prepared statement and return the cursor."""
+    statement = STATEMENTS[name]
+    cur = conn.cursor(row_factory=row_factory)
+    start = time.perf_counter()
+    try:
+        await cur.execute(statement.sql, params, prepare=True)
+    finally:
+        _record(name, time.perf_counter() - start)
+    return cur
+
+
+async def fetchone(conn: AsyncConnection, name: str, params: dict | None = None, row_factory=dict_row):
+    cur = await execute(conn, name, params, row_factory)
+    async with cur:
+        return await cur.fetchone()
+
+
+async def fetchall(conn: AsyncConnection, name: str, params: dict | None = None, row_factory=dict_row) -> list:
+    cur = await execute(conn, name, params, row_factory)
+    async with cur:
+        return await cur.fetchall()
+
+
+class TimedCursor(AsyncCursor):
+    """Records each statement into the current request's profile (profiling.py)."""
+
+    async def execute(self, query, params=None, **kwargs):
+        if not profiling.active():
+            return await super().execute(query, params, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            profiling.record("db", self._describe(query), started, rows=self.rowcount)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        if not profiling.active():
+            return await super().executemany(query, params_seq, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            profiling.record("db", self._describe(query), started, rows=self.rowcount, many=True)
+
+    def _describe(self, query) -> str:
+        if isinstance(query, str) and query in _NAMES:
+            return _NAMES[query]
+        text = query.decode() if isinstance(query, bytes) else query if isinstance(query, str) else query.as_string(self)
+        return " ".join(text.split())[:120]
+
+
+_NAMES = {statement.sql: name for name, statement in STATEMENTS.items()}
+
+
+def connection_kwargs() -> dict:
+    """Extra pool `kwargs`: time every statement when PROFILE_ENABLED, nothing otherwise."""
+    return {"cursor_factory": TimedCursor} if profiling.PROFILE_ENABLED else {}
+
+
+def stats() -> dict[str, dict]:
+    return {
+        name: {
+            "calls": calls,
+            "total_ms": round(total * 1000, 3),
+            "mean_ms": round(total * 1000 / calls, 3),
+            "max_ms": round(peak * 1000, 3),
+        }
+        for name, (calls, total, peak) in sorted(_stats.items())
+    }
+
+
+def check(conn: psycopg.Connection, statements: dict[str, Statement] | None = None) -> dict[str, str]:
+    """PREPARE every statement (nothing is executed); returns {name: error} for failures."""
+    statements = STATEMENTS if statements is None else statements
+    errors = {}
+    for statement in statements.values():
+        numbers: dict[str, int] = {}
+        sql = PARAM_RE.sub(lambda m: f"${numbers.setdefault(m.group(1), len(numbers) + 1)}", statement.sql)
+        try:
+            with conn.transaction():
+                conn.execute(f"PREPARE _check AS {sql.rstrip(';')}")
+                conn.execute("DEALLOCATE _check")
+        except psycopg.Error as exc:
+            errors[statement.name] = str(exc).strip()
+    return errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate db/queries.sql against a database")
+    parser.add_argument("--check", action="store_true", required=True)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+    with psycopg.connect(args.database_url, autocommit=True) as conn:
+        errors = check(conn)
+    for name, error in errors.items():
+        print(f"{name}: {error}", file=sys.stderr)
+    print(f"{len(STATEMENTS) - len(errors)}/{len(STATEMENTS)} statements OK")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
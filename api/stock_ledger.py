@@ -0,0 +1,284 @@
+"""Append-only stock ledger.
+
+Every adjustment is a row in `stock_movements`; nothing updates a shared
+`stock` row on the request path, so concurrent writers to one product do not
+queue on its row lock. The `stock_levels` view serves the current quantity as
+the compacted snapshot in `stock` plus the movements after its
+`compacted_through` watermark, and a background task periodically folds
+those movements into the snapshot.
+
+Two transaction-scoped advisory locks per product keep this correct:
+
+- COMPACT_LOCK: every writer holds it shared while inserting a movement, the
+  compactor takes it exclusively. Once the compactor has it, every movement
+  whose id was already allocated has committed, so advancing the watermark
+  to the highest visible id can never skip a late commit.
+- SUBTRACT_LOCK: subtractions take it exclusively, so the non-negative check
+  and the insert are atomic with respect to each other. Additions never take
+  it; they can only make the check more permissive.
+
+Each lock is its own statement ahead of the write, sent together with it as
+one multi-statement query (one round-trip, one implicit transaction). Under
+READ COMMITTED the write then gets a snapshot taken after the lock was
+granted.
+"""
+import asyncio
+import logging
+import os
+
+from psycopg import AsyncClientCursor, AsyncConnection, errors
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+STOCK_COMPACT_INTERVAL = float(os.getenv("STOCK_COMPACT_INTERVAL", "10"))
+
+COMPACT_LOCK = 0x5710C
+SUBTRACT_LOCK = 0x5710D
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, available: int):
+        super().__init__(f"Only {available} available")
+        self.available = available
+
+
+class UnknownReference(Exception):
+    """The movement references an order that does not exist."""
+
+
+ADD_SQL = """
+SELECT pg_advisory_xact_lock_shared(%(compact_lock)s, %(product_type_id)s);
+WITH product AS (
+    SELECT product_type_id FROM product_types WHERE product_type_id = %(product_type_id)s AND active = TRUE
+), stock_row AS (
+    INSERT INTO stock (product_type_id, available_quantity, updated_at)
+    SELECT product_type_id, 0, NOW() FROM product
+    WHERE NOT EXISTS (SELECT 1 FROM stock WHERE product_type_id = %(product_type_id)s)
+    ON CONFLICT (product_type_id) DO NOTHING
+), movement AS (
+    INSERT INTO stock_movements (product_type_id, delta, reason, order_id)
+    SELECT product_type_id, %(quantity)s, %(reason)s, %(order_id)s FROM product
+    RETURNING product_type_id, created_at
+), notified AS (
+    SELECT pg_notify('laundry_cache', 'stock') FROM movement
+)
+SELECT
+    l.stock_id AS id,
+    m.product_type_id,
+    COALESCE(l.available_quantity, 0) + %(quantity)s AS available_quantity,
+    m.created_at::timestamp AS updated_at
+FROM movement m
+LEFT JOIN stock_levels l ON l.product_type_id = m.product_type_id
+LEFT JOIN notified ON TRUE;
+"""
+
+SUBTRACT_SQL = """
+SELECT pg_advisory_xact_lock_shared(%(compact_lock)s, %(product_type_id)s),
+       pg_advisory_xact_lock(%(subtract_lock)s, %(product_type_id)s);
+WITH level AS (
+    SELECT stock_id, product_type_id, available_quantity, updated_at
+    FROM stock_levels WHERE product_type_id = %(product_type_id)s
+), movement AS (
+    INSERT INTO stock_movements (product_type_id, delta, reason, order_id)
+    SELECT product_type_id, -%(quantity)s, %(reason)s, %(order_id)s
+    FROM level WHERE available_quantity >= %(quantity)s
+    RETURNING created_at
+), notified AS (
+    SELECT pg_notify('laundry_cache', 'stock') FROM movement
+)
+SELECT
+    l.stock_id AS id,
+    l.product_type_id,
+    l.available_quantity,
+    m.created_at IS NOT NULL AS applied,
+    COALESCE(m.created_at::timestamp, l.updated_at) AS updated_at
+FROM level l
+LEFT JOIN movement m ON TRUE
+LEFT JOIN notified ON TRUE;
+"""
+
+COMPACT_SQL = """
+SELECT pg_advisory_xact_lock(%(compact_lock)s, %(product_type_id)s);
+UPDATE stock s
+SET available_quantity = s.available_quantity + d.delta,
+    compacted_through = d.last_id,
+    updated_at = d.last_at
+FROM (
+    SELECT sum(m.delta)::int AS delta, max(m.id) AS last_id, max(m.created_at)::timestamp AS last_at
+    FROM stock s2
+    JOIN stock_movements m ON m.product_type_id = s2.product_type_id AND m.id > s2.compacted_through
+    WHERE s2.product_type_id = %(product_type_id)s
+) d
+WHERE s.product_type_id = %(product_type_id)s AND d.last_id IS NOT NULL;
+"""
+
+
+BATCH_SQL = """
+SELECT pg_advisory_xact_lock_shared(%(compact_lock)s, id) FROM unnest(%(locked_ids)s::int[]) AS id;
+SELECT pg_advisory_xact_lock(%(subtract_lock)s, id) FROM unnest(%(subtract_ids)s::int[]) AS id;
+WITH request AS (
+    SELECT * FROM unnest(%(product_type_ids)s::int[], %(deltas)s::int[]) WITH ORDINALITY AS r(product_type_id, delta, n)
+), totals AS (
+    SELECT product_type_id, sum(delta)::int AS delta FROM request GROUP BY product_type_id
+), checked AS (
+    SELECT
+        t.product_type_id,
+        t.delta,
+        pt.product_type_id IS NOT NULL AS known,
+        l.stock_id,
+        COALESCE(l.available_quantity, 0) AS available_quantity
+    FROM totals t
+    LEFT JOIN product_types pt ON pt.product_type_id = t.product_type_id AND pt.active = TRUE
+    LEFT JOIN stock_levels l ON l.product_type_id = t.product_type_id
+), verdict AS (
+    SELECT bool_and(known AND available_quantity + delta >= 0) AS ok FROM checked
+), stock_rows AS (
+    INSERT INTO stock (product_type_id, available_quantity, updated_at)
+    SELECT c.product_type_id, 0, NOW() FROM checked c, verdict v WHERE v.ok AND c.stock_id IS NULL
+    ON CONFLICT (product_type_id) DO NOTHING
+), movements AS (
+    INSERT INTO stock_movements (product_type_id, delta, reason)
+    SELECT r.product_type_id, r.delta, %(reason)s FROM request r, verdict v WHERE v.ok ORDER BY r.n
+    RETURNING created_at
+), notified AS (
+    SELECT pg_notify('laundry_cache', 'stock') WHERE EXISTS (SELECT 1 FROM movements)
+)
+SELECT
+    c.stock_id AS id,
+    c.product_type_id,
+    c.delta,
+    c.known,
+    c.available_quantity,
+    v.ok
+FROM checked c
+CROSS JOIN verdict v
+LEFT JOIN notified ON TRUE;
+"""
+
+
+async def _run(conn: AsyncConnection, query: str, params: dict) -> dict | None:
+    """Run a lock-then-write script in one implicit transaction and return the write's row."""
+    async with AsyncClientCursor(conn, row_factory=dict_row) as cur:
+        await cur.execute(query, params)
+        while cur.nextset():
+            pass
+        return await cur.fetchone() if cur.description else None
+
+
+def _params(product_type_id: int, quantity: int, reason: str, order_id: int | None) -> dict:
+    return {
+        "compact_lock": COMPACT_LOCK,
+        "subtract_lock": SUBTRACT_LOCK,
+        "product_type_id": product_type_id,
+        "quantity": quantity,
+        "reason": reason,
+        "order_id": order_id,
+    }
+
+
+async def add(conn: AsyncConnection, product_type_id: int, quantity: int, reason: str, order_id: int | None = None) -> dict | None:
+    """Record an intake; returns the new level, or None if the product type is unknown or disabled.
+
+    `conn` must be in autocommit mode so the script runs as its own transaction.
+    """
+    try:
+        return await _run(conn, ADD_SQL, _params(product_type_id, quantity, reason, order_id))
+    except errors.ForeignKeyViolation as exc:
+        raise UnknownReference() from exc
+
+
+async def subtract(conn: AsyncConnection, product_type_id: int, quantity: int, reason: str, order_id: int | None = None) -> dict | None:
+    """Record a withdrawal if enough stock remains; returns the new level, or None without a stock row.
+
+    Raises InsufficientStock, leaving the ledger untouched, when it would go negative.
+    """
+    try:
+        row = await _run(conn, SUBTRACT_SQL, _params(product_type_id, quantity, reason, order_id))
+    except errors.ForeignKeyViolation as exc:
+        raise UnknownReference() from exc
+    if row is None:
+        return None
+    if not row.pop("applied"):
+        raise InsufficientStock(row["available_quantity"])
+    row["available_quantity"] -= quantity
+    return row
+
+
+async def apply_batch(conn: AsyncConnection, entries: list[tuple[int, int]], reason: str) -> tuple[list[dict], list[dict]]:
+    """Apply (product_type_id, delta) entries all-or-nothing in one round-trip.
+
+    Returns (levels, errors). On success `levels` holds the new quantity of
+    every product touched and `errors` is empty; otherwise nothing was
+    written and `errors` lists each offending entry by its index.
+    Products whose net delta is negative get the subtract lock, in id order
+    so two batches can never deadlock each other.
+    """
+    net: dict[int, int] = {}
+    for product_type_id, delta in entries:
+        net[product_type_id] = net.get(product_type_id, 0) + delta
+    async with AsyncClientCursor(conn, row_factory=dict_row) as cur:
+        await cur.execute(
+            BATCH_SQL,
+            {
+                "compact_lock": COMPACT_LOCK,
+                "subtract_lock": SUBTRACT_LOCK,
+                "locked_ids": sorted(net),
+                "subtract_ids": sorted(pid for pid, delta in net.items() if delta < 0),
+                "product_type_ids": [pid for pid, _ in entries],
+                "deltas": [delta for _, delta in entries],
+                "reason": reason,
+            },
+        )
+        while cur.nextset():
+            pass
+        rows = {row["product_type_id"]: row for row in await cur.fetchall()}
+
+    errors = []
+    for index, (product_type_id, _) in enumerate(entries):
+        row = rows[product_type_id]
+        if not row["known"]:
+            errors.append({"index": index, "product_type_id": product_type_id, "error": "Product type not found"})
+        elif row["available_quantity"] + row["delta"] < 0:
+            errors.append({
+                "index": index,
+                "product_type_id": product_type_id,
+                "error": f"Insufficient stock: {row['available_quantity']} available, net change {row['delta']}",
+            })
+    if errors:
+        return [], errors
+    levels = [
+        {"id": rows[pid]["id"], "product_type_id": pid, "available_quantity": rows[pid]["available_quantity"] + delta}
+        for pid, delta in net.items()
+    ]
+    return levels, []
+
+
+async def compact(pool: AsyncConnectionPool) -> int:
+    """Fold pending movements into the `stock` snapshot, one product per transaction."""
+    async with pool.connection() as conn:
+        await conn.set_autocommit(True)
+        try:
+            cur = await conn.execute(
+                """
+                SELECT DISTINCT s.product_type_id
+                FROM stock s
+                JOIN stock_movements m ON m.product_type_id = s.product_type_id AND m.id > s.compacted_through
+                """
+            )
+            product_ids = [row[0] for row in await cur.fetchall()]
+            for product_type_id in product_ids:
+                await _run(conn, COMPACT_SQL, {"compact_lock": COMPACT_LOCK, "product_type_id": product_type_id})
+        finally:
+            await conn.set_autocommit(False)
+    return len(product_ids)
+
+
+async def run_compactor(pool: AsyncConnectionPool) -> None:
+    while True:
+        await asyncio.sleep(STOCK_COMPACT_INTERVAL)
+        try:
+            await compact(pool)
+        except Exception:  # pragma: no cover
+            logger.exception("Stock compaction failed")
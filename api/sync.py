@@ -0,0 +1,91 @@
+"""Delta sync for store tablets (GET /api/sync).
+
+A client without a watermark gets a full sync: every active product type,
+every stock level and the newest open orders. Each response carries a
+`watermark`; sent back as `since`, it gets only what changed after it:
+
+- `product_types` and `stock` rows that were edited or had a stock
+  movement;
+- `deleted_product_types`, the ids of product types disabled since, whose
+  product and stock rows the client should drop;
+- `orders` created or updated since, including ones that became delivered
+  or canceled.
+
+Rows carry the id of the transaction that last wrote them (`changed_xid`,
+migration 0012), which can commit well after it started. The watermark is
+the oldest transaction id still running (`sync_watermark`): every lower one
+has finished, so a later commit is never skipped, and reading it needs no
+privileges. Rows from transactions at or above it can come back in the next
+sync; clients upsert by id. A watermark is only meaningful on the server
+that issued it, so syncs never go to the read replica.
+
+More than SYNC_ORDERS_MAX changed orders (a tablet that was offline for a
+while) turns the answer into a full sync.
+"""
+import base64
+import os
+from datetime import datetime
+
+from psycopg import AsyncConnection
+
+import statements
+
+SYNC_ORDERS_MAX = int(os.getenv("SYNC_ORDERS_MAX", "500"))
+
+
+def encode_watermark(xid: int) -> str:
+    return base64.urlsafe_b64encode(str(xid).encode()).decode().rstrip("=")
+
+
+def decode_watermark(token: str) -> int | None:
+    """Inverse of encode_watermark; raises ValueError on anything malformed.
+
+    Watermarks issued before migration 0012 held a timestamp; those return
+    None, so the client gets a full sync and a new watermark.
+    """
+    try:
+        text = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid watermark") from exc
+    if text.isdigit():
+        return int(text)
+    try:
+        if datetime.fromisoformat(text).tzinfo is not None:
+            return None
+    except ValueError:
+        pass
+    raise ValueError("Invalid watermark")
+
+
+async def fetch_changes(conn: AsyncConnection, since: int | None) -> dict:
+    """Everything written by transaction `since` or later (or a full sync when None) and the next watermark."""
+    row = await statements.fetchone(conn, "sync_watermark")
+    watermark = encode_watermark(int(row["watermark"]))
+
+    if since is not None:
+        params = {"since_xid": since}
+        orders = await statements.fetchall(conn, "sync_orders", {**params, "limit": SYNC_ORDERS_MAX + 1})
+        if len(orders) <= SYNC_ORDERS_MAX:
+            active, deleted = [], []
+            for product in await statements.fetchall(conn, "sync_product_types", params):
+                if product.pop("active"):
+                    active.append(product)
+                else:
+                    deleted.append(product["id"])
+            return {
+                "full": False,
+                "watermark": watermark,
+                "product_types": active,
+                "deleted_product_types": deleted,
+                "stock": await statements.fetchall(conn, "sync_stock", params),
+                "orders": orders,
+            }
+
+    return {
+        "full": True,
+        "watermark": watermark,
+        "product_types": await statements.fetchall(conn, "list_product_types"),
+        "deleted_product_types": [],
+        "stock": await statements.fetchall(conn, "list_stock"),
+        "orders": await statements.fetchall(conn, "sync_open_orders", {"limit": SYNC_ORDERS_MAX}),
+    }
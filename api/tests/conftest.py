@@ -0,0 +1,50 @@
+"""Shared fixtures.
+
+Tests that need Postgres take the `database_url` fixture (directly or via
+`conn`). With DATABASE_URL pointing at any database on a server the role can
+CREATE DATABASE on, the session creates a scratch database, applies every
+migration to it and drops it at the end; without DATABASE_URL those tests
+are skipped. Async tests use anyio's pytest plugin (`@pytest.mark.anyio`).
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import psycopg
+import pytest
+from psycopg import conninfo, sql
+
+API_DIR = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(API_DIR), str(API_DIR / "bench")]
+
+import migrate  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    base = os.getenv("DATABASE_URL")
+    if not base:
+        pytest.skip("DATABASE_URL is not set")
+    name = f"laundry_test_{uuid.uuid4().hex[:8]}"
+    with psycopg.connect(base, autocommit=True) as admin:
+        admin.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+    url = conninfo.make_conninfo(base, dbname=name)
+    try:
+        with psycopg.connect(url, autocommit=True) as conn:
+            migrate.migrate(conn)
+        yield url
+    finally:
+        with psycopg.connect(base, autocommit=True) as admin:
+            admin.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)").format(sql.Identifier(name)))
+
+
+@pytest.fixture
+def conn(database_url):
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        yield conn
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+import admission
+from admission import CRITICAL, LOW, NORMAL
+
+
+@pytest.fixture(autouse=True)
+def long_waits(monkeypatch):
+    for level in admission.LEVELS:
+        monkeypatch.setitem(admission.ADMISSION_WAIT, level, 5.0)
+
+
+async def queued(gate: admission.Gate, level: str) -> asyncio.Task:
+    """Start acquire() and return once it is waiting."""
+    task = asyncio.create_task(gate.acquire(level))
+    await asyncio.sleep(0)
+    assert not task.done()
+    return task
+
+
+@pytest.mark.anyio
+async def test_free_slot_goes_to_the_best_class_then_the_earliest_arrival():
+    gate = admission.Gate(capacity=1, reserved=0)
+    await gate.acquire(NORMAL)
+    waiters = [("low", LOW), ("normal-1", NORMAL), ("critical", CRITICAL), ("normal-2", NORMAL)]
+    granted = []
+    for name, level in waiters:
+        task = await queued(gate, level)
+        task.add_done_callback(lambda _, name=name, level=level: granted.append((name, level)))
+
+    gate.release(NORMAL)
+    for n in range(1, len(waiters) + 1):
+        while len(granted) < n:
+            await asyncio.sleep(0)
+        assert gate.in_use == 1
+        gate.release(granted[-1][1])
+    assert [name for name, _ in granted] == ["critical", "normal-1", "normal-2", "low"]
+    assert gate.in_use == 0
+
+
+@pytest.mark.anyio
+async def test_reserved_slots_are_left_for_critical_requests():
+    gate = admission.Gate(capacity=3, reserved=1)
+    await gate.acquire(NORMAL)
+    await gate.acquire(LOW)
+    normal = await queued(gate, NORMAL)
+    await gate.acquire(CRITICAL)
+    assert gate.in_use == 3 and not normal.done()
+
+    gate.release(CRITICAL)
+    await asyncio.sleep(0)
+    assert gate.in_use == 2 and not normal.done()  # the free slot is the reserved one
+    gate.release(LOW)
+    await normal
+    assert gate.in_use == 2
+
+
+def test_reservation_never_takes_every_slot():
+    assert admission.Gate(capacity=1, reserved=4).reserved == 0
+
+
+@pytest.mark.anyio
+async def test_waiter_is_rejected_when_its_budget_runs_out(monkeypatch):
+    monkeypatch.setitem(admission.ADMISSION_WAIT, LOW, 0.01)
+    gate = admission.Gate(capacity=1, reserved=0)
+    await gate.acquire(NORMAL)
+    with pytest.raises(admission.Overloaded) as excinfo:
+        await gate.acquire(LOW)
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers["Retry-After"] == str(admission.RETRY_AFTER)
+
+    gate.release(NORMAL)
+    assert gate.in_use == 0
+    stats = gate.stats()["levels"][LOW]
+    assert (stats["rejected"], stats["waiting"], stats["in_flight"]) == (1, 0, 0)
+
+
+@pytest.mark.anyio
+async def test_full_queue_rejects_immediately(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_MAX_QUEUE", 1)
+    gate = admission.Gate(capacity=1, reserved=0)
+    await gate.acquire(NORMAL)
+    waiting = await queued(gate, NORMAL)
+    with pytest.raises(admission.Overloaded):
+        await gate.acquire(CRITICAL)
+    gate.release(NORMAL)
+    await waiting
+    gate.release(NORMAL)
+    assert gate.in_use == 0
+
+
+@pytest.mark.anyio
+async def test_cancelled_waiter_does_not_keep_a_slot():
+    gate = admission.Gate(capacity=1, reserved=0)
+    await gate.acquire(NORMAL)
+    gone = await queued(gate, CRITICAL)
+    later = await queued(gate, NORMAL)
+    gone.cancel()
+    await asyncio.gather(gone, return_exceptions=True)
+
+    gate.release(NORMAL)
+    await later
+    assert gate.in_use == 1
+    assert gate.stats()["levels"][CRITICAL]["in_flight"] == 0
+
+
+@pytest.mark.anyio
+async def test_priority_limit_sheds_concurrent_requests():
+    dependency = admission.priority(LOW, limit=1)
+    first = dependency()
+    await first.__anext__()
+    with pytest.raises(admission.Overloaded):
+        await dependency().__anext__()
+    await first.aclose()
+    second = dependency()
+    await second.__anext__()
+    await second.aclose()
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        admission.priority("urgent")
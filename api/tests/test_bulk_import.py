@@ -0,0 +1,59 @@
+import io
+
+import pytest
+
+import bulk_import
+
+HEADER = "order_ref,customer_name,customer_phone,sku,qty\n"
+
+
+def test_decode_body_strips_bom_and_names_the_bad_line():
+    assert bulk_import.decode_body(b"\xef\xbb\xbfa,b\n") == "a,b\n"
+    with pytest.raises(bulk_import.MalformedImport) as excinfo:
+        bulk_import.decode_body(b"ok\nok\n\xff\n")
+    assert excinfo.value.line == 3
+    assert str(excinfo.value) == "line 3: not valid UTF-8"
+
+
+def test_csv_rows_sharing_a_ref_form_one_order():
+    text = HEADER + "A,Ann,555,shirt,2\nA,,,pants,1\nB,Bob,556,shirt,1\n,Cy,557,coat,1\n"
+    parsed = list(bulk_import.parse_csv(io.StringIO(text)))
+    assert [(row, ref, error) for row, ref, _, error in parsed] == [(1, "A", None), (2, "B", None), (3, None, None)]
+    first = parsed[0][2]
+    assert first.customer.name == "Ann"
+    assert [(item.sku, item.qty) for item in first.items] == [("shirt", 2), ("pants", 1)]
+
+
+def test_csv_invalid_order_is_reported_not_raised():
+    text = HEADER + "A,Ann,555,shirt,0\nB,Bob,556,shirt,x\n"
+    errors = [error for _, _, order, error in bulk_import.parse_csv(io.StringIO(text)) if order is None]
+    assert len(errors) == 2
+    assert errors[0] == "Item quantity must be greater than zero"
+
+
+def test_unreadable_csv_is_malformed():
+    text = HEADER + "A,Ann,555,shirt,1\nB," + "x" * 200_000 + ",556,shirt,1\n"  # past csv.field_size_limit()
+    with pytest.raises(bulk_import.MalformedImport) as excinfo:
+        list(bulk_import.parse_csv(io.StringIO(text)))
+    assert excinfo.value.line == 3
+
+
+def test_ndjson_reports_bad_lines_by_number():
+    lines = [
+        '{"ref": "A", "customer": {"name": "Ann", "phone": "555"}, "items": [{"sku": "shirt", "qty": 1}]}',
+        "",
+        "{not json",
+        "[1, 2]",
+        '{"customer": {"name": "Bob", "phone": "556"}, "items": []}',
+    ]
+    parsed = list(bulk_import.parse_ndjson(lines))
+    assert [(row, ref) for row, ref, _, _ in parsed] == [(1, "A"), (3, None), (4, None), (5, None)]
+    assert parsed[0][2] is not None
+    assert parsed[1][3].startswith("Invalid JSON")
+    assert parsed[2][3] == "Expected a JSON object"
+    assert parsed[3][3] == "Order requires at least one item"
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        bulk_import.parse_orders([], "xml")
@@ -0,0 +1,118 @@
+import asyncio
+import types
+
+import pytest
+
+import cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    c = cache.TTLCache(maxsize=10, ttl=30)
+    c.set("a", 1)
+    clock.value += 29.9
+    assert c.get("a") == 1
+    clock.value += 0.1
+    assert c.get("a") is None
+    assert len(c) == 0
+    assert (c.hits, c.misses) == (1, 1)
+
+
+def test_ttl_is_capped_and_non_positive_ttl_is_not_stored(clock):
+    c = cache.TTLCache(maxsize=10, ttl=30)
+    c.set("long", 1, ttl=3600)
+    c.set("short", 2, ttl=5)
+    c.set("expired", 3, ttl=0)
+    c.set("past", 4, ttl=-1)
+    assert len(c) == 2
+    clock.value += 5
+    assert c.get("short") is None
+    assert c.get("long") == 1
+    clock.value += 25
+    assert c.get("long") is None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    c = cache.TTLCache(maxsize=2, ttl=30)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert (c.get("a"), c.get("c")) == (1, 3)
+
+
+def test_zero_size_cache_stores_nothing(clock):
+    c = cache.TTLCache(maxsize=0, ttl=30)
+    c.set("a", 1)
+    assert c.get("a") is None
+
+
+def test_pop_and_discard_where(clock):
+    c = cache.TTLCache(maxsize=10, ttl=30)
+    for i in range(5):
+        c.set(i, {"user_id": i % 2})
+    assert c.pop(0) == {"user_id": 0}
+    assert c.pop(0) is None
+    assert c.discard_where(lambda row: row["user_id"] == 1) == 2
+    assert sorted(c._data) == [2, 4]
+
+
+@pytest.mark.anyio
+async def test_read_through_loads_once_until_invalidated(clock):
+    c = cache.ReadThroughCache(maxsize=10, ttl=30)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return len(loads)
+
+    assert await c.get_or_load("k", loader) == 1
+    assert await c.get_or_load("k", loader) == 1
+    c.invalidate("laundry_catalog")
+    assert await c.get_or_load("k", loader) == 2
+    clock.value += 30
+    assert await c.get_or_load("k", loader) == 3
+    assert (c.generation, c.invalidations) == (1, 1)
+
+
+@pytest.mark.anyio
+async def test_load_racing_an_invalidation_is_not_cached(clock):
+    c = cache.ReadThroughCache(maxsize=10, ttl=30)
+    loading, invalidated = asyncio.Event(), asyncio.Event()
+
+    async def stale():
+        loading.set()
+        await invalidated.wait()
+        return "stale"
+
+    task = asyncio.create_task(c.get_or_load("k", stale))
+    await loading.wait()
+    c.invalidate()
+    invalidated.set()
+    assert await task == "stale"
+    assert c.get("k") is None
+
+
+@pytest.mark.anyio
+async def test_disabled_cache_always_loads(clock):
+    enabled = False
+    c = cache.ReadThroughCache(maxsize=10, ttl=30, enabled=lambda: enabled)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return len(loads)
+
+    assert await c.get_or_load("k", loader) == 1
+    assert await c.get_or_load("k", loader) == 2
+    assert len(c) == 0
+    enabled = True
+    assert await c.get_or_load("k", loader) == 3
+    assert await c.get_or_load("k", loader) == 3
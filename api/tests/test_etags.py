@@ -0,0 +1,47 @@
+import orjson
+import pytest
+
+import etags
+
+TAG = 'W/"0123456789abcdef01234567"'
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        ("*", True),
+        (" * ", True),
+        (TAG, True),
+        ('"0123456789abcdef01234567"', True),  # weak comparison ignores W/
+        (f'"other", {TAG}', True),
+        (f'W/"other",{TAG.removeprefix("W/")}', True),
+        ('W/"other"', False),
+        ('W/"0123456789abcdef0123456"', False),
+    ],
+)
+def test_matches_uses_weak_comparison(header, expected):
+    assert etags.matches(header, TAG) is expected
+
+
+def test_encode_tags_depend_only_on_content():
+    first = etags.encode({"data": [1, 2, 3]})
+    assert first.body == orjson.dumps({"data": [1, 2, 3]})
+    assert first.etag.startswith('W/"') and first.etag.endswith('"')
+    assert etags.encode({"data": [1, 2, 3]}).etag == first.etag
+    assert etags.encode({"data": [1, 2, 4]}).etag != first.etag
+
+
+def test_respond_sends_304_without_a_body_on_match():
+    encoded = etags.encode({"ok": True})
+    fresh = etags.respond(encoded, None)
+    assert fresh.status_code == 200
+    assert fresh.body == encoded.body
+    assert fresh.headers["etag"] == encoded.etag
+    assert fresh.headers["cache-control"] == "no-cache"
+
+    revalidated = etags.respond(encoded, encoded.etag)
+    assert revalidated.status_code == 304
+    assert revalidated.body == b""
+    assert revalidated.headers["etag"] == encoded.etag
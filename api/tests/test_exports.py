@@ -0,0 +1,79 @@
+import os
+import tracemalloc
+
+import pytest
+from psycopg_pool import AsyncConnectionPool
+
+import exports
+from explain_orders import populate
+
+# Shares its synthetic orders with test_orders' EXPLAIN checks (populate tops up to the larger count)
+EXPORT_ORDERS = int(os.getenv("TEST_EXPLAIN_ORDERS", "1000000"))
+MAX_TRACED_BYTES = 16 * 1024 * 1024
+
+
+@pytest.fixture
+def two_slots(monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_CONCURRENCY", 2)
+    yield
+    assert exports._active == 0, "an export slot was not released"
+
+
+def test_reserve_enforces_the_limit_at_check_time(two_slots):
+    first, second = exports.reserve(), exports.reserve()
+    with pytest.raises(exports.ExportsBusy):
+        exports.reserve()
+    first.release()
+    first.release()  # idempotent: the generator and the response may both release
+    third = exports.reserve()
+    second.release()
+    third.release()
+
+
+@pytest.mark.anyio
+async def test_response_releases_its_slot_when_the_body_never_starts(two_slots):
+    slot = exports.reserve()
+
+    async def body():
+        yield b"never sent"
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    response = exports.ExportResponse(slot, body(), media_type="text/csv")
+    with pytest.raises((OSError, ExceptionGroup)):  # starlette may wrap it in its task group's group
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    assert not slot.held
+
+
+@pytest.fixture(scope="module")
+def export_pool_url(database_url):
+    import psycopg
+
+    with psycopg.connect(database_url) as conn:
+        populate(conn, EXPORT_ORDERS)
+    return database_url
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+@pytest.mark.parametrize("fmt", sorted(exports.EXPORT_FORMATS))
+async def test_export_streams_in_bounded_memory(export_pool_url, fmt, two_slots):
+    pool = AsyncConnectionPool(export_pool_url, min_size=1, max_size=1, open=False)
+    await pool.open()
+    total = largest = 0
+    tracemalloc.start()
+    try:
+        async for chunk in exports.stream_orders(pool, fmt, exports.reserve()):
+            total += len(chunk)
+            largest = max(largest, len(chunk))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        await pool.close()
+    assert total >= EXPORT_ORDERS * 50
+    assert largest < 2 * exports.CHUNK_BYTES
+    assert peak < MAX_TRACED_BYTES, f"{peak} bytes traced while streaming {total} bytes"
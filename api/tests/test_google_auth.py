@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+import google_auth
+from bench_google_verify import CLIENT_ID, Keys
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="module")
+def keys():
+    keys = Keys()
+    for kid in ("old", "new"):
+        keys.add(kid, bits=1024)  # pure-Python key generation; 2048 bits takes seconds
+    return keys
+
+
+class FakeFetch:
+    """`fetch` for CachedCertsSource: serves whatever `certs` holds, counting calls."""
+
+    def __init__(self, certs: dict, max_age: float = 3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self, url: str) -> tuple[dict, float]:
+        self.calls += 1
+        if self.fail:
+            raise OSError("certs endpoint down")
+        return dict(self.certs), self.max_age
+
+
+def verifier(keys: Keys, *kids: str) -> google_auth.GoogleTokenVerifier:
+    return google_auth.GoogleTokenVerifier(CLIENT_ID, google_auth.StaticKeySource({k: keys.public[k] for k in kids}))
+
+
+async def test_valid_token_returns_its_claims(keys):
+    claims = await verifier(keys, "old").verify(keys.sign("old"))
+    assert claims["aud"] == CLIENT_ID
+    assert claims["email"] == "bench@example.com"
+
+
+@pytest.mark.parametrize(
+    "token_kwargs, message",
+    [
+        ({"ttl": -60}, "expired"),
+        ({"aud": "someone-else.apps.googleusercontent.com"}, "audience"),
+        ({"iss": "https://evil.example.com"}, "Invalid issuer"),
+    ],
+)
+async def test_rejects_tokens_not_meant_for_us(keys, token_kwargs, message):
+    with pytest.raises(google_auth.InvalidToken, match=f"(?i){message}"):
+        await verifier(keys, "old").verify(keys.sign("old", **token_kwargs))
+
+
+async def test_rejects_malformed_and_missigned_tokens(keys):
+    with pytest.raises(google_auth.InvalidToken, match="Malformed"):
+        await verifier(keys, "old").verify("not-a-jwt")
+    header, payload, _ = keys.sign("new").split(".")
+    _, _, other_signature = keys.sign("old").split(".")
+    with pytest.raises(google_auth.InvalidToken):
+        await verifier(keys, "old", "new").verify(f"{header}.{payload}.{other_signature}")
+
+
+async def test_unknown_key_id_forces_one_refresh(keys):
+    fetch = FakeFetch({"old": keys.public["old"]})
+    source = google_auth.CachedCertsSource(fetch=fetch, min_refresh_interval=0)
+    verify = google_auth.GoogleTokenVerifier(CLIENT_ID, source).verify
+    await verify(keys.sign("old"))
+    assert fetch.calls == 1
+
+    fetch.certs["new"] = keys.public["new"]  # Google rotated its keys
+    await verify(keys.sign("new"))
+    assert fetch.calls == 2
+    await verify(keys.sign("new"))
+    assert fetch.calls == 2
+
+
+async def test_certs_are_cached_for_their_max_age(keys, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(google_auth.time, "monotonic", lambda: now[0])
+    fetch = FakeFetch({"old": keys.public["old"]}, max_age=600)
+    source = google_auth.CachedCertsSource(fetch=fetch, min_ttl=60)
+    await source.get_certs()
+    now[0] += 599
+    await source.get_certs()
+    assert fetch.calls == 1
+    now[0] += 2
+    await source.get_certs()
+    assert fetch.calls == 2
+
+    fetch.max_age = 5  # never cached for less than min_ttl
+    now[0] += 601
+    await source.get_certs()
+    now[0] += 59
+    await source.get_certs()
+    assert fetch.calls == 3
+
+
+async def test_refreshes_are_rate_limited_and_shared(keys):
+    fetch = FakeFetch({"old": keys.public["old"]})
+    source = google_auth.CachedCertsSource(fetch=fetch, min_refresh_interval=30)
+    await asyncio.gather(*(source.get_certs() for _ in range(10)))
+    assert fetch.calls == 1
+    # Tokens with made-up key ids can't make us hammer Google
+    with pytest.raises(google_auth.InvalidToken):
+        await google_auth.GoogleTokenVerifier(CLIENT_ID, source).verify(keys.sign("new"))
+    assert fetch.calls == 1
+
+
+async def test_failed_refresh_keeps_serving_cached_certs(keys):
+    fetch = FakeFetch({"old": keys.public["old"]})
+    source = google_auth.CachedCertsSource(fetch=fetch, min_refresh_interval=0)
+    certs = await source.get_certs()
+    fetch.fail = True
+    assert await source.refresh() == certs
+
+    cold = google_auth.CachedCertsSource(fetch=fetch)
+    with pytest.raises(OSError):
+        await cold.get_certs()
+
+
+class FakeResponse:
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"kid": "pem"}
+
+
+class FakeSession:
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+    def get(self, url, timeout):
+        return FakeResponse(self.headers)
+
+
+@pytest.mark.parametrize(
+    "headers, max_age",
+    [
+        ({"Cache-Control": "public, max-age=19741, must-revalidate, no-transform"}, 19741),
+        ({"Cache-Control": "public, max-age=19741", "Age": "741"}, 19000),
+        ({"Cache-Control": "max-age=10", "Age": "60"}, 0),
+        ({}, 0),
+    ],
+)
+def test_fetch_certs_reads_max_age_less_age(headers, max_age):
+    assert google_auth._fetch_certs("https://certs", FakeSession(headers)) == ({"kid": "pem"}, max_age)
@@ -0,0 +1,85 @@
+import dataclasses
+
+import psycopg
+import pytest
+
+import migrate
+
+
+def write_manifest(tmp_path, files: dict[str, str], order: list[str] | None = None):
+    (tmp_path / "migrations").mkdir()
+    for name, sql in files.items():
+        (tmp_path / "migrations" / name).write_text(sql)
+    manifest = tmp_path / "schema.sql"
+    lines = ["-- comment", "\\ir migrations/ignored.txt trailing words"]
+    lines += [f"  \\ir migrations/{name}  " for name in (order or list(files))]
+    manifest.write_text("\n".join(lines) + "\n")
+    return manifest
+
+
+def test_manifest_lists_every_migration_file_in_order():
+    migrations = migrate.load_migrations()
+    files = sorted(path.name for path in (migrate.DB_DIR / "migrations").glob("*.sql"))
+    assert [f"{m.version:04d}_{m.name}.sql" for m in migrations] == files
+    assert [m.version for m in migrations] == list(range(1, len(migrations) + 1))
+    assert migrate.expected_version() == migrations[-1].version
+
+
+def test_load_reads_included_files_with_checksums(tmp_path):
+    manifest = write_manifest(tmp_path, {"0001_first.sql": "SELECT 1;", "0003_third.sql": "SELECT 3;"})
+    first, third = migrate.load_migrations(manifest)
+    assert (first.version, first.name, first.sql) == (1, "first", "SELECT 1;")
+    assert third.version == 3
+    assert first.checksum != third.checksum and len(first.checksum) == 64
+    assert migrate.expected_version([first, third]) == 3
+    assert migrate.expected_version([]) == 0
+
+
+@pytest.mark.parametrize("name", ["first.sql", "0001-first.sql", "0001_first.psql"])
+def test_badly_named_file_is_rejected(tmp_path, name):
+    manifest = write_manifest(tmp_path, {name: "SELECT 1;"})
+    with pytest.raises(migrate.MigrationError, match="NNNN_name.sql"):
+        migrate.load_migrations(manifest)
+
+
+@pytest.mark.parametrize(
+    "order",
+    [["0002_b.sql", "0001_a.sql"], ["0001_a.sql", "0001_a.sql"]],
+    ids=["decreasing", "duplicate"],
+)
+def test_versions_must_increase(tmp_path, order):
+    manifest = write_manifest(tmp_path, {"0001_a.sql": "SELECT 1;", "0002_b.sql": "SELECT 2;"}, order)
+    with pytest.raises(migrate.MigrationError, match="unique and increasing"):
+        migrate.load_migrations(manifest)
+
+
+def test_modified_applied_migration_is_an_error(tmp_path):
+    manifest = write_manifest(tmp_path, {"0001_a.sql": "SELECT 1;", "0002_b.sql": "SELECT 2;"})
+    first, second = migrate.load_migrations(manifest)
+    migrate.check_checksums([first, second], {1: first.checksum})
+    with pytest.raises(migrate.MigrationError, match="0001_a was modified"):
+        migrate.check_checksums([first, second], {1: second.checksum})
+
+
+@pytest.mark.db
+def test_migrate_is_idempotent_and_rejects_edits(database_url, conn):
+    assert migrate.migrate(conn) == []
+    migrations = migrate.load_migrations()
+    assert migrate.applied_checksums(conn) == {m.version: m.checksum for m in migrations}
+
+    edited = [*migrations[:-1], dataclasses.replace(migrations[-1], checksum="0" * 64)]
+    with pytest.raises(migrate.MigrationError, match="modified"):
+        migrate.migrate(conn, edited)
+    # The advisory lock is released even on failure
+    with psycopg.connect(database_url, autocommit=True) as other:
+        assert other.execute("SELECT pg_try_advisory_lock(%s)", (migrate.MIGRATIONS_LOCK,)).fetchone()[0]
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+async def test_verify_checks_the_recorded_version(database_url):
+    version = migrate.expected_version()
+    async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as conn:
+        await migrate.verify(conn, version)
+        with pytest.raises(migrate.MigrationError, match=f"version {version}, this build needs {version + 1}"):
+            await migrate.verify(conn, version + 1)
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+
+import order_feed
+
+
+def event(event_id: int, order_id: int = 1, status: str = "ready") -> dict:
+    return {"event_id": event_id, "order_id": order_id, "status": status}
+
+
+def publish(feed: order_feed.OrderFeed, *events: dict) -> None:
+    for e in events:
+        feed.publish(json.dumps(e))
+
+
+def test_reserve_counts_the_subscriber_before_returning():
+    feed = order_feed.OrderFeed(max_clients=2)
+    first, second = feed.reserve(), feed.reserve(order_id=7)
+    with pytest.raises(order_feed.FeedFull):
+        feed.reserve()
+    feed.release(first)
+    feed.release(first)  # idempotent
+    third = feed.reserve()
+    assert feed.subscribers == {second, third}
+
+
+def test_publish_filters_by_order():
+    feed = order_feed.OrderFeed()
+    everything, one = feed.reserve(), feed.reserve(order_id=2)
+    publish(feed, event(1, order_id=1), event(2, order_id=2))
+    assert [feed_id for feed_id, _, _ in everything.queue._queue] == [1, 2]
+    assert [feed_id for feed_id, _, _ in one.queue._queue] == [2]
+
+
+async def take(stream, n: int) -> list[str]:
+    return [await asyncio.wait_for(stream.__anext__(), 1) for _ in range(n)]
+
+
+@pytest.mark.anyio
+async def test_replay_skips_only_the_ids_it_sent(monkeypatch):
+    monkeypatch.setattr(order_feed, "SSE_HEARTBEAT", 0.05)
+    feed = order_feed.OrderFeed()
+    sub = feed.reserve()
+
+    async def replay(after):
+        assert after == 9
+        # 11 was assigned before 12 but commits after the replay query ran
+        publish(feed, event(12), event(11), event(13))
+        return [event(10), event(12)]
+
+    stream = feed.stream(sub, 9, replay)
+    messages = await take(stream, 5)
+    assert messages[0] == "retry: 3000\n\n"
+    assert [m.split("\n")[0] for m in messages[1:]] == ["id: 10", "id: 12", "id: 11", "id: 13"]
+    assert await take(stream, 1) == [": ping\n\n"]
+    await stream.aclose()
+    assert not feed.subscribers
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("replayed", [None, [event(i) for i in range(1, 1 + order_feed.SSE_REPLAY_MAX)]])
+async def test_unknown_or_long_gap_resyncs(replayed):
+    feed = order_feed.OrderFeed()
+
+    async def replay(after):
+        return replayed
+
+    stream = feed.stream(feed.reserve(), 0, replay)
+    assert await take(stream, 2) == ["retry: 3000\n\n", order_feed.RESYNC[2]]
+    await stream.aclose()
+
+
+@pytest.mark.anyio
+async def test_response_releases_a_subscriber_whose_stream_never_started():
+    feed = order_feed.OrderFeed(max_clients=1)
+    sub = feed.reserve()
+
+    async def replay(after):
+        return []
+
+    async def receive():
+        await asyncio.sleep(1)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    response = order_feed.FeedResponse(feed, sub, feed.stream(sub, None, replay), media_type="text/event-stream")
+    with pytest.raises((OSError, ExceptionGroup)):  # starlette may wrap it in its task group's group
+        await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    assert not feed.subscribers
+    feed.reserve()
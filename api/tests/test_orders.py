@@ -0,0 +1,133 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+import pytest
+
+import orders
+import statements
+from explain_orders import explain, populate
+
+# EXPLAIN checks run at production-like volume; lower it for a quicker local run
+EXPLAIN_ORDERS = int(os.getenv("TEST_EXPLAIN_ORDERS", "1000000"))
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 10, 17, 9, 30, 12, 345678, tzinfo=timezone(timedelta(hours=-3)))
+    token = orders.encode_cursor(created_at, 42)
+    assert "=" not in token
+    assert orders.decode_cursor(token) == (created_at, 42)
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "not base64!",
+        orders.encode_cursor(datetime(2026, 1, 1, tzinfo=timezone.utc), 1)[:-3],
+        "MjAyNi0wMS0wMQ",  # no "|id"
+        "bm90LWEtZGF0ZXwx",  # "not-a-date|1"
+        "MjAyNi0wMS0wMXxvbmU",  # "2026-01-01|one"
+        "__8",  # not UTF-8
+    ],
+)
+def test_decode_cursor_rejects_malformed_tokens(token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        orders.decode_cursor(token)
+
+
+def test_list_query_leaves_out_unused_filters():
+    query, params = orders.build_list_query(limit=11)
+    assert "WHERE" not in query.as_string(None)
+    assert params == {"limit": 11}
+
+    after = (datetime(2026, 1, 1, tzinfo=timezone.utc), 7)
+    query, params = orders.build_list_query(limit=11, status="ready", after=after)
+    text = " ".join(query.as_string(None).split())
+    assert "WHERE o.status = %(status)s AND (o.created_at, o.id) < (%(after_created_at)s, %(after_id)s)" in text
+    assert "customer_id = " not in text
+    assert params == {"limit": 11, "status": "ready", "after_created_at": after[0], "after_id": 7}
+
+
+@pytest.fixture(scope="module")
+def listed_orders(database_url):
+    """A customer with 25 orders, several sharing a created_at, newest first by (created_at, id)."""
+    with psycopg.connect(database_url, autocommit=True) as conn:
+        customer_id = conn.execute(
+            "INSERT INTO customers (name, phone) VALUES ('keyset-test', 'keyset-test') RETURNING id"
+        ).fetchone()[0]
+        rows = conn.execute(
+            """
+            INSERT INTO orders (customer_id, status, created_at)
+            SELECT %s, 'received', TIMESTAMPTZ '2026-01-01' + (g / 3) * interval '1 minute'
+            FROM generate_series(1, 25) g
+            RETURNING id, created_at
+            """,
+            (customer_id,),
+        ).fetchall()
+    return customer_id, [order_id for order_id, _ in sorted(rows, key=lambda r: (r[1], r[0]), reverse=True)]
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+async def test_keyset_pages_return_every_order_once_in_order(database_url, listed_orders):
+    customer_id, expected = listed_orders
+    seen, after = [], None
+    async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as conn:
+        while True:
+            rows, cursor = await orders.fetch_orders(conn, limit=4, customer_id=customer_id, after=after)
+            seen += [row["id"] for row in rows]
+            if cursor is None:
+                break
+            after = orders.decode_cursor(cursor)
+    assert seen == expected
+
+
+@pytest.fixture(scope="module")
+def explain_conn(database_url):
+    with psycopg.connect(database_url) as conn:
+        populate(conn, EXPLAIN_ORDERS)
+        yield conn
+
+
+def explain_shapes(conn: psycopg.Connection) -> dict[str, dict]:
+    newest, customer_id = conn.execute(
+        "SELECT created_at, customer_id FROM orders ORDER BY created_at DESC, id DESC LIMIT 1"
+    ).fetchone()
+    deep = conn.execute(
+        "SELECT created_at, id FROM orders ORDER BY created_at DESC, id DESC OFFSET %s LIMIT 1",
+        (EXPLAIN_ORDERS // 2,),
+    ).fetchone()
+    return {
+        "first_page": {},
+        "deep_page": {"after": tuple(deep)},
+        "status": {"status": "ready"},
+        "status_deep_page": {"status": "ready", "after": tuple(deep)},
+        "customer": {"customer_id": customer_id},
+        "date_range": {"created_from": newest - timedelta(days=7), "created_to": newest - timedelta(days=6)},
+        "status_and_range": {"status": "delivered", "created_from": newest - timedelta(days=30), "created_to": newest},
+    }
+
+
+@pytest.mark.db
+def test_order_listings_use_index_range_plans(explain_conn):
+    results = {}
+    for name, filters in explain_shapes(explain_conn).items():
+        query, params = orders.build_list_query(limit=51, **filters)
+        results[name] = explain(explain_conn, query, params, max_sorted=1000)
+    problems = {name: r["problems"] for name, r in results.items() if r["problems"]}
+    assert problems == {}
+    for name, result in results.items():
+        assert any("orders" in scan for scan in result["scans"]), f"{name} does not use an orders index: {result['scans']}"
+
+
+@pytest.mark.db
+def test_order_detail_uses_index_lookups(explain_conn):
+    order_id = explain_conn.execute("SELECT max(id) FROM orders").fetchone()[0]
+    result = explain(
+        explain_conn,
+        psycopg.sql.SQL(statements.STATEMENTS["order_detail"].sql),
+        {"order_id": order_id},
+        max_sorted=1000,
+    )
+    assert result["problems"] == []
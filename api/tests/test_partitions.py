@@ -0,0 +1,25 @@
+from datetime import date
+
+import psycopg
+import pytest
+
+import partitions
+
+
+@pytest.mark.parametrize("month, ahead", [(date(2026, 10, 1), date(2026, 11, 1)), (date(2026, 12, 1), date(2027, 1, 1))])
+def test_missing_covers_this_and_next_month(monkeypatch, month, ahead):
+    monkeypatch.setattr(partitions, "current_month", lambda: month)
+    existing = {partitions.partition_name("order_events", month), partitions.partition_name("sessions", ahead)}
+    assert partitions._missing(existing) == [
+        partitions.partition_name("order_events", ahead),
+        partitions.partition_name("sessions", month),
+    ]
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+async def test_coverage_check_reads_what_maintain_created(database_url, conn):
+    partitions.maintain(conn)
+    assert partitions.uncovered(conn) == []
+    async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as aconn:
+        assert await partitions.check_coverage(aconn) == []
@@ -0,0 +1,120 @@
+import contextlib
+import types
+
+import httpx
+import psycopg
+import pytest
+from psycopg_pool import PoolTimeout
+
+import replicas
+
+
+@pytest.mark.parametrize("text, value", [("0/0", 0), ("16/B374D848", 0x16B374D848), ("FFFFFFFF/FFFFFFFF", 2**64 - 1)])
+def test_lsn_round_trip(text, value):
+    assert replicas.parse_lsn(text) == value
+    assert replicas.format_lsn(value) == text
+
+
+@pytest.mark.parametrize("text", ["", "16", "16/xyz", "1/2/3"])
+def test_malformed_lsn_is_rejected(text):
+    with pytest.raises(ValueError):
+        replicas.parse_lsn(text)
+
+
+def client_for(secure: bool = False, enabled: bool = True, written: tuple[int, ...] = (), status: int = 200):
+    """A client whose app records `written` LSNs and reports the min LSN it saw."""
+
+    async def app(scope, receive, send):
+        lsns = replicas._written_lsns.get()
+        if lsns is not None:
+            lsns.extend(written)
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": str(replicas._min_lsn.get()).encode()})
+
+    router = types.SimpleNamespace(enabled=enabled)
+    middleware = replicas.WriteLSNMiddleware(app, router=router, secure=secure)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test")
+
+
+@pytest.mark.anyio
+async def test_write_sets_the_newest_lsn_cookie():
+    async with client_for(written=(0x10, 0x2A0, 0x30)) as client:
+        res = await client.post("/api/orders")
+    assert res.headers["set-cookie"] == "laundry_lsn=0/2A0; Path=/; Max-Age=300; HttpOnly; SameSite=Lax"
+
+
+@pytest.mark.anyio
+async def test_cookie_is_secure_when_configured():
+    async with client_for(secure=True, written=(1,)) as client:
+        res = await client.post("/api/orders")
+    assert res.headers["set-cookie"].endswith("; SameSite=Lax; Secure")
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "method, written, status, enabled",
+    [("GET", (1,), 200, True), ("POST", (), 200, True), ("POST", (1,), 409, True), ("POST", (1,), 200, False)],
+    ids=["read", "no-write", "failed", "no-replica"],
+)
+async def test_no_cookie_without_a_successful_write(method, written, status, enabled):
+    async with client_for(enabled=enabled, written=written, status=status) as client:
+        res = await client.request(method, "/api/orders")
+    assert "set-cookie" not in res.headers
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("cookie, seen", [("laundry_lsn=1/0", str(1 << 32)), ("laundry_lsn=bogus", "0"), ("other=1", "0")])
+async def test_request_cookie_sets_the_minimum_replica_lsn(cookie, seen):
+    async with client_for() as client:
+        res = await client.get("/api/orders", headers={"cookie": f"session=abc; {cookie}"})
+    assert res.text == seen
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+async def test_record_write_lsn_commits_before_reading_the_position(database_url):
+    written = []
+    token = replicas._written_lsns.set(written)
+    try:
+        async with await psycopg.AsyncConnection.connect(database_url) as conn:
+            await conn.execute("INSERT INTO customers (name, phone) VALUES ('lsn-test', 'lsn-test')")
+            await replicas.record_write_lsn(conn)
+            assert not conn.autocommit
+            with psycopg.connect(database_url, autocommit=True) as other:
+                assert other.execute("SELECT count(*) FROM customers WHERE phone = 'lsn-test'").fetchone()[0] == 1
+                position = replicas.parse_lsn(other.execute("SELECT pg_current_wal_lsn()::text").fetchone()[0])
+    finally:
+        replicas._written_lsns.reset(token)
+    assert len(written) == 1 and 0 < written[0] <= position
+
+
+class BusyPool:
+    """Replica pool with no free connection: times out after whatever wait the caller allows."""
+
+    def __init__(self):
+        self.timeouts = []
+
+    @contextlib.asynccontextmanager
+    async def connection(self, timeout=None):
+        self.timeouts.append(timeout)
+        raise PoolTimeout("no connection free")
+        yield
+
+
+class PrimaryPool:
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        yield "primary"
+
+
+@pytest.mark.anyio
+async def test_busy_replica_falls_back_within_the_check_interval():
+    router = replicas.ReadRouter(lambda: PrimaryPool(), read_url=None)
+    router.pool, router.healthy = BusyPool(), True
+
+    async def query(conn):
+        return conn
+
+    assert await router.run(query) == "primary"
+    assert router.pool.timeouts == [replicas.REPLICA_CHECK_INTERVAL]
+    assert router.fallbacks == 1 and not router.healthy
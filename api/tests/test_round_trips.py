@@ -0,0 +1,78 @@
+import statistics
+import time
+
+import psycopg
+import pytest
+
+import statements
+from bench_round_trips import make_order, sequential_create_order
+from latency_proxy import LatencyProxy
+
+pytestmark = [pytest.mark.db, pytest.mark.anyio]
+
+RTT_MS = 10
+REPEAT = 5
+
+
+def create_order_params(order: dict) -> dict:
+    items = order["items"]
+    return {
+        "name": order["customer"]["name"],
+        "phone": order["customer"]["phone"],
+        "email": None,
+        "address": None,
+        "pickup_notes": None,
+        "delivery_notes": None,
+        "pickup_at": None,
+        "delivery_at": None,
+        "total_items": sum(item["qty"] for item in items),
+        "total_price_cents": sum(item["qty"] * item["unit_price_cents"] for item in items),
+        "skus": [item["sku"] for item in items],
+        "descriptions": [None] * len(items),
+        "qtys": [item["qty"] for item in items],
+        "prices": [item["unit_price_cents"] for item in items],
+        "idempotency_key": None,
+        "request_hash": None,
+        "response": None,
+    }
+
+
+async def median_ms(fn, repeat: int = REPEAT) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+@pytest.fixture(scope="module")
+def proxied_url(database_url):
+    return LatencyProxy(database_url, RTT_MS).start()
+
+
+async def test_create_order_is_one_round_trip_at_any_size(proxied_url):
+    """The set-based statement costs one round-trip whatever the line count; the old path one per row."""
+    async with await psycopg.AsyncConnection.connect(proxied_url, autocommit=True) as conn:
+        with psycopg.connect(proxied_url) as sync_conn:
+
+            async def select_one():
+                await (await conn.execute("SELECT 1")).fetchone()
+
+            async def set_based(order):
+                assert await statements.fetchone(conn, "create_order", create_order_params(order)) is not None
+
+            async def sequential(order):
+                sequential_create_order(sync_conn, order)
+
+            rtt = await median_ms(select_one)
+            small, large = make_order(1), make_order(50)
+            await set_based(small)  # prepare
+            small_ms = await median_ms(lambda: set_based(small))
+            large_ms = await median_ms(lambda: set_based(large))
+            sequential_ms = await median_ms(lambda: sequential(large))
+
+    assert rtt >= RTT_MS * 0.9
+    assert large_ms < 2 * rtt, f"50 lines took {large_ms:.1f} ms at {rtt:.1f} ms per round-trip"
+    assert large_ms < small_ms + rtt / 2
+    assert sequential_ms > 20 * rtt, f"statement-per-row path took only {sequential_ms:.1f} ms"
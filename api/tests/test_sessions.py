@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+import psycopg
+import pytest
+from psycopg_pool import AsyncConnectionPool
+
+import pubsub
+import sessions
+import statements
+from bench_order_events import session_cookie
+
+
+class FakePool:
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        yield None
+
+
+def session_row(user_id: int, seconds: float = 3600) -> dict:
+    return {"user_id": user_id, "username": f"user-{user_id}", "expires_at": datetime.now(timezone.utc) + timedelta(seconds=seconds)}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    sessions.reset()
+    yield
+    sessions.reset()
+
+
+@pytest.fixture
+def rows(monkeypatch):
+    """token -> row served by a stubbed session_lookup; counts the queries."""
+    table = {"calls": 0}
+
+    async def fetchone(conn, name, params=None):
+        assert name == "session_lookup"
+        table["calls"] += 1
+        return table.get(params["token"])
+
+    monkeypatch.setattr(statements, "fetchone", fetchone)
+    return table
+
+
+@pytest.mark.anyio
+async def test_lookup_caches_until_revoked(rows):
+    rows["t1"], rows["t2"] = session_row(1), session_row(2)
+    assert (await sessions.lookup(FakePool(), "t1"))["user_id"] == 1
+    assert (await sessions.lookup(FakePool(), "t1"))["user_id"] == 1
+    await sessions.lookup(FakePool(), "t2")
+    assert rows["calls"] == 2
+
+    sessions.on_notify("session:" + sessions.cache_key("t1"))
+    await sessions.lookup(FakePool(), "t1")
+    await sessions.lookup(FakePool(), "t2")
+    assert rows["calls"] == 3
+
+    sessions.on_notify("user:2")
+    await sessions.lookup(FakePool(), "t2")
+    assert rows["calls"] == 4
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("payload", ["", "garbage", "user:abc"])
+async def test_unrecognised_notification_clears_the_cache(rows, payload):
+    rows["t1"] = session_row(1)
+    await sessions.lookup(FakePool(), "t1")
+    sessions.on_notify(payload)
+    assert len(sessions.session_cache) == 0
+
+
+@pytest.mark.anyio
+async def test_uncached_lookup_and_unknown_token(rows):
+    rows["t1"] = session_row(1)
+    await sessions.lookup(FakePool(), "t1", use_cache=False)
+    assert len(sessions.session_cache) == 0
+    assert await sessions.lookup(FakePool(), "missing") is None
+    assert len(sessions.session_cache) == 0
+
+
+@pytest.mark.anyio
+async def test_session_is_not_cached_past_its_expiry(rows):
+    rows["t1"] = session_row(1, seconds=-1)
+    assert await sessions.lookup(FakePool(), "t1") is not None
+    assert len(sessions.session_cache) == 0
+
+
+@pytest.mark.anyio
+async def test_lookup_racing_a_revocation_is_not_cached(monkeypatch):
+    loading, revoked = asyncio.Event(), asyncio.Event()
+
+    async def fetchone(conn, name, params=None):
+        loading.set()
+        await revoked.wait()
+        return session_row(1)
+
+    monkeypatch.setattr(statements, "fetchone", fetchone)
+    task = asyncio.create_task(sessions.lookup(FakePool(), "t1"))
+    await loading.wait()
+    sessions.on_notify("user:1")
+    revoked.set()
+    assert (await task)["user_id"] == 1
+    assert sessions.session_cache.get(sessions.cache_key("t1")) is None
+
+
+async def wait_for(predicate, timeout: float = 5.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+async def test_revocation_notifies_the_listener(database_url):
+    listener = pubsub.Listener(database_url)
+    listener.subscribe(sessions.SESSIONS_CHANNEL, sessions.on_notify)
+    task = asyncio.create_task(listener.run())
+    token = session_cookie(database_url, "sessions-test")
+    async with AsyncConnectionPool(database_url, min_size=1, max_size=2, open=False) as pool:
+        try:
+            await wait_for(lambda: listener.connected)
+            key = sessions.cache_key(token)
+
+            assert await sessions.lookup(pool, token) is not None
+            assert sessions.session_cache.get(key) is not None
+            async with pool.connection() as conn:
+                await statements.execute(conn, "delete_session", {"token": token})
+            await wait_for(lambda: sessions.session_cache.get(key) is None)
+            assert await sessions.lookup(pool, token) is None
+
+            token = session_cookie(database_url, "sessions-test")
+            key = sessions.cache_key(token)
+            assert await sessions.lookup(pool, token) is not None
+            with psycopg.connect(database_url, autocommit=True) as conn:
+                conn.execute(
+                    """
+                    SELECT pg_notify(%s, 'user:' || user_id) FROM users WHERE username = 'sessions-test'
+                    """,
+                    (sessions.SESSIONS_CHANNEL,),
+                )
+            await wait_for(lambda: sessions.session_cache.get(key) is None)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,65 @@
+import pytest
+
+import statements
+
+
+def write(tmp_path, text):
+    path = tmp_path / "queries.sql"
+    path.write_text(text)
+    return path
+
+
+def test_load_splits_named_blocks_and_keeps_leading_comments_as_doc(tmp_path):
+    loaded = statements.load(
+        write(
+            tmp_path,
+            "-- header, not part of any statement\n"
+            "-- name: first\n"
+            "-- Look up one row\n"
+            "-- by id\n"
+            "SELECT * FROM t\n"
+            "-- inline comment stays\n"
+            "WHERE id = %(id)s;\n"
+            "\n"
+            "--name:second\n"
+            "SELECT 1;\n",
+        )
+    )
+    assert list(loaded) == ["first", "second"]
+    assert loaded["first"].doc == "Look up one row by id"
+    assert loaded["first"].sql == "SELECT * FROM t\n-- inline comment stays\nWHERE id = %(id)s;"
+    assert loaded["second"].sql == "SELECT 1;"
+
+
+def test_load_rejects_duplicate_names(tmp_path):
+    with pytest.raises(ValueError, match="Duplicate statement name"):
+        statements.load(write(tmp_path, "-- name: a\nSELECT 1;\n-- name: a\nSELECT 2;\n"))
+
+
+def test_load_rejects_empty_statements(tmp_path):
+    with pytest.raises(ValueError, match="is empty"):
+        statements.load(write(tmp_path, "-- name: a\n-- only a comment\n\n-- name: b\nSELECT 1;\n"))
+
+
+def test_registry_has_the_hot_statements():
+    assert {"session_lookup", "list_product_types", "create_order"} <= statements.STATEMENTS.keys()
+
+
+@pytest.mark.db
+def test_every_statement_prepares_against_the_migrated_schema(conn):
+    assert statements.check(conn) == {}
+
+
+@pytest.mark.db
+def test_check_reports_statements_the_schema_rejects(conn):
+    broken = statements.Statement(name="broken", sql="SELECT no_such_column FROM orders WHERE id = %(id)s", doc="")
+    errors = statements.check(conn, {"broken": broken})
+    assert list(errors) == ["broken"]
+    assert "no_such_column" in errors["broken"]
+
+
+def test_every_statement_is_used_by_the_api():
+    """Statements only the benches run belong in the bench scripts, not the registry."""
+    api_source = "\n".join(path.read_text() for path in statements.QUERIES_PATH.parents[1].glob("*.py"))
+    unused = [name for name in statements.STATEMENTS if f'"{name}"' not in api_source]
+    assert unused == []
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from psycopg_pool import AsyncConnectionPool
+
+import stock_ledger
+from bench_stock_ledger import START_LEVEL, level, new_product, run_one
+
+pytestmark = [pytest.mark.db, pytest.mark.anyio]
+
+WRITERS = 16
+
+
+@pytest.fixture
+async def pool(database_url):
+    pool = AsyncConnectionPool(database_url, min_size=1, max_size=WRITERS + 2, kwargs={"autocommit": True}, open=False)
+    await pool.open()
+    yield pool
+    await pool.close()
+
+
+async def test_concurrent_writers_lose_no_updates_and_never_oversell(pool):
+    result = await run_one(pool, "ledger", WRITERS, seconds=3, compact_every=0.2)
+    assert result["applied"] > WRITERS
+    assert result["final_level"] == result["expected_level"]
+    assert result["final_level"] >= 0
+
+
+async def test_concurrent_subtractions_stop_exactly_at_zero(pool):
+    product_type_id = await new_product(pool, "test-stock-drain")
+
+    async def take() -> bool:
+        async with pool.connection() as conn:
+            try:
+                await stock_ledger.subtract(conn, product_type_id, 5, "test")
+                return True
+            except stock_ledger.InsufficientStock:
+                return False
+
+    taken = await asyncio.gather(*(take() for _ in range(START_LEVEL // 5 + WRITERS)))
+    assert sum(taken) == START_LEVEL // 5
+    assert await level(pool, "ledger", product_type_id) == 0
+    await stock_ledger.compact(pool)
+    assert await level(pool, "ledger", product_type_id) == 0
+
+
+async def test_compaction_keeps_the_level(pool):
+    product_type_id = await new_product(pool, "test-stock-compact")
+    async with pool.connection() as conn:
+        await stock_ledger.add(conn, product_type_id, 7, "test")
+        await stock_ledger.subtract(conn, product_type_id, 3, "test")
+    assert await stock_ledger.compact(pool) >= 1
+    assert await level(pool, "ledger", product_type_id) == START_LEVEL + 4
+    async with pool.connection() as conn:
+        cur = await conn.execute(
+            "SELECT available_quantity FROM stock WHERE product_type_id = %s", (product_type_id,)
+        )
+        assert (await cur.fetchone())[0] == START_LEVEL + 4
@@ -0,0 +1,60 @@
+import base64
+
+import psycopg
+import pytest
+
+import sync
+
+
+@pytest.mark.parametrize("xid", [0, 1, 2**40 + 7])
+def test_watermark_round_trip(xid):
+    token = sync.encode_watermark(xid)
+    assert "=" not in token
+    assert sync.decode_watermark(token) == xid
+
+
+def test_timestamp_watermark_means_full_sync():
+    old = base64.urlsafe_b64encode(b"2026-03-01T10:00:00+00:00").decode().rstrip("=")
+    assert sync.decode_watermark(old) is None
+
+
+@pytest.mark.parametrize(
+    "token",
+    ["!!!", base64.urlsafe_b64encode(b"-5").decode(), base64.urlsafe_b64encode(b"2026-03-01T10:00:00").decode(), "gA"],
+)
+def test_malformed_watermark_is_rejected(token):
+    with pytest.raises(ValueError):
+        sync.decode_watermark(token)
+
+
+def new_order(conn: psycopg.Connection, customer_id: int) -> int:
+    return conn.execute(
+        "INSERT INTO orders (customer_id, status) VALUES (%s, 'received') RETURNING id", (customer_id,)
+    ).fetchone()[0]
+
+
+@pytest.mark.db
+@pytest.mark.anyio
+async def test_write_committed_after_a_later_sync_is_not_missed(database_url, conn):
+    customer_id = conn.execute(
+        "INSERT INTO customers (name, phone) VALUES ('sync-test', 'sync-test') RETURNING id"
+    ).fetchone()[0]
+    slow_order = new_order(conn, customer_id)
+
+    async with await psycopg.AsyncConnection.connect(database_url, autocommit=True) as api:
+        first = await sync.fetch_changes(api, None)
+        assert first["full"]
+
+        with psycopg.connect(database_url) as slow:
+            slow.execute("UPDATE orders SET status = 'in_process' WHERE id = %s", (slow_order,))
+            fast_order = new_order(conn, customer_id)
+
+            second = await sync.fetch_changes(api, sync.decode_watermark(first["watermark"]))
+            assert not second["full"]
+            assert fast_order in [o["id"] for o in second["orders"]]
+            assert slow_order not in [o["id"] for o in second["orders"]]
+            slow.commit()
+
+        third = await sync.fetch_changes(api, sync.decode_watermark(second["watermark"]))
+        changed = {o["id"]: o["status"] for o in third["orders"]}
+        assert changed[slow_order] == "in_process"